@@ -0,0 +1,22 @@
+"""
+ASGI config for app project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Django 2.1 only speaks WSGI, so the WSGI application is served through
+core.asgi.ASGIHandler. Run it with an ASGI server, for example::
+
+    uvicorn app.asgi:application --host 0.0.0.0 --port 8000
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+from core import warmup
+from core.asgi import ASGIHandler
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+
+application = ASGIHandler(get_wsgi_application())
+# /readyz answers 503 until this has finished
+warmup.start()
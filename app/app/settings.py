@@ -46,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -75,22 +76,142 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'app.wsgi.application'
 
+# Worker threads running Django behind app.asgi, see core.asgi
+ASGI_THREADS = 8
+
 
 # Database
 # https://docs.djangoproject.com/en/2.0/ref/settings/#databases
 
+# Connections come from a per process pool, see core.db.pool, so
+# CONN_MAX_AGE stays 0 and closing a connection returns it to the pool.
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'core.db.backends.postgresql_pool',
         'NAME': 'rest_api_db',
 		'USER': 'rest_api_user',
 		'PASSWORD': 'admin',
 		'HOST': 'localhost',
 		'PORT': '',	
+		'POOL': {
+			'MIN_SIZE': 2,
+			'MAX_SIZE': 20,
+			'TIMEOUT': 5,
+			'MAX_IDLE': 300,
+			'MAX_LIFETIME': 3600,
+			'CHECK_AFTER': 1,
+			'REAP_INTERVAL': 60,
+		},
     }
 }
 
 
+# Read replicas, see core.db.routers
+# Safe requests of the recipe and user API read from the REPLICAS aliases,
+# picked by weight. DB_REPLICA_HOSTS=host1,host2 adds a replica of
+# 'default' per host.
+# Users are pinned to the primary for PIN_SECONDS after a write. CACHE must
+# name a CACHES alias shared by every process (memcached, redis or the
+# database cache) once REPLICAS is set; check core.E001 refuses the
+# per-process locmem cache.
+
+DATABASE_ROUTERS = ['core.db.routers.ReplicaRouter']
+
+DATABASE_REPLICAS = {
+    'REPLICAS': {},
+    'PIN_SECONDS': 5,
+    'RETRY_AFTER': 30,
+    'CACHE': 'default',
+}
+
+for index, host in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(','))):
+    alias = 'replica%d' % (index + 1)
+    DATABASES[alias] = dict(DATABASES['default'], HOST=host, TEST={'MIRROR': 'default'})
+    DATABASE_REPLICAS['REPLICAS'][alias] = 1
+
+
+# Caches
+# https://docs.djangoproject.com/en/2.0/topics/cache/
+# Swap the BACKEND of an alias to move it to memcached or redis.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Per-user tag and ingrediant list responses, evicted in LRU order
+    'recipe_attrs': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'recipe-attrs',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+
+# Django REST framework
+# https://www.django-rest-framework.org/api-guide/settings/
+
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': (
+        'user.authentication.CachedTokenAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+    ),
+}
+
+# Token lookups cached by user.authentication.CachedTokenAuthentication.
+# SHARED_CACHE names a CACHES alias used as a second tier by every process;
+# processes then see evictions made elsewhere within SYNC_INTERVAL seconds.
+TOKEN_AUTH_CACHE = {
+    'TTL': 60,
+    'MAX_ENTRIES': 10000,
+    'SHARED_CACHE': None,
+    'SYNC_INTERVAL': 1,
+}
+
+
+# Bounded thread pool running every password hash, see core.hashing.
+# Past MAX_PENDING hashes a request waits QUEUE_TIMEOUT seconds, then gets a 503.
+# Pending hashes hold request threads, so MAX_PENDING stays below
+# ASGI_THREADS; None uses half of them.
+
+PASSWORD_HASHING_POOL = {
+    'MAX_WORKERS': 4,
+    'MAX_PENDING': None,
+    'QUEUE_TIMEOUT': 0,
+}
+
+
+# Cache entries loaded before a process reports ready, see core.warmup.
+
+WARM_UP = {
+    'TOKENS': 1000,
+    'SEARCH_INDEXES': 10,
+}
+
+
+# Request metrics served at /metrics, see core.metrics.
+# With several worker processes set DIRECTORY to a directory they share,
+# emptied on deploy, where each one writes its aggregates every
+# FLUSH_INTERVAL seconds.
+# Only REMOTE_ADDRs in ALLOWED_NETWORKS may scrape, or callers sending
+# "Authorization: Bearer <TOKEN>". Behind a proxy REMOTE_ADDR is the
+# proxy, so give scrapers a TOKEN there.
+
+METRICS = {
+    'DIRECTORY': os.environ.get('METRICS_DIR'),
+    'FLUSH_INTERVAL': 5,
+    'ALLOWED_NETWORKS': [
+        network for network in
+        os.environ.get('METRICS_ALLOWED_NETWORKS', '127.0.0.1/32,::1/128').split(',')
+        if network
+    ],
+    'TOKEN': os.environ.get('METRICS_TOKEN'),
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/2.0/ref/settings/#auth-password-validators
 
@@ -0,0 +1,47 @@
+"""
+Django settings for API-only nodes.
+
+Everything in app.settings except the admin, sessions, messages, static
+files and templates, which nothing under /api/ uses. Requests are
+authenticated by token only and answered as JSON only, so no template
+engine or session store is loaded at startup or touched per request.
+
+Select it with DJANGO_SETTINGS_MODULE=app.settings_api.
+"""
+
+from app.settings import *  # noqa: F401,F403
+from app.settings import INSTALLED_APPS, MIDDLEWARE, REST_FRAMEWORK
+
+INSTALLED_APPS = [
+    app for app in INSTALLED_APPS if app not in (
+        'django.contrib.admin',
+        'django.contrib.sessions',
+        'django.contrib.messages',
+        'django.contrib.staticfiles',
+    )
+]
+
+# The authentication middleware needs sessions; DRF authenticates itself
+MIDDLEWARE = [
+    middleware for middleware in MIDDLEWARE if middleware not in (
+        'django.contrib.sessions.middleware.SessionMiddleware',
+        'django.middleware.csrf.CsrfViewMiddleware',
+        'django.contrib.auth.middleware.AuthenticationMiddleware',
+        'django.contrib.messages.middleware.MessageMiddleware',
+        'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    )
+]
+
+ROOT_URLCONF = 'app.urls_api'
+
+TEMPLATES = []
+
+REST_FRAMEWORK = dict(
+    REST_FRAMEWORK,
+    DEFAULT_AUTHENTICATION_CLASSES=(
+        'user.authentication.CachedTokenAuthentication',
+    ),
+    DEFAULT_RENDERER_CLASSES=(
+        'rest_framework.renderers.JSONRenderer',
+    ),
+)
@@ -17,10 +17,10 @@ Including another URLconf
 
 
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path
+
+from app import urls_api
+
 urlpatterns = [
     path('admin/', admin.site.urls),
-	path('api/user/', include('user.urls')),
-	path('api/recipe/', include('recipe.urls')),
-	
-]
+] + urls_api.urlpatterns
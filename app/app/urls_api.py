@@ -0,0 +1,13 @@
+"""URL configuration of API-only nodes, see app.settings_api"""
+
+from django.urls import path, include
+
+from core import views as core_views
+
+urlpatterns = [
+    path('healthz', core_views.healthz, name='healthz'),
+    path('readyz', core_views.readyz, name='readyz'),
+    path('metrics', core_views.metrics, name='metrics'),
+	path('api/user/', include('user.urls')),
+	path('api/recipe/', include('recipe.urls')),
+]
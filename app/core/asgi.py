@@ -0,0 +1,216 @@
+"""Serving the Django application over ASGI
+
+Django 2.1 has no ASGI support of its own, so the handler below runs the
+regular WSGI application on a bounded thread pool. Reading the request
+body and writing the response happen on the event loop, which means a
+slow client costs a coroutine rather than one of the worker threads.
+A thread is only taken once the whole request has arrived, and it is
+given back as soon as the response is rendered. Streaming responses are
+the exception: their rows are read on the thread that opened the cursor,
+backpressure from the client is passed on to it, and a client that
+disconnects stops the thread at its next chunk.
+"""
+import asyncio
+import sys
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+# Request bodies larger than this are spooled to disk while they arrive
+SPOOL_SIZE = 1024 * 1024
+# Chunks of a streaming response buffered ahead of the client
+STREAM_BUFFER = 8
+
+
+class ASGIHandler:
+	"""ASGI application running a WSGI application on a thread pool"""
+
+	def __init__(self, wsgi_application, max_workers=None):
+		self.wsgi_application = wsgi_application
+		if max_workers is None:
+			max_workers = getattr(settings, 'ASGI_THREADS', 8)
+		self.executor = ThreadPoolExecutor(
+			max_workers=max_workers,
+			thread_name_prefix='asgi-worker'
+		)
+
+	async def __call__(self, scope, receive, send):
+		if scope['type'] == 'lifespan':
+			await self.lifespan(receive, send)
+		elif scope['type'] == 'http':
+			await self.http(scope, receive, send)
+		else:
+			raise ValueError('Unsupported ASGI scope type %r' % scope['type'])
+
+	async def lifespan(self, receive, send):
+		while True:
+			message = await receive()
+			if message['type'] == 'lifespan.startup':
+				await send({'type': 'lifespan.startup.complete'})
+			elif message['type'] == 'lifespan.shutdown':
+				self.executor.shutdown(wait=True)
+				await send({'type': 'lifespan.shutdown.complete'})
+				return
+
+	async def http(self, scope, receive, send):
+		body = await self.read_body(receive)
+		if body is None:
+			return
+		loop = asyncio.get_event_loop()
+		stream = MessageStream(loop)
+		worker = loop.run_in_executor(
+			self.executor, self.run_application, get_environ(scope, body), stream
+		)
+		watcher = loop.create_task(self.watch_disconnect(receive, stream))
+		try:
+			try:
+				while True:
+					message = await stream.get()
+					if message is None or stream.closed:
+						break
+					await send(message)
+			except BaseException:
+				stream.close()
+				await wait_stopped(worker)
+				raise
+			if stream.closed:
+				await wait_stopped(worker)
+			else:
+				await worker
+		finally:
+			watcher.cancel()
+			body.close()
+
+	async def watch_disconnect(self, receive, stream):
+		"""Close the stream once the client disconnects during the response"""
+		while True:
+			message = await receive()
+			if message['type'] == 'http.disconnect':
+				stream.close()
+				return
+
+	async def read_body(self, receive):
+		"""Return the request body as a file, or None if the client left"""
+		body = tempfile.SpooledTemporaryFile(max_size=SPOOL_SIZE)
+		while True:
+			message = await receive()
+			if message['type'] == 'http.disconnect':
+				body.close()
+				return None
+			body.write(message.get('body', b''))
+			if not message.get('more_body', False):
+				break
+		body.seek(0)
+		return body
+
+	def run_application(self, environ, stream):
+		"""Call the WSGI application on a worker thread
+
+		Rendered responses fit the stream buffer, so the thread is free
+		again as soon as they are queued; a streaming response keeps its
+		thread until the client has consumed it.
+		"""
+		def start_response(status, response_headers, exc_info=None):
+			start['status'] = int(status.split(' ', 1)[0])
+			start['headers'] = [
+				(name.lower().encode('latin-1'), value.encode('latin-1'))
+				for name, value in response_headers
+			]
+
+		start = {'type': 'http.response.start'}
+		try:
+			response = self.wsgi_application(environ, start_response)
+			try:
+				if getattr(response, 'streaming', False):
+					stream.put(start)
+					for chunk in response:
+						if chunk:
+							stream.put({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+					stream.put({'type': 'http.response.body', 'body': b''})
+				else:
+					content = b''.join(response)
+					stream.put(start)
+					stream.put({'type': 'http.response.body', 'body': content})
+			finally:
+				if hasattr(response, 'close'):
+					response.close()
+		finally:
+			stream.finish()
+
+
+class ClientDisconnected(Exception):
+	"""Raised on the worker thread once the client has gone away"""
+
+
+class MessageStream:
+	"""Bounded queue of ASGI messages from a worker thread to the event loop"""
+
+	def __init__(self, loop, size=STREAM_BUFFER):
+		self.loop = loop
+		self.queue = asyncio.Queue()
+		self.credits = threading.Semaphore(size)
+		self.closed = False
+
+	def put(self, message):
+		"""Queue a message, blocking the worker while the buffer is full"""
+		self.credits.acquire()
+		if self.closed:
+			raise ClientDisconnected()
+		self.loop.call_soon_threadsafe(self.queue.put_nowait, message)
+
+	def finish(self):
+		self.loop.call_soon_threadsafe(self.queue.put_nowait, None)
+
+	async def get(self):
+		message = await self.queue.get()
+		self.credits.release()
+		return message
+
+	def close(self):
+		"""Stop the worker at its next put"""
+		self.closed = True
+		self.credits.release()
+
+
+async def wait_stopped(worker):
+	"""Wait for a worker whose stream was closed"""
+	await asyncio.wait([worker])
+	if not worker.cancelled():
+		# The worker stops with ClientDisconnected once the stream closes
+		worker.exception()
+
+
+def get_environ(scope, body):
+	"""Build a WSGI environ from an ASGI http scope"""
+	server = scope.get('server') or ('localhost', 80)
+	environ = {
+		'REQUEST_METHOD': scope['method'],
+		'SCRIPT_NAME': scope.get('root_path', ''),
+		'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+		'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+		'SERVER_NAME': server[0],
+		'SERVER_PORT': str(server[1]),
+		'SERVER_PROTOCOL': 'HTTP/%s' % scope.get('http_version', '1.1'),
+		'wsgi.version': (1, 0),
+		'wsgi.url_scheme': scope.get('scheme', 'http'),
+		'wsgi.input': body,
+		'wsgi.errors': sys.stderr,
+		'wsgi.multithread': True,
+		'wsgi.multiprocess': True,
+		'wsgi.run_once': False,
+	}
+	if scope.get('client'):
+		environ['REMOTE_ADDR'] = scope['client'][0]
+		environ['REMOTE_PORT'] = str(scope['client'][1])
+
+	for name, value in scope.get('headers', []):
+		name = name.decode('latin-1').upper().replace('-', '_')
+		value = value.decode('latin-1')
+		if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+			name = 'HTTP_' + name
+		if name in environ:
+			value = environ[name] + ',' + value
+		environ[name] = value
+	return environ
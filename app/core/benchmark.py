@@ -0,0 +1,108 @@
+"""Helpers shared by the benchmark management commands"""
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+
+from core import search, summary
+from core.models import Tag, Ingrediant, Recipe
+
+BATCH_SIZE = 1000
+
+
+def seed(users=10, recipes=1000, tags=50, ingrediants=100, links=3,
+		prefix='bench', password='benchpass', seed_value=0):
+	"""Create users owning recipes linked to tags and ingrediants
+
+	Every count except ``users`` is per user. Rows are written with
+	bulk_create and looked up again afterwards, because not every
+	backend returns primary keys from a bulk insert. Returns the users.
+	"""
+	rand = random.Random(seed_value)
+	encoded = make_password(password)
+	emails = ['%s-%d@example.com' % (prefix, index) for index in range(users)]
+	bulk_insert(get_user_model(), [
+		get_user_model()(email=email, name=email, password=encoded)
+		for email in emails
+	])
+	owners = list(get_user_model().objects.filter(email__in=emails))
+
+	bulk_insert(Tag, [
+		Tag(user=owner, name='Tag %d' % index)
+		for owner in owners for index in range(tags)
+	])
+	bulk_insert(Ingrediant, [
+		Ingrediant(user=owner, name='Ingrediant %d' % index)
+		for owner in owners for index in range(ingrediants)
+	])
+	bulk_insert(Recipe, [
+		Recipe(
+			user=owner,
+			title='Recipe %d' % index,
+			time_minutes=rand.randint(5, 120),
+			price=Decimal(rand.randint(100, 9999)) / 100,
+		)
+		for owner in owners for index in range(recipes)
+	])
+
+	for model, through, column in (
+		(Tag, Recipe.tags.through, 'tag_id'),
+		(Ingrediant, Recipe.ingrediants.through, 'ingrediant_id'),
+	):
+		related = {}
+		for pk, user_id in model.objects.filter(user__in=owners) \
+				.values_list('id', 'user_id'):
+			related.setdefault(user_id, []).append(pk)
+		rows = []
+		for recipe_id, user_id in Recipe.objects.filter(user__in=owners) \
+				.values_list('id', 'user_id'):
+			choices = related.get(user_id, [])
+			for pk in rand.sample(choices, min(links, len(choices))):
+				rows.append(through(**{'recipe_id': recipe_id, column: pk}))
+		bulk_insert(through, rows)
+
+	for owner in owners:
+		summary.rebuild(Recipe.objects.filter(user=owner))
+		search.changed(owner.pk, Recipe.objects.filter(user=owner))
+	return owners
+
+
+def bulk_insert(model, objs):
+	"""Insert rows in batches no larger than the backend allows"""
+	allowed = connection.ops.bulk_batch_size(model._meta.concrete_fields, objs)
+	model.objects.bulk_create(objs, batch_size=max(min(allowed, BATCH_SIZE), 1))
+
+
+def measure(func, repeat=20):
+	"""Call func repeatedly and return latency statistics in milliseconds"""
+	timings = []
+	for _ in range(repeat):
+		start = time.perf_counter()
+		func()
+		timings.append((time.perf_counter() - start) * 1000)
+	return summarize(timings)
+
+
+def summarize(timings):
+	"""Return count, mean and percentile latencies for a list of timings"""
+	ordered = sorted(timings)
+	if not ordered:
+		return {'count': 0}
+	return {
+		'count': len(ordered),
+		'mean': statistics.mean(ordered),
+		'p50': percentile(ordered, 50),
+		'p95': percentile(ordered, 95),
+		'p99': percentile(ordered, 99),
+		'max': ordered[-1],
+	}
+
+
+def percentile(ordered, percent):
+	"""Return the nearest-rank percentile of an already sorted list"""
+	rank = max(int(round(percent / 100.0 * len(ordered))) - 1, 0)
+	return ordered[min(rank, len(ordered) - 1)]
@@ -0,0 +1,122 @@
+"""PostgreSQL backend borrowing its connections from a process wide pool
+
+Use it as the ENGINE of a database and size the pool with a POOL entry
+next to OPTIONS, for example::
+
+    'ENGINE': 'core.db.backends.postgresql_pool',
+    'POOL': {'MIN_SIZE': 2, 'MAX_SIZE': 20},
+
+Closing the Django connection at the end of a request hands the raw
+connection back instead of disconnecting, so CONN_MAX_AGE should stay 0.
+Pools are shared by every thread of a process, which covers threaded
+WSGI workers as well as the worker threads behind app.asgi.
+"""
+from django.db.backends.postgresql import base
+from django.db.backends.postgresql.creation import DatabaseCreation as \
+	BaseDatabaseCreation
+from psycopg2 import extensions
+
+from core.db import pool
+
+Database = base.Database
+
+
+def pool_key(alias, conn_params):
+	return (alias, tuple(sorted((name, str(value)) for name, value in conn_params.items())))
+
+
+def check(connection):
+	"""Return whether a connection still answers a trivial query"""
+	if connection.closed:
+		return False
+	with connection.cursor() as cursor:
+		cursor.execute('SELECT 1')
+	if not connection.autocommit:
+		connection.rollback()
+	return True
+
+
+def reset(connection):
+	"""Roll back and clear the session state a borrower left behind
+
+	DISCARD ALL undoes SET and search_path changes, drops temporary
+	tables, prepared statements and held cursors, and releases advisory
+	locks. It cannot run in a transaction, so it runs in autocommit.
+	"""
+	if connection.closed:
+		return False
+	status = connection.get_transaction_status()
+	if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+		return False
+	if status != extensions.TRANSACTION_STATUS_IDLE:
+		connection.rollback()
+	autocommit = connection.autocommit
+	connection.autocommit = True
+	try:
+		with connection.cursor() as cursor:
+			cursor.execute('DISCARD ALL')
+	finally:
+		connection.autocommit = autocommit
+	return True
+
+
+class DatabaseCreation(BaseDatabaseCreation):
+
+	def _destroy_test_db(self, test_database_name, verbosity):
+		# Pooled connections would keep the test database in use
+		pool.discard_pools(
+			lambda key: ('dbname', test_database_name) in key[1]
+		)
+		super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+	creation_class = DatabaseCreation
+
+	def get_pool(self, conn_params):
+		"""Return the pool of this database, creating it on first use"""
+		def create():
+			options = dict(pool.DEFAULTS)
+			options.update(self.settings_dict.get('POOL', {}))
+			return pool.ConnectionPool(
+				lambda: Database.connect(**conn_params),
+				check=check,
+				reset=reset,
+				min_size=options['MIN_SIZE'],
+				max_size=options['MAX_SIZE'],
+				timeout=options['TIMEOUT'],
+				max_idle=options['MAX_IDLE'],
+				max_lifetime=options['MAX_LIFETIME'],
+				check_after=options['CHECK_AFTER'],
+				reap_interval=options['REAP_INTERVAL'],
+			)
+		return pool.get_pool(pool_key(self.alias, conn_params), create)
+
+	def get_new_connection(self, conn_params):
+		self.pool = self.get_pool(conn_params)
+		try:
+			connection = self.pool.acquire()
+		except pool.PoolTimeout as error:
+			raise Database.OperationalError(str(error))
+
+		# Same as the parent, for connections opened by another wrapper
+		options = self.settings_dict['OPTIONS']
+		try:
+			self.isolation_level = options['isolation_level']
+		except KeyError:
+			self.isolation_level = connection.isolation_level
+		else:
+			if self.isolation_level != connection.isolation_level:
+				connection.set_session(isolation_level=self.isolation_level)
+		return connection
+
+	def _close(self):
+		if self.connection is not None:
+			with self.wrap_database_errors:
+				# Drop connections that raised errors rather than trust them.
+				# Closed inside atomic, Django keeps the connection object
+				# until the block exits, so it is closed rather than lent out.
+				self.pool.release(
+					self.connection,
+					discard=self.errors_occurred or self.in_atomic_block
+				)
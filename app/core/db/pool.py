@@ -0,0 +1,282 @@
+"""Thread-safe pool of database connections
+
+The pool knows nothing about the database driver: it is handed
+callables that open, check, reset and disconnect a raw connection. Borrowed
+connections that sat idle for a while are checked before being handed
+out, idle connections above the minimum size are evicted, and
+connections are retired once they reach their maximum lifetime.
+Eviction runs whenever a connection is borrowed or returned, and every
+reap_interval seconds on a background thread, so a pool shrinks even
+while its process sees no traffic.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+DEFAULTS = {
+	'MIN_SIZE': 0,
+	'MAX_SIZE': 10,
+	# Seconds a borrower waits for a free connection
+	'TIMEOUT': 5,
+	# Seconds before an idle connection above MIN_SIZE is closed
+	'MAX_IDLE': 300,
+	# Seconds before a connection is retired, None to keep it forever
+	'MAX_LIFETIME': 3600,
+	# Idle seconds after which a connection is checked when borrowed
+	'CHECK_AFTER': 1,
+	# Seconds between evictions without traffic, None to only evict on use
+	'REAP_INTERVAL': 60,
+}
+
+
+class PoolTimeout(Exception):
+	"""Raised when no connection became free in time"""
+
+
+class _Entry:
+	__slots__ = ('connection', 'created', 'last_used')
+
+	def __init__(self, connection, now):
+		self.connection = connection
+		self.created = now
+		self.last_used = now
+
+
+class ConnectionPool:
+	"""Hand out at most max_size connections, keeping min_size open"""
+
+	def __init__(self, connect, check=None, reset=None, disconnect=None,
+			min_size=0, max_size=10, timeout=5, max_idle=300,
+			max_lifetime=3600, check_after=1, reap_interval=None,
+			clock=time.monotonic):
+		self.connect = connect
+		self.check = check or (lambda connection: True)
+		self.reset = reset or (lambda connection: True)
+		self.disconnect = disconnect or (lambda connection: connection.close())
+		self.min_size = min_size
+		self.max_size = max(max_size, min_size, 1)
+		self.timeout = timeout
+		self.max_idle = max_idle
+		self.max_lifetime = max_lifetime
+		self.check_after = check_after
+		self.clock = clock
+		self._condition = threading.Condition()
+		self._idle = deque()
+		self._borrowed = {}
+		self._size = 0
+		self._waiting = 0
+		self._counters = dict.fromkeys((
+			'borrows', 'connects', 'closes', 'failed_checks', 'timeouts'
+		), 0)
+		self._wait_seconds = 0.0
+		self._closed = False
+		self._stop_reaper = threading.Event()
+		if reap_interval is not None:
+			threading.Thread(
+				target=self._reap, args=(reap_interval,),
+				name='connection-pool-reaper', daemon=True
+			).start()
+
+	def acquire(self):
+		"""Borrow a healthy connection, opening one if the pool has room"""
+		started = self.clock()
+		deadline = started + self.timeout
+		with self._condition:
+			self._waiting += 1
+			try:
+				while True:
+					expired = self._evict()
+					if self._idle:
+						entry = self._idle.pop()
+						break
+					if self._size < self.max_size:
+						self._size += 1
+						entry = None
+						break
+					remaining = deadline - self.clock()
+					if remaining <= 0:
+						self._counters['timeouts'] += 1
+						raise PoolTimeout(
+							'No database connection free after %s seconds '
+							'(%d in use)' % (self.timeout, len(self._borrowed))
+						)
+					self._condition.wait(remaining)
+			finally:
+				self._waiting -= 1
+		self._close_entries(expired)
+
+		try:
+			if entry is not None and self.clock() - entry.last_used >= self.check_after \
+					and not self._is_healthy(entry):
+				entry = None
+			if entry is None:
+				entry = _Entry(self.connect(), self.clock())
+				self._count('connects')
+		except BaseException:
+			self._forget()
+			raise
+
+		with self._condition:
+			self._borrowed[id(entry.connection)] = entry
+			self._counters['borrows'] += 1
+			self._wait_seconds += self.clock() - started
+		return entry.connection
+
+	def release(self, connection, discard=False):
+		"""Return a borrowed connection, closing it if it can't be reused"""
+		with self._condition:
+			entry = self._borrowed.pop(id(connection))
+		now = self.clock()
+		retire = self.max_lifetime is not None and now - entry.created >= self.max_lifetime
+		if discard or retire or self._closed or not self._reset(entry):
+			self._close_entries([entry])
+			self._forget()
+			return
+		entry.last_used = now
+		with self._condition:
+			self._idle.append(entry)
+			self._condition.notify()
+			expired = self._evict()
+		self._close_entries(expired)
+
+	def fill(self):
+		"""Open connections until min_size of them exist"""
+		while True:
+			with self._condition:
+				if self._size >= self.min_size:
+					return
+				self._size += 1
+			try:
+				entry = _Entry(self.connect(), self.clock())
+			except BaseException:
+				self._forget()
+				raise
+			self._count('connects')
+			with self._condition:
+				self._idle.append(entry)
+				self._condition.notify()
+
+	def close_all(self):
+		"""Close every idle connection; borrowed ones close on release"""
+		with self._condition:
+			entries = list(self._idle)
+			self._idle.clear()
+			self._size -= len(entries)
+			self._closed = True
+			self._condition.notify_all()
+		self._stop_reaper.set()
+		self._close_entries(entries)
+
+	def metrics(self):
+		"""Return a snapshot of the pool gauges and counters"""
+		with self._condition:
+			metrics = dict(self._counters)
+			metrics.update({
+				'size': self._size,
+				'idle': len(self._idle),
+				'in_use': len(self._borrowed),
+				'waiting': self._waiting,
+				'min_size': self.min_size,
+				'max_size': self.max_size,
+				'wait_seconds': self._wait_seconds,
+			})
+			return metrics
+
+	def _reap(self, interval):
+		"""Evict idle connections every interval seconds until closed"""
+		while not self._stop_reaper.wait(interval):
+			with self._condition:
+				expired = self._evict()
+			self._close_entries(expired)
+
+	def _evict(self):
+		"""Take idle connections past their idle time or lifetime off the pool
+
+		Called with the lock held; the caller closes what is returned.
+		"""
+		now = self.clock()
+		expired = []
+		for entry in list(self._idle):
+			idle_too_long = now - entry.last_used >= self.max_idle \
+				and self._size - len(expired) > self.min_size
+			too_old = self.max_lifetime is not None \
+				and now - entry.created >= self.max_lifetime
+			if idle_too_long or too_old:
+				self._idle.remove(entry)
+				expired.append(entry)
+		self._size -= len(expired)
+		return expired
+
+	def _is_healthy(self, entry):
+		try:
+			healthy = self.check(entry.connection)
+		except Exception:
+			healthy = False
+		if not healthy:
+			self._count('failed_checks')
+			self._close_entries([entry])
+		return healthy
+
+	def _reset(self, entry):
+		try:
+			return self.reset(entry.connection)
+		except Exception:
+			return False
+
+	def _close_entries(self, entries):
+		for entry in entries:
+			try:
+				self.disconnect(entry.connection)
+			except Exception:
+				pass
+			self._count('closes')
+
+	def _forget(self):
+		"""Give back the slot of a connection that is gone"""
+		with self._condition:
+			self._size -= 1
+			self._condition.notify()
+
+	def _count(self, name):
+		with self._condition:
+			self._counters[name] += 1
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_pools_pid = os.getpid()
+
+
+def get_pool(key, factory):
+	"""Return the pool registered under key, creating it with factory
+
+	Pools are never shared with a forked child: a child process starts
+	over with its own connections.
+	"""
+	global _pools_pid
+	with _pools_lock:
+		if _pools_pid != os.getpid():
+			_pools.clear()
+			_pools_pid = os.getpid()
+		pool = _pools.get(key)
+		if pool is None:
+			pool = _pools[key] = factory()
+		return pool
+
+
+def all_pools():
+	"""Return (key, pool) pairs of this process"""
+	with _pools_lock:
+		if _pools_pid != os.getpid():
+			return []
+		return list(_pools.items())
+
+
+def discard_pools(predicate):
+	"""Close and forget the pools whose key satisfies the predicate"""
+	with _pools_lock:
+		keys = [key for key in _pools if predicate(key)]
+		pools = [_pools.pop(key) for key in keys]
+	for pool in pools:
+		pool.close_all()
@@ -0,0 +1,176 @@
+"""Sending the reads of safe API requests to read replicas
+
+Views using ReplicaReadMixin pick one replica per GET, HEAD or OPTIONS
+request, at random by weight, and ReplicaRouter sends that request's
+reads to it. Everything else, including authentication and every
+request of other views, reads from the primary. A replica whose
+connection fails is skipped for RETRY_AFTER seconds, and when none is
+left reads fall back to the primary.
+
+Replicas lag behind the primary, so a user whose request wrote is pinned
+to the primary for PIN_SECONDS. Pins are kept in the CACHE alias, which
+must be shared by every process for the pin to follow the user; the
+core.E001 check rejects a per-process cache while REPLICAS is set.
+
+To try it locally, add a second alias to DATABASES, a copy of the SQLite
+file or a second PostgreSQL database, and list it in REPLICAS. Give it
+TEST = {'MIRROR': 'default'} so tests read the test database through it.
+"""
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.db import connections
+from django.db.utils import DatabaseError
+from rest_framework.permissions import SAFE_METHODS
+
+DEFAULTS = {
+	'PRIMARY': 'default',
+	# DATABASES alias: relative weight
+	'REPLICAS': {},
+	'PIN_SECONDS': 5,
+	'RETRY_AFTER': 30,
+	'CACHE': 'default',
+}
+
+# Cache backends whose entries are only seen by the process that wrote them
+PROCESS_CACHES = (
+	'django.core.cache.backends.locmem.LocMemCache',
+	'django.core.cache.backends.dummy.DummyCache',
+)
+
+_state = threading.local()
+_down = {}
+_down_lock = threading.Lock()
+
+
+def get_settings():
+	options = dict(DEFAULTS)
+	options.update(getattr(settings, 'DATABASE_REPLICAS', {}))
+	return options
+
+
+@checks.register()
+def check_pin_cache(app_configs, **kwargs):
+	"""Fail when replicas are configured but pins stay in one process"""
+	options = get_settings()
+	if not options['REPLICAS']:
+		return []
+	backend = settings.CACHES.get(options['CACHE'], {}).get('BACKEND')
+	if backend is None or backend in PROCESS_CACHES:
+		return [checks.Error(
+			'DATABASE_REPLICAS CACHE %r is not shared by every process.' % options['CACHE'],
+			hint='Point CACHE at a memcached, redis or database cache alias, '
+				'otherwise users stop reading their own writes.',
+			id='core.E001',
+		)]
+	return []
+
+
+def pin_key(user_id):
+	return 'replica-pin:%s' % user_id
+
+
+def pin(user_id):
+	"""Read from the primary for the user's requests during the pin window"""
+	options = get_settings()
+	caches[options['CACHE']].set(pin_key(user_id), True, options['PIN_SECONDS'])
+
+
+def is_pinned(user_id):
+	return bool(caches[get_settings()['CACHE']].get(pin_key(user_id)))
+
+
+def mark_down(alias):
+	"""Skip a replica until RETRY_AFTER seconds have passed"""
+	with _down_lock:
+		_down[alias] = time.monotonic() + get_settings()['RETRY_AFTER']
+
+
+def available_replicas():
+	"""Return {alias: weight} of the replicas not marked down"""
+	now = time.monotonic()
+	with _down_lock:
+		for alias, until in list(_down.items()):
+			if until <= now:
+				del _down[alias]
+		down = set(_down)
+	return {
+		alias: weight for alias, weight in get_settings()['REPLICAS'].items()
+		if alias not in down and weight > 0
+	}
+
+
+def choose_replica(rand=random):
+	"""Return a connected replica alias picked by weight, or None
+
+	Replicas failing to connect are marked down and the next one is
+	tried.
+	"""
+	replicas = available_replicas()
+	while replicas:
+		aliases = list(replicas)
+		alias = rand.choices(aliases, weights=[replicas[name] for name in aliases])[0]
+		try:
+			connections[alias].ensure_connection()
+		except DatabaseError:
+			mark_down(alias)
+			del replicas[alias]
+			continue
+		return alias
+	return None
+
+
+def read_from(alias):
+	"""Send reads of the current thread to a replica alias, None for the primary"""
+	_state.alias = alias
+
+
+def reading_from():
+	return getattr(_state, 'alias', None)
+
+
+class ReplicaRouter:
+	"""Route reads to the replica chosen for the request, writes to the primary"""
+
+	def db_for_read(self, model, **hints):
+		return reading_from() or get_settings()['PRIMARY']
+
+	def db_for_write(self, model, **hints):
+		return get_settings()['PRIMARY']
+
+	def allow_relation(self, obj1, obj2, **hints):
+		"""Rows of the primary and its replicas may relate to each other"""
+		options = get_settings()
+		databases = {options['PRIMARY']} | set(options['REPLICAS'])
+		if obj1._state.db in databases and obj2._state.db in databases:
+			return True
+		return None
+
+	def allow_migrate(self, db, app_label, **hints):
+		"""Replicas receive their schema from the primary"""
+		if db in get_settings()['REPLICAS']:
+			return False
+		return None
+
+
+class ReplicaReadMixin:
+	"""Read from a replica during safe requests of users without recent writes"""
+
+	def initial(self, request, *args, **kwargs):
+		super().initial(request, *args, **kwargs)
+		user_id = request.user.pk
+		if request.method in SAFE_METHODS and (user_id is None or not is_pinned(user_id)):
+			read_from(choose_replica())
+
+	def dispatch(self, request, *args, **kwargs):
+		try:
+			return super().dispatch(request, *args, **kwargs)
+		finally:
+			read_from(None)
+			user = getattr(request, 'user', None)
+			if request.method not in SAFE_METHODS and user is not None and user.pk is not None:
+				pin(user.pk)
@@ -0,0 +1,146 @@
+"""Password hashing on a bounded pool of worker threads
+
+PBKDF2 releases the GIL while it runs, so a few dedicated threads keep
+the CPU busy while request threads wait on them. The pool caps how many
+hashes run at once and how many may be pending; once it is full a
+request waits at most QUEUE_TIMEOUT seconds and then fails with
+HashingPoolBusy, instead of every worker piling onto the CPU.
+
+Each pending hash holds a request thread, so MAX_PENDING is kept below
+ASGI_THREADS and defaults to half of them. A burst of logins then leaves
+threads free for every other request.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+DEFAULTS = {
+	'MAX_WORKERS': 4,
+	# None for half of ASGI_THREADS
+	'MAX_PENDING': None,
+	'QUEUE_TIMEOUT': 0,
+}
+
+
+class HashingPoolBusy(Exception):
+	"""Raised when a password hash could not be queued in time"""
+
+
+class HashingPool:
+	"""Run callables on a fixed number of threads with a bounded backlog"""
+
+	def __init__(self, max_workers, max_pending, queue_timeout):
+		self.max_workers = max_workers
+		self.max_pending = max(max_pending, max_workers)
+		self.queue_timeout = queue_timeout
+		self._executor = ThreadPoolExecutor(
+			max_workers=max_workers,
+			thread_name_prefix='password-hashing'
+		)
+		self._slots = threading.BoundedSemaphore(self.max_pending)
+		self._lock = threading.Lock()
+		self._queued = 0
+		self._running = 0
+		self._completed = 0
+		self._rejected = 0
+		self._wait_seconds = 0.0
+		self._run_seconds = 0.0
+
+	def run(self, func, *args):
+		"""Call func on the pool and return its result"""
+		if not self._slots.acquire(timeout=self.queue_timeout):
+			with self._lock:
+				self._rejected += 1
+			raise HashingPoolBusy(
+				'%d password hashes already pending' % self.max_pending
+			)
+		try:
+			with self._lock:
+				self._queued += 1
+			future = self._executor.submit(self._call, time.perf_counter(), func, args)
+			return future.result()
+		finally:
+			self._slots.release()
+
+	def _call(self, submitted, func, args):
+		started = time.perf_counter()
+		with self._lock:
+			self._queued -= 1
+			self._running += 1
+			self._wait_seconds += started - submitted
+		try:
+			return func(*args)
+		finally:
+			with self._lock:
+				self._running -= 1
+				self._completed += 1
+				self._run_seconds += time.perf_counter() - started
+
+	def metrics(self):
+		"""Return a snapshot of the pool gauges and counters"""
+		with self._lock:
+			return {
+				'max_workers': self.max_workers,
+				'max_pending': self.max_pending,
+				'queued': self._queued,
+				'running': self._running,
+				'completed': self._completed,
+				'rejected': self._rejected,
+				'wait_seconds': self._wait_seconds,
+				'run_seconds': self._run_seconds,
+			}
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_settings():
+	"""Return the pool options, with MAX_PENDING below the request threads"""
+	options = dict(DEFAULTS)
+	options.update(getattr(settings, 'PASSWORD_HASHING_POOL', {}))
+	threads = getattr(settings, 'ASGI_THREADS', 8)
+	pending = options['MAX_PENDING'] or threads // 2
+	options['MAX_PENDING'] = max(1, min(pending, threads - 1))
+	options['MAX_WORKERS'] = min(options['MAX_WORKERS'], options['MAX_PENDING'])
+	return options
+
+
+def get_pool():
+	"""Return the process wide hashing pool, creating it on first use"""
+	global _pool
+	if _pool is None:
+		with _pool_lock:
+			if _pool is None:
+				options = get_settings()
+				_pool = HashingPool(
+					options['MAX_WORKERS'],
+					options['MAX_PENDING'],
+					options['QUEUE_TIMEOUT'],
+				)
+	return _pool
+
+
+def make_password(password):
+	"""Hash a password on the pool"""
+	if password is None:
+		return hashers.make_password(None)
+	return get_pool().run(hashers.make_password, password)
+
+
+def check_password(password, encoded):
+	"""Return (is_correct, must_update) for a password, checked on the pool"""
+	if password is None or not hashers.is_password_usable(encoded):
+		return False, False
+	return get_pool().run(_verify, password, encoded)
+
+
+def _verify(password, encoded):
+	# Record the upgrade request instead of letting the worker thread
+	# rehash and save; that is left to the caller's thread.
+	upgrade = []
+	is_correct = hashers.check_password(password, encoded, upgrade.append)
+	return is_correct, bool(upgrade)
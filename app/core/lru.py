@@ -0,0 +1,51 @@
+"""Bounded in-process cache with per entry expiry"""
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+	"""Thread-safe mapping evicting least recently used and expired keys"""
+
+	def __init__(self, max_entries, ttl, clock=time.monotonic):
+		self.max_entries = max_entries
+		self.ttl = ttl
+		self.clock = clock
+		self._data = OrderedDict()
+		self._lock = threading.Lock()
+
+	def get(self, key):
+		with self._lock:
+			item = self._data.get(key)
+			if item is None:
+				return None
+			value, expires = item
+			if expires <= self.clock():
+				del self._data[key]
+				return None
+			self._data.move_to_end(key)
+			return value
+
+	def set(self, key, value):
+		with self._lock:
+			self._data[key] = (value, self.clock() + self.ttl)
+			self._data.move_to_end(key)
+			while len(self._data) > self.max_entries:
+				self._data.popitem(last=False)
+
+	def delete(self, key):
+		with self._lock:
+			self._data.pop(key, None)
+
+	def delete_matching(self, predicate):
+		"""Delete every entry whose value satisfies the predicate"""
+		with self._lock:
+			for key in [key for key, (value, _) in self._data.items() if predicate(value)]:
+				del self._data[key]
+
+	def clear(self):
+		with self._lock:
+			self._data.clear()
+
+	def __len__(self):
+		return len(self._data)
@@ -0,0 +1,133 @@
+import asyncio
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from rest_framework.authtoken.models import Token
+
+from core import benchmark
+from core.asgi import ASGIHandler, get_environ
+from core.models import Recipe
+
+PREFIX = 'bench-asgi'
+
+
+class Command(BaseCommand):
+	help = 'Compare thread per request WSGI serving with the ASGI handler under slow clients.'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--clients', type=int, default=200, help='Concurrent clients')
+		parser.add_argument('--threads', type=int, default=8, help='Worker threads in both modes')
+		parser.add_argument('--delay', type=float, default=0.25,
+			help='Seconds each client spends sending its request and again reading the response')
+		parser.add_argument('--recipes', type=int, default=50, help='Recipes to seed')
+
+	def handle(self, *args, **kwargs):
+		"""Seed a user, serve the read endpoints in both modes and clean up
+
+		Worker threads use their own database connections, so the seeded
+		rows are committed and deleted again afterwards.
+		"""
+		user = benchmark.seed(
+			users=1, recipes=kwargs['recipes'], tags=20, ingrediants=40, prefix=PREFIX
+		)[0]
+		try:
+			token = Token.objects.create(user=user)
+			scopes = self.scopes(user, token)
+			requests = [scopes[index % len(scopes)] for index in range(kwargs['clients'])]
+			for name, serve in (('wsgi', self.serve_wsgi), ('asgi', self.serve_asgi)):
+				started = time.perf_counter()
+				timings, statuses = serve(requests, kwargs['threads'], kwargs['delay'])
+				elapsed = time.perf_counter() - started
+				self.report(name, elapsed, timings, statuses)
+		finally:
+			get_user_model().objects.filter(email__startswith=PREFIX + '-').delete()
+
+	def scopes(self, user, token):
+		"""Return ASGI scopes for the read endpoints of the recipe API"""
+		recipe = Recipe.objects.filter(user=user).first()
+		paths = (
+			'/api/recipe/recipes/',
+			'/api/recipe/recipes/%d/' % recipe.id,
+			'/api/recipe/tags/',
+			'/api/recipe/ingrediants/',
+		)
+		return [{
+			'type': 'http',
+			'method': 'GET',
+			'path': path,
+			'query_string': b'',
+			'headers': [(b'authorization', b'Token ' + token.key.encode())],
+		} for path in paths]
+
+	def serve_wsgi(self, requests, threads, delay):
+		"""Serve every request on a thread that also waits on the client"""
+		application = WSGIHandler()
+		# Every client connects at once, so latency includes the wait for a thread
+		started = time.perf_counter()
+
+		def handle(scope):
+			time.sleep(delay)
+			status = []
+			response = application(
+				get_environ(scope, io.BytesIO()),
+				lambda value, headers, exc_info=None: status.append(int(value[:3]))
+			)
+			b''.join(response)
+			response.close()
+			time.sleep(delay)
+			return (time.perf_counter() - started) * 1000, status[0]
+
+		with ThreadPoolExecutor(max_workers=threads) as executor:
+			results = list(executor.map(handle, requests))
+		return [milliseconds for milliseconds, _ in results], [status for _, status in results]
+
+	def serve_asgi(self, requests, threads, delay):
+		"""Serve every request through the ASGI handler on one event loop"""
+		application = ASGIHandler(WSGIHandler(), max_workers=threads)
+		started = time.perf_counter()
+
+		async def handle(scope):
+			status = []
+
+			async def receive():
+				await asyncio.sleep(delay)
+				return {'type': 'http.request', 'body': b''}
+
+			async def send(message):
+				if message['type'] == 'http.response.start':
+					status.append(message['status'])
+				elif not message.get('more_body', False):
+					await asyncio.sleep(delay)
+
+			await application(scope, receive, send)
+			return (time.perf_counter() - started) * 1000, status[0]
+
+		async def serve():
+			return await asyncio.gather(*[handle(scope) for scope in requests])
+
+		try:
+			results = asyncio.run(serve())
+		finally:
+			application.executor.shutdown()
+		return [milliseconds for milliseconds, _ in results], [status for _, status in results]
+
+	def report(self, name, elapsed, timings, statuses):
+		timing = benchmark.summarize(timings)
+		errors = sum(1 for status in statuses if status != 200)
+		self.stdout.write(
+			'%s: %d requests in %.2f s (%.1f req/s), p50 %.1f ms, p95 %.1f ms, '
+			'p99 %.1f ms, %d errors' % (
+				name,
+				len(timings),
+				elapsed,
+				len(timings) / elapsed,
+				timing['p50'],
+				timing['p95'],
+				timing['p99'],
+				errors,
+			)
+		)
@@ -0,0 +1,133 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core import benchmark
+from core.models import Tag, Ingrediant, Recipe
+
+# Indexes created with raw SQL in core.migrations.0005_per_user_indexes
+THROUGH_INDEXES = (
+	('core_recipe_tags_tag_idx', 'core_recipe_tags', 'tag_id, recipe_id'),
+	('core_recipe_ingr_ingr_idx', 'core_recipe_ingrediants',
+		'ingrediant_id, recipe_id'),
+)
+
+
+class Command(BaseCommand):
+	help = 'Compare query plans and latency with and without the per-user indexes.'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--users', type=int, default=20, help='Number of users to seed')
+		parser.add_argument('--recipes', type=int, default=2000, help='Recipes per user')
+		parser.add_argument('--tags', type=int, default=200, help='Tags per user')
+		parser.add_argument('--ingrediants', type=int, default=500, help='Ingrediants per user')
+		parser.add_argument('--repeat', type=int, default=20, help='Timed runs per query')
+		parser.add_argument(
+			'--drop-indexes', action='store_true',
+			help='Allow dropping the indexes of the configured database inside a rolled back transaction'
+		)
+
+	def handle(self, *args, **kwargs):
+		"""Seed, time every query with and without the indexes and roll back"""
+		if not kwargs['drop_indexes']:
+			raise CommandError(
+				'benchmark_indexes drops the indexes of database %s while it runs, '
+				'pass --drop-indexes to run it' % connection.settings_dict['NAME']
+			)
+		if kwargs['repeat'] < 1:
+			raise CommandError('--repeat must be positive')
+		with transaction.atomic():
+			self.stdout.write('Seeding benchmark data ...')
+			user = benchmark.seed(
+				users=kwargs['users'],
+				recipes=kwargs['recipes'],
+				tags=kwargs['tags'],
+				ingrediants=kwargs['ingrediants'],
+			)[0]
+			self.analyze()
+			queries = self.queries(user)
+
+			plans = {}
+			timings = {indexed: {name: [] for name in queries} for indexed in (True, False)}
+			# Alternate which variant runs first so neither always gets the warmer cache
+			for round_number in range(kwargs['repeat']):
+				order = (True, False) if round_number % 2 == 0 else (False, True)
+				for indexed in order:
+					for name, (plan, elapsed) in self.run(queries, indexed).items():
+						plans[indexed, name] = plan
+						timings[indexed][name].append(elapsed)
+
+			for name in queries:
+				self.report(
+					name,
+					(plans[False, name], benchmark.summarize(timings[False][name])),
+					(plans[True, name], benchmark.summarize(timings[True][name])),
+				)
+			transaction.set_rollback(True)
+
+	def queries(self, user):
+		"""Return the query shapes issued by the recipe API"""
+		tag = Tag.objects.filter(user=user).first()
+		ingrediant = Ingrediant.objects.filter(user=user).first()
+		return {
+			'tag list': Tag.objects.filter(user=user).order_by('-name', 'id')[:100],
+			'ingrediant list': Ingrediant.objects.filter(user=user)
+				.order_by('-name', 'id')[:100],
+			'recipe list': Recipe.objects.filter(user=user).order_by('-id')[:100],
+			'recipes by tag': Recipe.tags.through.objects
+				.filter(tag_id=tag.id).values_list('recipe_id', flat=True),
+			'recipes by ingrediant': Recipe.ingrediants.through.objects
+				.filter(ingrediant_id=ingrediant.id)
+				.values_list('recipe_id', flat=True),
+		}
+
+	def run(self, queries, indexed):
+		"""Return the plan and one timed run in milliseconds of every query
+
+		Without indexed the indexes are dropped in a savepoint that is
+		rolled back afterwards. Each query runs once untimed first so the
+		timed run does not pay for a cold cache.
+		"""
+		results = {}
+		with transaction.atomic():
+			if not indexed:
+				self.drop_indexes()
+				self.analyze()
+			for name, queryset in queries.items():
+				plan = queryset.explain()
+				list(queryset.all())
+				start = time.perf_counter()
+				list(queryset.all())
+				results[name] = (plan, (time.perf_counter() - start) * 1000)
+			transaction.set_rollback(True)
+		return results
+
+	def drop_indexes(self):
+		"""Drop the per-user indexes inside the current transaction"""
+		names = [
+			index.name
+			for model in (Tag, Ingrediant, Recipe)
+			for index in model._meta.indexes
+		]
+		names.extend(name for name, _, _ in THROUGH_INDEXES)
+		with connection.cursor() as cursor:
+			for name in names:
+				cursor.execute('DROP INDEX %s' % connection.ops.quote_name(name))
+
+	def analyze(self):
+		"""Refresh planner statistics for the seeded tables"""
+		with connection.cursor() as cursor:
+			cursor.execute('ANALYZE')
+
+	def report(self, name, before, after):
+		self.stdout.write(self.style.MIGRATE_HEADING(name))
+		for label, (plan, timing) in (('without indexes', before), ('with indexes', after)):
+			self.stdout.write('  %s: p50 %.3f ms, p95 %.3f ms' % (
+				label, timing['p50'], timing['p95']
+			))
+			for line in plan.splitlines():
+				self.stdout.write('    %s' % line)
+		self.stdout.write('  speedup: %.1fx' % (
+			before[1]['p50'] / max(after[1]['p50'], 1e-6)
+		))
@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+
+from core import benchmark, search
+from core.models import Recipe
+
+QUERIES = ('recipe 42', 'tag 7', 'ingrediant 13', 'recipies 42')
+
+
+class Command(BaseCommand):
+	help = 'Compare recipe search latency against unindexed substring matching.'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--users', type=int, default=5, help='Number of users to seed')
+		parser.add_argument('--recipes', type=int, default=20000, help='Recipes per user')
+		parser.add_argument('--tags', type=int, default=200, help='Tags per user')
+		parser.add_argument('--ingrediants', type=int, default=500, help='Ingrediants per user')
+		parser.add_argument('--repeat', type=int, default=20, help='Timed runs per query')
+
+	def handle(self, *args, **kwargs):
+		"""Seed, time every query both ways and roll back"""
+		with transaction.atomic():
+			self.stdout.write('Seeding benchmark data ...')
+			user = benchmark.seed(
+				users=kwargs['users'],
+				recipes=kwargs['recipes'],
+				tags=kwargs['tags'],
+				ingrediants=kwargs['ingrediants'],
+			)[0]
+			if search.is_indexed():
+				with connection.cursor() as cursor:
+					cursor.execute('ANALYZE')
+				self.stdout.write('Backend: PostgreSQL search vectors')
+			else:
+				search.changed(user.pk)
+				timing = benchmark.measure(lambda: search.get_index(user.pk), 1)
+				self.stdout.write('Backend: in-process index, built in %.1f ms' % timing['max'])
+
+			recipes = Recipe.objects.filter(user=user)
+			for query in QUERIES:
+				indexed = benchmark.measure(
+					lambda: list(search.search(recipes, query, user.pk).values_list('id')),
+					kwargs['repeat']
+				)
+				scan = benchmark.measure(
+					lambda: list(self.substring(recipes, query).values_list('id')),
+					kwargs['repeat']
+				)
+				self.stdout.write(
+					'%-14s %6d matches  search p50 %8.2f ms p95 %8.2f ms  '
+					'substring p50 %8.2f ms p95 %8.2f ms' % (
+						repr(query),
+						search.search(recipes, query, user.pk).count(),
+						indexed['p50'],
+						indexed['p95'],
+						scan['p50'],
+						scan['p95'],
+					)
+				)
+			transaction.set_rollback(True)
+
+	def substring(self, recipes, query):
+		"""Match every word as a substring of a title, tag or ingrediant"""
+		for word in query.split():
+			recipes = recipes.filter(
+				Q(title__icontains=word)
+				| Q(tags__name__icontains=word)
+				| Q(ingrediants__name__icontains=word)
+			)
+		return recipes.distinct()
@@ -0,0 +1,46 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core import benchmark
+from user.authentication import CachedTokenAuthentication, get_token_cache
+
+
+class Command(BaseCommand):
+	help = 'Compare queries and latency per request of token authentication classes.'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--requests', type=int, default=1000, help='Authenticated requests per class')
+
+	def handle(self, *args, **kwargs):
+		"""Authenticate the same token repeatedly, then roll back"""
+		count = kwargs['requests']
+		with transaction.atomic():
+			user = get_user_model().objects.create_user(
+				'benchmark-auth@example.com', 'benchpass'
+			)
+			token = Token.objects.create(user=user)
+			factory = APIRequestFactory()
+			get_token_cache().clear()
+
+			for authentication in (TokenAuthentication, CachedTokenAuthentication):
+				def authenticate():
+					request = factory.get('/', HTTP_AUTHORIZATION='Token ' + token.key)
+					Request(request, authenticators=[authentication()]).user
+
+				with CaptureQueriesContext(connection) as queries:
+					timing = benchmark.measure(authenticate, count)
+				self.stdout.write(
+					'%s: %.3f queries/request, p50 %.3f ms, p95 %.3f ms' % (
+						authentication.__name__,
+						len(queries) / count,
+						timing['p50'],
+						timing['p95'],
+					)
+				)
+			transaction.set_rollback(True)
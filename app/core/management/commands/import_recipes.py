@@ -0,0 +1,157 @@
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from core import recipe_io, search, summary
+from core.models import Tag, Ingrediant, Recipe
+from recipe import cache
+
+# Keeps name__in lookups under the bound parameter limit of SQLite
+LOOKUP_BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+	help = 'Import recipes for a user from an NDJSON or CSV file, or stdin.'
+
+	def add_arguments(self, parser):
+		parser.add_argument('path', help='File to import, or - to read stdin')
+		parser.add_argument('--user', required=True, help='Email of the owner of the recipes')
+		parser.add_argument('--format', choices=recipe_io.FORMATS, help='Input format, guessed from the file extension by default')
+		parser.add_argument('--chunk-size', type=int, default=1000, help='Recipes written per transaction')
+
+	def handle(self, *args, **kwargs):
+		try:
+			self.user = get_user_model().objects.get(email=kwargs['user'])
+		except get_user_model().DoesNotExist:
+			raise CommandError('User %s does not exist' % kwargs['user'])
+		if kwargs['chunk_size'] < 1:
+			raise CommandError('--chunk-size must be positive')
+
+		path = kwargs['path']
+		fmt = kwargs['format'] or recipe_io.guess_format(path)
+		# Tag and ingrediant ids resolved so far, keyed on name
+		self.resolved = {Tag: {}, Ingrediant: {}}
+
+		try:
+			stream = sys.stdin if path == '-' else open(path, encoding='utf-8', newline='')
+		except OSError as error:
+			raise CommandError('Cannot read %s: %s' % (path, error))
+		start = time.perf_counter()
+		total = 0
+		try:
+			records = recipe_io.read_records(stream, fmt)
+			for chunk in recipe_io.chunked(records, kwargs['chunk_size']):
+				with transaction.atomic():
+					self.import_chunk(chunk)
+				total += len(chunk)
+				self.stdout.write('Imported %d recipes (%.0f recipes/s)' % (
+					total, total / (time.perf_counter() - start)
+				))
+		except ValueError as error:
+			raise CommandError(error)
+		except OSError as error:
+			raise CommandError('Cannot read %s after %d recipes: %s' % (path, total, error))
+		finally:
+			if stream is not sys.stdin:
+				stream.close()
+			cache.invalidate(Tag, self.user.pk)
+			cache.invalidate(Ingrediant, self.user.pk)
+
+		elapsed = time.perf_counter() - start
+		self.stdout.write(self.style.SUCCESS(
+			'Imported %d recipes in %.2f s (%.0f recipes/s)' % (
+				total, elapsed, total / elapsed if elapsed else 0
+			)
+		))
+
+	def import_chunk(self, chunk):
+		"""Write one chunk of recipes and their links"""
+		recipes = []
+		links = []
+		for line_number, record in chunk:
+			recipe = Recipe(
+				user=self.user,
+				title=record.get('title'),
+				time_minutes=record.get('time_minutes'),
+				price=record.get('price'),
+				link=record.get('link') or '',
+			)
+			try:
+				recipe.full_clean(exclude=('user',))
+				names = (
+					clean_names(record.get('tags')),
+					clean_names(record.get('ingrediants')),
+				)
+			except ValidationError as error:
+				raise CommandError('Line %d: %s' % (line_number, error.messages))
+			recipes.append(recipe)
+			links.append(names)
+
+		tag_ids = self.resolve(Tag, {name for tags, _ in links for name in tags})
+		ingrediant_ids = self.resolve(
+			Ingrediant, {name for _, ingrediants in links for name in ingrediants}
+		)
+
+		if connection.features.can_return_ids_from_bulk_insert:
+			Recipe.objects.bulk_create(recipes)
+		else:
+			for recipe in recipes:
+				recipe.save()
+
+		Recipe.tags.through.objects.bulk_create([
+			Recipe.tags.through(recipe_id=recipe.pk, tag_id=tag_ids[name])
+			for recipe, (tags, _) in zip(recipes, links)
+			for name in tags
+		])
+		Recipe.ingrediants.through.objects.bulk_create([
+			Recipe.ingrediants.through(
+				recipe_id=recipe.pk, ingrediant_id=ingrediant_ids[name]
+			)
+			for recipe, (_, ingrediants) in zip(recipes, links)
+			for name in ingrediants
+		])
+		imported = Recipe.objects.filter(pk__in=[recipe.pk for recipe in recipes])
+		summary.rebuild(imported)
+		search.changed(self.user.pk, imported)
+
+	def resolve(self, model, names):
+		"""Return ids for tag or ingrediant names, creating missing ones"""
+		resolved = self.resolved[model]
+		missing = names.difference(resolved)
+		if missing:
+			self.lookup(model, missing)
+			created = missing.difference(resolved)
+			if created:
+				model.objects.bulk_create(
+					[model(user=self.user, name=name) for name in created]
+				)
+				self.lookup(model, created)
+		return resolved
+
+	def lookup(self, model, names):
+		"""Record the lowest existing id for each of the names"""
+		for batch in recipe_io.chunked(sorted(names), LOOKUP_BATCH_SIZE):
+			rows = model.objects.filter(user=self.user, name__in=batch) \
+				.order_by('-id').values_list('name', 'id')
+			self.resolved[model].update(rows)
+
+
+def clean_names(names):
+	"""Return the distinct, non-empty names of a record field"""
+	if not names:
+		return []
+	if isinstance(names, str):
+		names = names.split(recipe_io.NAME_SEPARATOR)
+	if not isinstance(names, list) or \
+			any(isinstance(name, (list, dict)) for name in names):
+		raise ValidationError('Expected a list of names, got %r.' % (names,))
+	cleaned = []
+	for name in names:
+		name = str(name).strip()[:255]
+		if name and name not in cleaned:
+			cleaned.append(name)
+	return cleaned
@@ -0,0 +1,336 @@
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.urls import URLPattern, URLResolver, reverse
+from rest_framework.authtoken.models import Token
+
+from core import benchmark
+from core.models import Tag, Ingrediant, Recipe
+
+PREFIX = 'load-test'
+PASSWORD = 'benchpass'
+# URL modules whose every route must be driven, with their namespaces
+URLCONFS = (('user.urls', 'user'), ('recipe.urls', 'recipe'))
+
+
+def route_names():
+	"""Return the namespaced name of every route in URLCONFS"""
+	names = set()
+
+	def collect(patterns, namespace):
+		for pattern in patterns:
+			if isinstance(pattern, URLResolver):
+				collect(pattern.url_patterns, namespace)
+			elif isinstance(pattern, URLPattern) and pattern.name:
+				names.add('%s:%s' % (namespace, pattern.name))
+
+	for module, namespace in URLCONFS:
+		collect(__import__(module, fromlist=['urlpatterns']).urlpatterns, namespace)
+	return names
+
+
+class Scenario:
+	"""One request type: a route, a method and how to build its requests"""
+
+	def __init__(self, route, method, build=None, authenticated=True, accept='application/json'):
+		self.route = route
+		self.method = method
+		self.build = build or (lambda owner, index: ((), None))
+		self.authenticated = authenticated
+		self.accept = accept
+
+	def request(self, owner, index):
+		"""Return the method, path, body and headers of the index-th request"""
+		args, body = self.build(owner, index)
+		headers = {'Accept': self.accept}
+		if self.authenticated:
+			headers['Authorization'] = 'Token ' + owner['token']
+		if body is not None:
+			headers['Content-Type'] = 'application/json'
+			body = json.dumps(body)
+		return self.method, reverse(self.route, args=args), body, headers
+
+
+SCENARIOS = (
+	Scenario('user:create', 'POST', lambda owner, index: ((), {
+		'email': '%s-new-%d-%d@example.com' % (PREFIX, os.getpid(), index),
+		'password': PASSWORD,
+		'name': 'Load test',
+	}), authenticated=False),
+	Scenario('user:token', 'POST', lambda owner, index: ((), {
+		'email': owner['email'], 'password': PASSWORD,
+	}), authenticated=False),
+	Scenario('user:me', 'GET'),
+	Scenario('user:me', 'PATCH', lambda owner, index: ((), {'name': 'Load test %d' % index})),
+	Scenario('recipe:api-root', 'GET'),
+	Scenario('recipe:tag-list', 'GET'),
+	Scenario('recipe:tag-list', 'POST', lambda owner, index: ((), {'name': 'Load tag %d' % index})),
+	Scenario('recipe:ingrediant-list', 'GET'),
+	Scenario('recipe:ingrediant-list', 'POST', lambda owner, index: (
+		(), {'name': 'Load ingrediant %d' % index}
+	)),
+	Scenario('recipe:recipe-list', 'GET'),
+	Scenario('recipe:recipe-list', 'POST', lambda owner, index: ((), {
+		'title': 'Load recipe %d' % index,
+		'time_minutes': 10,
+		'price': '5.00',
+		'tags': owner['tags'][:2],
+		'ingrediants': owner['ingrediants'][:3],
+	})),
+	Scenario('recipe:recipe-detail', 'GET', lambda owner, index: (
+		(owner['recipes'][index % len(owner['recipes'])],), None
+	)),
+	Scenario('recipe:recipe-detail', 'PATCH', lambda owner, index: (
+		(owner['recipes'][index % len(owner['recipes'])],), {'title': 'Load recipe %d' % index}
+	)),
+	Scenario('recipe:recipe-add', 'POST', lambda owner, index: (
+		(owner['recipes'][index % len(owner['recipes'])],), {'tags': owner['tags'][-1:]}
+	)),
+	Scenario('recipe:recipe-remove', 'POST', lambda owner, index: (
+		(owner['recipes'][index % len(owner['recipes'])],), {'tags': owner['tags'][-1:]}
+	)),
+	Scenario('recipe:recipe-export', 'GET', accept='application/x-ndjson'),
+)
+
+
+class Command(BaseCommand):
+	help = 'Drive every user and recipe route over HTTP at a fixed concurrency and report latency.'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--users', type=int, default=10, help='Number of users to seed')
+		parser.add_argument('--recipes', type=int, default=200, help='Recipes per user')
+		parser.add_argument('--tags', type=int, default=20, help='Tags per user')
+		parser.add_argument('--ingrediants', type=int, default=40, help='Ingrediants per user')
+		parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients')
+		parser.add_argument('--requests', type=int, default=200, help='Requests per scenario')
+		parser.add_argument('--server', choices=('wsgi', 'asgi'), default='wsgi',
+			help='Start runserver (wsgi) or uvicorn with app.asgi (asgi)')
+		parser.add_argument('--url', help='Drive an already running server instead of starting one')
+		parser.add_argument('--output', help="Write the results as JSON to this file, '-' for stdout")
+		parser.add_argument('--compare', help='Print changes against results saved by --output')
+
+	def handle(self, *args, **kwargs):
+		"""Seed, start a server, run every scenario and clean up
+
+		The server runs in its own process, so seeded rows are committed
+		and deleted again afterwards.
+		"""
+		missing = route_names() - {scenario.route for scenario in SCENARIOS}
+		if missing:
+			raise CommandError('No load test scenario for %s' % ', '.join(sorted(missing)))
+		if not kwargs['url'] and connection.vendor == 'sqlite' and \
+				connection.creation.is_in_memory_db(connection.settings_dict['NAME']):
+			raise CommandError('A started server cannot share an in-memory SQLite database, '
+				'use a database file or --url')
+
+		self.cleanup()
+		try:
+			owners = self.seed(kwargs)
+			if kwargs['url']:
+				results = self.run(kwargs['url'], owners, kwargs)
+			else:
+				with ServerProcess(kwargs['server']) as url:
+					results = self.run(url, owners, kwargs)
+		finally:
+			self.cleanup()
+
+		if kwargs['output'] == '-':
+			self.stdout.write(json.dumps(results, indent=2))
+		elif kwargs['output']:
+			with open(kwargs['output'], 'w') as stream:
+				json.dump(results, stream, indent=2)
+		if kwargs['compare']:
+			with open(kwargs['compare']) as stream:
+				self.compare(json.load(stream), results)
+
+	def cleanup(self):
+		get_user_model().objects.filter(email__startswith=PREFIX + '-').delete()
+
+	def seed(self, kwargs):
+		"""Seed users and return what their requests need"""
+		self.stderr.write('Seeding benchmark data ...')
+		users = benchmark.seed(
+			users=kwargs['users'],
+			recipes=kwargs['recipes'],
+			tags=kwargs['tags'],
+			ingrediants=kwargs['ingrediants'],
+			prefix=PREFIX,
+			password=PASSWORD,
+		)
+		owners = []
+		for user in users:
+			owners.append({
+				'email': user.email,
+				'token': Token.objects.create(user=user).key,
+				'recipes': list(Recipe.objects.filter(user=user).values_list('id', flat=True)),
+				'tags': list(Tag.objects.filter(user=user).values_list('id', flat=True)),
+				'ingrediants': list(
+					Ingrediant.objects.filter(user=user).values_list('id', flat=True)
+				),
+			})
+		return owners
+
+	def run(self, url, owners, kwargs):
+		"""Send every scenario's requests and return the results"""
+		parts = urlsplit(url)
+		address = (parts.hostname, parts.port or 80)
+		results = {
+			'commit': git_commit(),
+			'created': datetime.now(timezone.utc).isoformat(),
+			'settings': settings.SETTINGS_MODULE,
+			'database': connection.vendor,
+			'server': kwargs['url'] or kwargs['server'],
+			'options': {
+				name: kwargs[name] for name in
+				('users', 'recipes', 'tags', 'ingrediants', 'concurrency', 'requests')
+			},
+			'routes': [],
+		}
+		for scenario in SCENARIOS:
+			# One untimed request per scenario warms caches and connections
+			send(address, *scenario.request(owners[0], -1))
+
+			def call(index):
+				return send(address, *scenario.request(owners[index % len(owners)], index))
+
+			started = time.perf_counter()
+			with ThreadPoolExecutor(max_workers=kwargs['concurrency']) as executor:
+				responses = list(executor.map(call, range(kwargs['requests'])))
+			elapsed = time.perf_counter() - started
+			statuses = Counter(str(status) for status, _ in responses)
+			result = {
+				'route': scenario.route,
+				'method': scenario.method,
+				'requests': len(responses),
+				'errors': sum(1 for status, _ in responses if not 200 <= status < 300),
+				'statuses': dict(sorted(statuses.items())),
+				'seconds': elapsed,
+				'throughput': len(responses) / elapsed,
+				'latency': benchmark.summarize([milliseconds for _, milliseconds in responses]),
+			}
+			results['routes'].append(result)
+			self.report(result)
+		return results
+
+	def report(self, result):
+		self.stdout.write(
+			'%-6s %-24s %7.1f req/s, p50 %7.1f ms, p95 %7.1f ms, p99 %7.1f ms, %d errors' % (
+				result['method'],
+				result['route'],
+				result['throughput'],
+				result['latency']['p50'],
+				result['latency']['p95'],
+				result['latency']['p99'],
+				result['errors'],
+			)
+		)
+
+	def compare(self, baseline, results):
+		"""Print throughput and p95 changes of every scenario against a baseline"""
+		self.stdout.write('Compared with %s:' % (baseline.get('commit') or 'baseline'))
+		before = {(row['route'], row['method']): row for row in baseline['routes']}
+		for row in results['routes']:
+			old = before.get((row['route'], row['method']))
+			if old is None:
+				continue
+			self.stdout.write('%-6s %-24s throughput %+6.1f%%, p95 %+6.1f%%' % (
+				row['method'],
+				row['route'],
+				change(old['throughput'], row['throughput']),
+				change(old['latency']['p95'], row['latency']['p95']),
+			))
+
+
+def change(old, new):
+	return (new - old) / old * 100 if old else 0.0
+
+
+def send(address, method, path, body, headers):
+	"""Send one request on a new connection, return (status, milliseconds)
+
+	Connection errors count as status 0.
+	"""
+	started = time.perf_counter()
+	client = http.client.HTTPConnection(*address, timeout=60)
+	try:
+		client.request(method, path, body=body, headers=headers)
+		response = client.getresponse()
+		response.read()
+		status = response.status
+	except (OSError, http.client.HTTPException):
+		status = 0
+	finally:
+		client.close()
+	return status, (time.perf_counter() - started) * 1000
+
+
+def git_commit():
+	try:
+		return subprocess.check_output(
+			['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, stderr=subprocess.DEVNULL
+		).decode().strip()
+	except (OSError, subprocess.CalledProcessError):
+		return None
+
+
+class ServerProcess:
+	"""Context manager running the API in a child process on a free port"""
+
+	def __init__(self, server, timeout=60):
+		self.server = server
+		self.timeout = timeout
+
+	def __enter__(self):
+		with socket.socket() as probe:
+			probe.bind(('127.0.0.1', 0))
+			port = probe.getsockname()[1]
+		if self.server == 'asgi':
+			command = [
+				sys.executable, '-m', 'uvicorn', 'app.asgi:application',
+				'--host', '127.0.0.1', '--port', str(port), '--log-level', 'warning',
+			]
+		else:
+			command = [
+				sys.executable, os.path.join(settings.BASE_DIR, 'manage.py'),
+				'runserver', '--noreload', '127.0.0.1:%d' % port,
+			]
+		environ = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+		self.process = subprocess.Popen(
+			command, cwd=settings.BASE_DIR, env=environ,
+			stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+		)
+		self.wait_until_ready(('127.0.0.1', port))
+		return 'http://127.0.0.1:%d' % port
+
+	def wait_until_ready(self, address):
+		deadline = time.monotonic() + self.timeout
+		while time.monotonic() < deadline:
+			if self.process.poll() is not None:
+				raise CommandError('The %s server exited with status %d'
+					% (self.server, self.process.returncode))
+			if send(address, 'GET', reverse('readyz'), None, {})[0] == 200:
+				return
+			time.sleep(0.2)
+		self.__exit__()
+		raise CommandError('The %s server was not ready after %d seconds' % (self.server, self.timeout))
+
+	def __exit__(self, *exc_info):
+		self.process.terminate()
+		try:
+			self.process.wait(10)
+		except subprocess.TimeoutExpired:
+			self.process.kill()
+			self.process.wait()
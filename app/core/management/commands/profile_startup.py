@@ -0,0 +1,95 @@
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import benchmark
+
+# One line of python -X importtime: self and cumulative microseconds, module
+IMPORT_TIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+class Command(BaseCommand):
+	help = 'Profile cold starts of app.wsgi: import times, AppConfig.ready and the first request.'
+
+	def add_arguments(self, parser):
+		parser.add_argument(
+			'settings_modules', nargs='*',
+			help='Settings modules to compare, by default the current one'
+		)
+		parser.add_argument('--runs', type=int, default=5, help='Cold starts per settings module')
+		parser.add_argument('--top', type=int, default=15, help='Slowest modules and packages to list')
+
+	def handle(self, *args, **kwargs):
+		"""Start fresh interpreters and report where their startup time goes"""
+		if kwargs['runs'] < 1:
+			raise CommandError('--runs must be positive')
+		for module in kwargs['settings_modules'] or [settings.SETTINGS_MODULE]:
+			runs = [self.cold_start(module) for _ in range(kwargs['runs'])]
+			self.report(module, runs, kwargs['top'])
+
+	def cold_start(self, module):
+		"""Return the measurements and import times of one fresh process"""
+		env = dict(os.environ, DJANGO_SETTINGS_MODULE=module)
+		env['PYTHONPATH'] = os.pathsep.join(
+			filter(None, [settings.BASE_DIR, env.get('PYTHONPATH')])
+		)
+		started = time.perf_counter()
+		result = subprocess.run(
+			[sys.executable, '-X', 'importtime', '-m', 'core.startup'],
+			cwd=settings.BASE_DIR, env=env,
+			stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+			universal_newlines=True,
+		)
+		wall = time.perf_counter() - started
+		if result.returncode:
+			errors = [
+				line for line in result.stderr.splitlines()
+				if not line.startswith('import time:')
+			]
+			raise CommandError('Cold start with %s failed:\n%s' % (module, '\n'.join(errors)))
+		measurements = json.loads(result.stdout)
+		measurements['process'] = wall
+		measurements['imports'] = parse_import_times(result.stderr)
+		return measurements
+
+	def report(self, module, runs, top):
+		write = self.stdout.write
+		write(self.style.MIGRATE_HEADING('%s (%d cold starts)' % (module, len(runs))))
+		for name in ('process', 'total', 'import_django', 'setup', 'load_application', 'first_request'):
+			timing = benchmark.summarize([run[name] * 1000 for run in runs])
+			write('  %-17s p50 %8.1f ms  max %8.1f ms' % (name, timing['p50'], timing['max']))
+		write('  first request status: %s' % runs[-1]['status'])
+
+		write('  AppConfig.ready:')
+		labels = sorted(runs[0]['ready'], key=lambda label: -runs[0]['ready'][label])
+		for label in labels:
+			timing = benchmark.summarize([run['ready'].get(label, 0) * 1000 for run in runs])
+			write('    %-22s p50 %8.2f ms' % (label, timing['p50']))
+
+		imports = runs[-1]['imports']
+		write('  Slowest modules (self time, last run):')
+		for name, (own, _) in sorted(imports.items(), key=lambda item: -item[1][0])[:top]:
+			write('    %-50s %8.1f ms' % (name, own / 1000))
+		write('  Slowest top level packages (cumulative, last run):')
+		packages = defaultdict(int)
+		for name, (own, _) in imports.items():
+			packages[name.split('.')[0]] += own
+		for name, total in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+			write('    %-50s %8.1f ms' % (name, total / 1000))
+
+
+def parse_import_times(output):
+	"""Return {module: (self us, cumulative us)} from python -X importtime"""
+	imports = {}
+	for line in output.splitlines():
+		match = IMPORT_TIME_RE.match(line)
+		if match:
+			imports[match.group(4)] = (int(match.group(1)), int(match.group(2)))
+	return imports
@@ -0,0 +1,35 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from core import summary
+from core.models import Recipe
+
+
+class Command(BaseCommand):
+	help = 'Rebuild the denormalized tag and ingrediant summaries of recipes.'
+
+	def add_arguments(self, parser):
+		parser.add_argument('--user', help='Email of the user whose recipes to rebuild, all users by default')
+		parser.add_argument('--missing', action='store_true', help='Only build summaries that were never built')
+		parser.add_argument('--batch-size', type=int, default=summary.BATCH_SIZE, help='Recipes written per UPDATE')
+
+	def handle(self, *args, **kwargs):
+		if kwargs['batch_size'] < 1:
+			raise CommandError('--batch-size must be positive')
+		recipes = Recipe.objects.all()
+		if kwargs['user']:
+			try:
+				user = get_user_model().objects.get(email=kwargs['user'])
+			except get_user_model().DoesNotExist:
+				raise CommandError('User %s does not exist' % kwargs['user'])
+			recipes = recipes.filter(user=user)
+		if kwargs['missing']:
+			recipes = recipes.filter(summary__isnull=True)
+
+		start = time.perf_counter()
+		count = summary.rebuild(recipes, kwargs['batch_size'])
+		self.stdout.write(self.style.SUCCESS(
+			'Rebuilt %d recipe summaries in %.2fs' % (count, time.perf_counter() - start)
+		))
@@ -1,20 +1,39 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.db import connections
 from django.db.utils import OperationalError
 import time
 
+from core import warmup
+
 
 class Command(BaseCommand):
     """ Django command to pause execution until database is available"""
+    help = 'Wait until the database answers a query.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default', help='Database alias to wait for')
+        parser.add_argument('--timeout', type=float, default=60, help='Seconds to wait before giving up')
+        parser.add_argument('--delay', type=float, default=0.5, help='Seconds before the first retry')
+        parser.add_argument('--max-delay', type=float, default=5, help='Longest wait between retries')
+
     def handle(self, *args, **kwargs):
         self.stdout.write('waiting for db ...')
-        db_conn = None
-        while not db_conn:
+        deadline = time.monotonic() + kwargs['timeout']
+        delay = kwargs['delay']
+        while True:
             try:
-                # get the database with keyword 'default' from settings.py
-                db_conn = connections['default']
-                # prints success messge in green
-                self.stdout.write(self.style.SUCCESS('db available'))
-            except OperationalError:
-                self.stdout.write("Database unavailable, waiting 1 second ...")
-                time.sleep(1)
\ No newline at end of file
+                # Opening a connection is not enough, run a real query
+                warmup.check_database(kwargs['database'])
+                break
+            except OperationalError as error:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise CommandError(
+                        'Database unavailable after %s seconds: %s' % (kwargs['timeout'], error)
+                    )
+                wait = min(delay, remaining)
+                self.stdout.write("Database unavailable, waiting %.1f seconds ..." % wait)
+                time.sleep(wait)
+                delay = min(delay * 2, kwargs['max_delay'])
+        # prints success messge in green
+        self.stdout.write(self.style.SUCCESS('db available'))
@@ -0,0 +1,302 @@
+"""Request metrics in the Prometheus text format
+
+Every process aggregates its observations in memory. When a DIRECTORY
+is configured in settings.METRICS, processes also write a snapshot there
+at most every FLUSH_INTERVAL seconds. /metrics then sums the snapshots
+of all processes, so a scrape sees every worker, at most one flush
+interval late. Without a directory, only the current process is
+reported. Snapshots also sample the password hashing pool and the
+database connection pools, summed over processes: statistics that only
+grow are counters, the others gauges. A process that has exited keeps
+its counters in the totals, but its last gauge sample is ignored.
+
+/metrics is only served to addresses in ALLOWED_NETWORKS, or to callers
+sending "Authorization: Bearer <TOKEN>" when a TOKEN is configured.
+"""
+import hmac
+import ipaddress
+import json
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+
+from core import hashing
+from core.db import pool
+
+DEFAULTS = {
+	'DIRECTORY': None,
+	'FLUSH_INTERVAL': 5,
+	# Networks whose REMOTE_ADDR may scrape without a token
+	'ALLOWED_NETWORKS': ('127.0.0.1/32', '::1/128'),
+	'TOKEN': None,
+}
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+HISTOGRAMS = {
+	'http_request_duration_seconds': ('Request latency by route', LATENCY_BUCKETS),
+	'http_response_size_bytes': ('Response body size by route', SIZE_BUCKETS),
+	'http_request_sql_queries': ('SQL queries per request by route', QUERY_BUCKETS),
+}
+COUNTERS = {
+	'http_requests_total': 'Requests by route and status',
+	'http_request_sql_queries_total': 'SQL queries run by route',
+	'http_request_sql_seconds_total': 'Seconds spent in SQL by route',
+}
+# Pools sampled on every snapshot, one series per statistic of metrics()
+GAUGES = {
+	'password_hashing_pool': 'Password hashing pool, see core.hashing',
+	'db_connection_pool': 'Database connection pool, see core.db.pool',
+}
+# Pool statistics that only grow, rendered as <pool>_<statistic>_total counters
+CUMULATIVE = frozenset((
+	'completed', 'rejected', 'run_seconds', 'wait_seconds',
+	'borrows', 'connects', 'closes', 'failed_checks', 'timeouts',
+))
+
+
+class Registry:
+	"""Thread-safe histograms and counters keyed on label tuples"""
+
+	def __init__(self):
+		self._lock = threading.Lock()
+		self._histograms = {name: {} for name in HISTOGRAMS}
+		self._counters = {name: {} for name in COUNTERS}
+
+	def observe(self, name, labels, value):
+		buckets = HISTOGRAMS[name][1]
+		with self._lock:
+			series = self._histograms[name].get(labels)
+			if series is None:
+				series = self._histograms[name][labels] = [0] * len(buckets) + [0, 0]
+			for index, bound in enumerate(buckets):
+				if value <= bound:
+					series[index] += 1
+			series[-2] += value
+			series[-1] += 1
+
+	def inc(self, name, labels, amount=1):
+		with self._lock:
+			counters = self._counters[name]
+			counters[labels] = counters.get(labels, 0) + amount
+
+	def snapshot(self):
+		"""Return the aggregates as JSON serializable data"""
+		with self._lock:
+			return {
+				'histograms': {
+					name: [[list(labels), list(values)] for labels, values in series.items()]
+					for name, series in self._histograms.items()
+				},
+				'counters': {
+					name: [[list(labels), value] for labels, value in series.items()]
+					for name, series in self._counters.items()
+				},
+			}
+
+
+def sample_pools():
+	"""Return [[gauge, labels, {statistic: value}]] for the pools of this process"""
+	samples = [['password_hashing_pool', [], hashing.get_pool().metrics()]]
+	for key, connection_pool in pool.all_pools():
+		samples.append(
+			['db_connection_pool', [['database', key[0]]], connection_pool.metrics()]
+		)
+	return samples
+
+
+def merge(snapshots):
+	"""Sum snapshots of several processes into {kind: {name: {labels: values}}}"""
+	merged = {
+		'histograms': {name: {} for name in HISTOGRAMS},
+		'counters': {name: {} for name in COUNTERS},
+		'gauges': {name: {} for name in GAUGES},
+	}
+	for snapshot in snapshots:
+		for name, labels, values in snapshot.get('gauges', []):
+			target = merged['gauges'].get(name)
+			if target is None:
+				continue
+			labels = tuple(tuple(pair) for pair in labels)
+			current = target.setdefault(labels, {})
+			for statistic, value in values.items():
+				current[statistic] = current.get(statistic, 0) + value
+		for name, series in snapshot.get('histograms', {}).items():
+			target = merged['histograms'].get(name)
+			if target is None:
+				continue
+			for labels, values in series:
+				labels = tuple(tuple(pair) for pair in labels)
+				current = target.get(labels)
+				target[labels] = values if current is None else \
+					[a + b for a, b in zip(current, values)]
+		for name, series in snapshot.get('counters', {}).items():
+			target = merged['counters'].get(name)
+			if target is None:
+				continue
+			for labels, value in series:
+				labels = tuple(tuple(pair) for pair in labels)
+				target[labels] = target.get(labels, 0) + value
+	return merged
+
+
+def format_labels(labels, extra=()):
+	pairs = list(labels) + list(extra)
+	if not pairs:
+		return ''
+	return '{%s}' % ','.join(
+		'%s="%s"' % (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+		for key, value in pairs
+	)
+
+
+def format_value(value):
+	if isinstance(value, float) and value == int(value) and abs(value) < 1e15:
+		return '%d' % value
+	return repr(value) if isinstance(value, float) else str(value)
+
+
+def render(merged):
+	"""Return merged aggregates in the Prometheus text exposition format"""
+	lines = []
+	for name, (description, buckets) in HISTOGRAMS.items():
+		lines.append('# HELP %s %s' % (name, description))
+		lines.append('# TYPE %s histogram' % name)
+		for labels, values in sorted(merged['histograms'][name].items()):
+			for bound, count in zip(buckets, values):
+				lines.append('%s_bucket%s %d' % (
+					name, format_labels(labels, [('le', format_value(float(bound)))]), count
+				))
+			lines.append('%s_bucket%s %d' % (name, format_labels(labels, [('le', '+Inf')]), values[-1]))
+			lines.append('%s_sum%s %s' % (name, format_labels(labels), format_value(values[-2])))
+			lines.append('%s_count%s %d' % (name, format_labels(labels), values[-1]))
+	for name, description in COUNTERS.items():
+		lines.append('# HELP %s %s' % (name, description))
+		lines.append('# TYPE %s counter' % name)
+		for labels, value in sorted(merged['counters'][name].items()):
+			lines.append('%s%s %s' % (name, format_labels(labels), format_value(value)))
+	for name, description in GAUGES.items():
+		series = merged['gauges'][name]
+		statistics = sorted({statistic for values in series.values() for statistic in values})
+		for statistic in statistics:
+			metric, kind = '%s_%s' % (name, statistic), 'gauge'
+			if statistic in CUMULATIVE:
+				metric, kind = metric + '_total', 'counter'
+			lines.append('# HELP %s %s: %s' % (metric, description, statistic))
+			lines.append('# TYPE %s %s' % (metric, kind))
+			for labels, values in sorted(series.items()):
+				if statistic in values:
+					lines.append('%s%s %s' % (
+						metric, format_labels(labels), format_value(values[statistic])
+					))
+	return '\n'.join(lines) + '\n'
+
+
+def get_settings():
+	options = dict(DEFAULTS)
+	options.update(getattr(settings, 'METRICS', {}))
+	return options
+
+
+def scrape_allowed(request):
+	"""Return whether a request may read the metrics"""
+	options = get_settings()
+	if options['TOKEN']:
+		expected = 'Bearer %s' % options['TOKEN']
+		if hmac.compare_digest(request.META.get('HTTP_AUTHORIZATION', ''), expected):
+			return True
+	try:
+		address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+	except ValueError:
+		return False
+	return any(
+		address in ipaddress.ip_network(network) for network in options['ALLOWED_NETWORKS']
+	)
+
+
+registry = Registry()
+_flush_lock = threading.Lock()
+_last_flush = [0.0]
+
+
+def process_snapshot():
+	"""Return the aggregates of this process with its pools sampled"""
+	snapshot = registry.snapshot()
+	snapshot['gauges'] = sample_pools()
+	return snapshot
+
+
+def snapshot_path(directory, pid=None):
+	return os.path.join(directory, 'metrics-%d.json' % (pid or os.getpid()))
+
+
+def is_running(pid):
+	try:
+		os.kill(pid, 0)
+	except ProcessLookupError:
+		return False
+	except PermissionError:
+		pass
+	return True
+
+
+def without_gauges(snapshot):
+	"""Return a snapshot of an exited process, keeping only its counters"""
+	gauges = []
+	for name, labels, values in snapshot.get('gauges', []):
+		values = {
+			statistic: value for statistic, value in values.items()
+			if statistic in CUMULATIVE
+		}
+		gauges.append([name, labels, values])
+	return dict(snapshot, gauges=gauges)
+
+
+def flush(force=False):
+	"""Write this process's snapshot if the flush interval has passed"""
+	options = get_settings()
+	directory = options['DIRECTORY']
+	if not directory:
+		return
+	now = time.monotonic()
+	if not force and now - _last_flush[0] < options['FLUSH_INTERVAL']:
+		return
+	if not _flush_lock.acquire(blocking=False):
+		return
+	try:
+		_last_flush[0] = now
+		os.makedirs(directory, exist_ok=True)
+		# Replace atomically so readers never see a partial file
+		handle, temporary = tempfile.mkstemp(dir=directory, prefix='.metrics-')
+		with os.fdopen(handle, 'w') as stream:
+			json.dump(process_snapshot(), stream)
+		os.replace(temporary, snapshot_path(directory))
+	finally:
+		_flush_lock.release()
+
+
+def collect():
+	"""Return the merged snapshots of every process"""
+	directory = get_settings()['DIRECTORY']
+	if not directory:
+		return merge([process_snapshot()])
+	flush(force=True)
+	snapshots = []
+	for name in sorted(os.listdir(directory)):
+		if not (name.startswith('metrics-') and name.endswith('.json')):
+			continue
+		try:
+			with open(os.path.join(directory, name)) as stream:
+				snapshot = json.load(stream)
+		except (OSError, ValueError):
+			continue
+		pid = name[len('metrics-'):-len('.json')]
+		if pid.isdigit() and not is_running(int(pid)):
+			snapshot = without_gauges(snapshot)
+		snapshots.append(snapshot)
+	return merge(snapshots)
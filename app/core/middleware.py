@@ -0,0 +1,94 @@
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from core import metrics
+
+# Label of requests no URL pattern matched
+UNMATCHED = '<unmatched>'
+
+
+class QueryRecorder:
+	"""Database execute wrapper counting queries and the time spent in them"""
+
+	def __init__(self):
+		self.count = 0
+		self.seconds = 0.0
+
+	def __call__(self, execute, sql, params, many, context):
+		started = time.perf_counter()
+		try:
+			return execute(sql, params, many, context)
+		finally:
+			self.count += 1
+			self.seconds += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+	"""Record latency, response size and SQL use of every request, see core.metrics
+
+	Requests are labelled with the name of the view they were routed to,
+	so /recipes/1/ and /recipes/2/ share one series. Install it first so
+	the latency includes every other middleware.
+	"""
+
+	def __init__(self, get_response):
+		self.get_response = get_response
+
+	def __call__(self, request):
+		recorder = QueryRecorder()
+		started = time.perf_counter()
+		with ExitStack() as stack:
+			for connection in connections.all():
+				stack.enter_context(connection.execute_wrapper(recorder))
+			response = self.get_response(request)
+			# A streaming body runs its queries after this returns
+			wrappers = stack.pop_all() if response.streaming else ExitStack()
+		elapsed = time.perf_counter() - started
+
+		match = getattr(request, 'resolver_match', None)
+		route = match.view_name if match is not None else UNMATCHED
+		if route == 'metrics':
+			wrappers.close()
+			return response
+		labels = (
+			('route', route),
+			('method', request.method),
+			('status', str(response.status_code)),
+		)
+		registry = metrics.registry
+		registry.observe('http_request_duration_seconds', labels, elapsed)
+		registry.inc('http_requests_total', labels)
+		if response.streaming:
+			response.streaming_content = self.measure_stream(
+				response.streaming_content, labels, recorder, wrappers
+			)
+		else:
+			self.record_queries(labels, recorder)
+			registry.observe('http_response_size_bytes', labels, len(response.content))
+			metrics.flush()
+		return response
+
+	def record_queries(self, labels, recorder):
+		registry = metrics.registry
+		registry.observe('http_request_sql_queries', labels, recorder.count)
+		registry.inc('http_request_sql_queries_total', labels, recorder.count)
+		registry.inc('http_request_sql_seconds_total', labels, recorder.seconds)
+
+	def measure_stream(self, content, labels, recorder, wrappers):
+		"""Yield a streaming response, recording its size and queries once sent
+
+		The query wrappers stay installed until the body is done or the
+		client went away; the body is generated on the request's thread.
+		"""
+		size = 0
+		try:
+			for chunk in content:
+				size += len(chunk)
+				yield chunk
+		finally:
+			wrappers.close()
+			self.record_queries(labels, recorder)
+			metrics.registry.observe('http_response_size_bytes', labels, size)
+			metrics.flush()
@@ -0,0 +1,45 @@
+# Generated by Django 2.1.15 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_recipe'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', '-name', 'id'], name='core_tag_user_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['user', 'id'], name='core_tag_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ingrediant',
+            index=models.Index(fields=['user', '-name', 'id'], name='core_ingr_user_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ingrediant',
+            index=models.Index(fields=['user', 'id'], name='core_ingr_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['user', '-id'], name='core_recipe_user_id_idx'),
+        ),
+        # The auto-created through tables only index (recipe_id, tag_id);
+        # lookups starting from a tag or ingrediant need the reverse order.
+        migrations.RunSQL(
+            ['CREATE INDEX core_recipe_tags_tag_idx '
+             'ON core_recipe_tags (tag_id, recipe_id)'],
+            ['DROP INDEX core_recipe_tags_tag_idx'],
+        ),
+        migrations.RunSQL(
+            ['CREATE INDEX core_recipe_ingr_ingr_idx '
+             'ON core_recipe_ingrediants (ingrediant_id, recipe_id)'],
+            ['DROP INDEX core_recipe_ingr_ingr_idx'],
+        ),
+    ]
@@ -0,0 +1,54 @@
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Frozen copy of core.search.update_vectors for every recipe, as the
+# tables stood at this migration
+FILL_SEARCH_VECTORS = """
+UPDATE core_recipe SET search_vector =
+    setweight(to_tsvector('english', core_recipe.title), 'A')
+    || setweight(to_tsvector('english', coalesce((
+        SELECT string_agg(r.name, ' ') FROM core_tag r
+        JOIN core_recipe_tags t ON t.tag_id = r.id
+        WHERE t.recipe_id = core_recipe.id), '')), 'B')
+    || setweight(to_tsvector('english', coalesce((
+        SELECT string_agg(r.name, ' ') FROM core_ingrediant r
+        JOIN core_recipe_ingrediants t ON t.ingrediant_id = r.id
+        WHERE t.recipe_id = core_recipe.id), '')), 'C')
+"""
+
+
+def create_search_indexes(apps, schema_editor):
+    """Add the PostgreSQL search indexes and fill in every search vector"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute(
+        'CREATE INDEX core_recipe_search_idx ON core_recipe USING GIN (search_vector)'
+    )
+    schema_editor.execute(
+        'CREATE INDEX core_recipe_title_trgm_idx ON core_recipe USING GIN (title gin_trgm_ops)'
+    )
+    schema_editor.execute(FILL_SEARCH_VECTORS)
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS core_recipe_title_trgm_idx')
+    schema_editor.execute('DROP INDEX IF EXISTS core_recipe_search_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
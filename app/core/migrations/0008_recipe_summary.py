@@ -0,0 +1,23 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_recipe_search'),
+    ]
+
+    # Existing recipes are added as NULL, to be filled in by the
+    # rebuild_recipe_summaries command; only new recipes start empty.
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='summary',
+            field=models.TextField(editable=False, null=True),
+        ),
+        migrations.AlterField(
+            model_name='recipe',
+            name='summary',
+            field=models.TextField(default='{"tags":[],"ingrediants":[]}', editable=False, null=True),
+        ),
+    ]
@@ -1,6 +1,9 @@
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
+
+from core import hashing
 
 
 class UserManager (BaseUserManager):
@@ -35,6 +38,21 @@ class User(AbstractBaseUser, PermissionsMixin):
 	
 	USERNAME_FIELD = 'email'
 	
+	def set_password(self, raw_password):
+		"""Hash the password on the bounded hashing pool"""
+		self.password = hashing.make_password(raw_password)
+		self._password = raw_password
+	
+	def check_password(self, raw_password):
+		"""Check the password on the hashing pool, upgrading stale hashes"""
+		is_correct, must_update = hashing.check_password(raw_password, self.password)
+		if is_correct and must_update:
+			self.set_password(raw_password)
+			# Hash upgrades shouldn't be considered password changes
+			self._password = None
+			self.save(update_fields=['password'])
+		return is_correct
+	
 class Tag(models.Model):
 	"""Tag to be used for a recipe"""
 	name = models.CharField(max_length=255)
@@ -42,6 +60,13 @@ class Tag(models.Model):
 		settings.AUTH_USER_MODEL,
 		on_delete=models.CASCADE,
 	)
+	updated_at = models.DateTimeField(auto_now=True)
+	
+	class Meta:
+		indexes = [
+			models.Index(fields=['user', '-name', 'id'], name='core_tag_user_name_idx'),
+			models.Index(fields=['user', 'id'], name='core_tag_user_id_idx'),
+		]
 	
 	def __str__(self):
 		return self.name 
@@ -53,10 +78,20 @@ class Ingrediant(models.Model):
 		settings.AUTH_USER_MODEL,
 		on_delete=models.CASCADE,
 	)
+	updated_at = models.DateTimeField(auto_now=True)
+	
+	class Meta:
+		indexes = [
+			models.Index(fields=['user', '-name', 'id'], name='core_ingr_user_name_idx'),
+			models.Index(fields=['user', 'id'], name='core_ingr_user_id_idx'),
+		]
 	
 	def __str__(self):
 		return self.name
 		
+# Summary of a recipe without tags or ingrediants, see core.summary
+EMPTY_SUMMARY = '{"tags":[],"ingrediants":[]}'
+
 class Recipe(models.Model):
 	"""Recipe object"""
 	user = models.ForeignKey(
@@ -69,7 +104,36 @@ class Recipe(models.Model):
 	link = models.CharField(max_length=255, blank=True)
 	ingrediants = models.ManyToManyField('Ingrediant')
 	tags=models.ManyToManyField('Tag')
+	updated_at = models.DateTimeField(auto_now=True)
+	# Maintained by core.search on PostgreSQL, unused elsewhere
+	search_vector = SearchVectorField(null=True, editable=False)
+	# Tag and ingrediant ids and names, maintained by core.summary
+	summary = models.TextField(null=True, editable=False, default=EMPTY_SUMMARY)
+	
+	# Columns only written by the queryset updates of their maintainers
+	derived_fields = ('search_vector', 'summary')
+	
+	class Meta:
+		indexes = [
+			models.Index(fields=['user', '-id'], name='core_recipe_user_id_idx'),
+		]
 	
 	def __str__(self):
 		return self.title
+	
+	def save(self, *args, **kwargs):
+		"""Save the recipe, leaving the derived columns alone
+		
+		An instance holds the derived columns as they were when it was
+		loaded, so saving them would undo later rebuilds.
+		"""
+		if not self._state.adding and not kwargs.get('force_insert') \
+				and kwargs.get('update_fields') is None:
+			skipped = set(self.derived_fields) | self.get_deferred_fields()
+			kwargs['update_fields'] = [
+				field.name for field in self._meta.concrete_fields
+				if not field.primary_key and field.attname not in skipped
+				and field.name not in skipped
+			]
+		super().save(*args, **kwargs)
 	
\ No newline at end of file
@@ -0,0 +1,112 @@
+"""Reading and writing recipes as NDJSON or CSV streams"""
+import csv
+import json
+import os
+from itertools import islice
+
+from django.db.models import prefetch_related_objects
+
+FORMATS = ('ndjson', 'csv')
+FIELDS = ('title', 'time_minutes', 'price', 'link', 'tags', 'ingrediants')
+EXPORT_FIELDS = ('id',) + FIELDS
+# Separates tag and ingrediant names inside a single CSV column
+NAME_SEPARATOR = '|'
+
+
+def guess_format(path, default='ndjson'):
+	"""Return the format implied by a file extension"""
+	extension = os.path.splitext(path)[1].lower().lstrip('.')
+	if extension in ('json', 'jsonl', 'ndjson'):
+		return 'ndjson'
+	if extension == 'csv':
+		return 'csv'
+	return default
+
+
+def read_records(stream, fmt):
+	"""Yield (line number, record) pairs one line at a time
+
+	Tags and ingrediants are always returned as lists of names.
+	"""
+	if fmt == 'csv':
+		reader = csv.DictReader(stream)
+		try:
+			for record in reader:
+				for field in ('tags', 'ingrediants'):
+					names = record.get(field) or ''
+					record[field] = [
+						name for name in names.split(NAME_SEPARATOR) if name
+					]
+				yield reader.line_num, record
+		except csv.Error as error:
+			# line_num does not count the line being parsed yet
+			raise ValueError('line %d: %s' % (reader.line_num + 1, error))
+		return
+
+	for line_number, line in enumerate(stream, 1):
+		if not line.strip():
+			continue
+		try:
+			record = json.loads(line)
+		except ValueError as error:
+			raise ValueError('line %d: %s' % (line_number, error))
+		if not isinstance(record, dict):
+			raise ValueError('line %d: expected a JSON object' % line_number)
+		yield line_number, record
+
+
+def chunked(iterable, size):
+	"""Yield lists of at most size items without reading further ahead"""
+	iterator = iter(iterable)
+	while True:
+		chunk = list(islice(iterator, size))
+		if not chunk:
+			return
+		yield chunk
+
+
+def export_records(queryset, chunk_size=500):
+	"""Yield export records, prefetching names one chunk at a time
+
+	Rows are read with a server-side cursor where the backend has one,
+	so only a single chunk of recipes is held in memory.
+	"""
+	for chunk in chunked(queryset.iterator(chunk_size=chunk_size), chunk_size):
+		prefetch_related_objects(chunk, 'tags', 'ingrediants')
+		for recipe in chunk:
+			yield {
+				'id': recipe.id,
+				'title': recipe.title,
+				'time_minutes': recipe.time_minutes,
+				'price': str(recipe.price),
+				'link': recipe.link,
+				'tags': sorted(tag.name for tag in recipe.tags.all()),
+				'ingrediants': sorted(
+					ingrediant.name for ingrediant in recipe.ingrediants.all()
+				),
+			}
+
+
+def ndjson_lines(records):
+	"""Yield one JSON document per record"""
+	for record in records:
+		yield json.dumps(record, ensure_ascii=False) + '\n'
+
+
+class _LineBuffer:
+	"""File-like object handing back whatever csv.writer writes"""
+
+	def write(self, value):
+		return value
+
+
+def csv_lines(records):
+	"""Yield a header and one CSV row per record"""
+	writer = csv.writer(_LineBuffer())
+	yield writer.writerow(EXPORT_FIELDS)
+	for record in records:
+		yield writer.writerow([
+			NAME_SEPARATOR.join(record[field])
+			if field in ('tags', 'ingrediants') else record[field]
+			for field in EXPORT_FIELDS
+		])
@@ -0,0 +1,207 @@
+"""Recipe search over titles and tag and ingrediant names
+
+On PostgreSQL every recipe keeps a search_vector column, weighted title
+first, behind a GIN index. Other backends fall back to an inverted index
+built in process per user. Both match a recipe when every query term
+matches it, and a term matches a word of the title, a tag name or an
+ingrediant name whose trigram similarity to it reaches
+SIMILARITY_THRESHOLD; PostgreSQL compares with strict_word_similarity
+(pg_trgm 1.4, PostgreSQL 11). PostgreSQL also matches a term whose
+stem is in the search vector, so it can find recipes the fallback
+misses, never fewer.
+"""
+import re
+import threading
+from collections import Counter, defaultdict
+
+from django.contrib.postgres.search import SearchQuery
+from django.db import connection
+from django.db.models import FloatField, Func, Q, Value
+
+from core.lru import LRUCache
+from core.models import Recipe
+
+# Text search configuration of the search vectors
+SEARCH_CONFIG = 'english'
+# Lowest trigram similarity counted as a match, pg_trgm's default
+SIMILARITY_THRESHOLD = 0.3
+# Users whose fallback index is kept, and for how many seconds
+INDEX_MAX_ENTRIES = 100
+INDEX_TTL = 300
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def is_indexed():
+	"""Return whether the database maintains search vectors"""
+	return connection.vendor == 'postgresql'
+
+
+class TrigramStrictWordSimilarity(Func):
+	"""Trigram similarity of a string to its closest run of whole words"""
+	function = 'STRICT_WORD_SIMILARITY'
+	output_field = FloatField()
+
+	def __init__(self, string, expression, **extra):
+		super().__init__(Value(string), expression, **extra)
+
+
+def search(queryset, query, user_id):
+	"""Filter recipes of a user to those matching a search query"""
+	if not is_indexed():
+		return queryset.filter(pk__in=get_index(user_id).search(query))
+	terms = tokenize(query)
+	if not terms:
+		return queryset.none()
+	for term in terms:
+		queryset = queryset.filter(term_matches(term, user_id))
+	return queryset
+
+
+def term_matches(term, user_id):
+	"""Return a Q of the user's recipes matching one search term
+
+	The fuzzy part reads the same rows as documents(), so it matches what
+	the fallback index matches.
+	"""
+	matches = Q(search_vector=SearchQuery(term, config=SEARCH_CONFIG))
+	for rows, recipe, name in sources(user_id):
+		similar = rows.annotate(similarity=TrigramStrictWordSimilarity(term, name)) \
+			.filter(similarity__gte=SIMILARITY_THRESHOLD)
+		matches |= Q(pk__in=similar.values(recipe))
+	return matches
+
+
+def changed(user_id, recipes=None):
+	"""Reindex recipes whose title, tags or ingrediants changed
+
+	Without search vectors this forgets the user's fallback index, which
+	is rebuilt by the next search.
+	"""
+	if not is_indexed():
+		get_index_cache().delete(user_id)
+	elif recipes is not None:
+		update_vectors(recipes)
+
+
+def update_vectors(recipes):
+	"""Recompute the search vectors of a queryset of recipes in one UPDATE"""
+	ids_sql, params = recipes.values('pk').query.sql_with_params()
+	qn = connection.ops.quote_name
+	names = []
+	for field in ('tags', 'ingrediants'):
+		related = Recipe._meta.get_field(field).related_model
+		through = Recipe._meta.get_field(field).remote_field.through
+		names.append(
+			"coalesce((SELECT string_agg(r.name, ' ') FROM {related} r"
+			" JOIN {through} t ON t.{column} = r.id"
+			" WHERE t.{recipe_column} = {recipe}.id), '')".format(
+				related=qn(related._meta.db_table),
+				through=qn(through._meta.db_table),
+				column=qn(through._meta.get_field(related._meta.model_name).column),
+				recipe_column=qn(through._meta.get_field('recipe').column),
+				recipe=qn(Recipe._meta.db_table),
+			)
+		)
+	sql = (
+		"UPDATE {recipe} SET search_vector ="
+		" setweight(to_tsvector(%s, {recipe}.title), 'A')"
+		" || setweight(to_tsvector(%s, {tags}), 'B')"
+		" || setweight(to_tsvector(%s, {ingrediants}), 'C')"
+		" WHERE {recipe}.id IN ({ids})".format(
+			recipe=qn(Recipe._meta.db_table),
+			tags=names[0],
+			ingrediants=names[1],
+			ids=ids_sql,
+		)
+	)
+	with connection.cursor() as cursor:
+		cursor.execute(sql, [SEARCH_CONFIG] * 3 + list(params))
+
+
+def tokenize(text):
+	return TOKEN_RE.findall(text.lower())
+
+
+def trigrams(token):
+	"""Return the trigrams of a token, padded the way pg_trgm pads words"""
+	padded = '  %s ' % token
+	return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+
+class InvertedIndex:
+	"""Token to recipe postings, with a trigram index over the tokens"""
+
+	def __init__(self, documents):
+		self.postings = defaultdict(set)
+		for pk, text in documents:
+			for token in tokenize(text):
+				self.postings[token].add(pk)
+		self.grams = {token: trigrams(token) for token in self.postings}
+		self.tokens_by_gram = defaultdict(set)
+		for token, grams in self.grams.items():
+			for gram in grams:
+				self.tokens_by_gram[gram].add(token)
+
+	def similar(self, term):
+		"""Return the indexed tokens close enough to a search term"""
+		grams = trigrams(term)
+		shared = Counter(
+			token for gram in grams for token in self.tokens_by_gram.get(gram, ())
+		)
+		return [
+			token for token, count in shared.items()
+			if count / (len(grams) + len(self.grams[token]) - count)
+			>= SIMILARITY_THRESHOLD
+		]
+
+	def search(self, query):
+		"""Return the ids of documents matching every term of a query"""
+		matches = None
+		for term in tokenize(query):
+			ids = set()
+			for token in self.similar(term):
+				ids |= self.postings[token]
+			matches = ids if matches is None else matches & ids
+			if not matches:
+				break
+		return matches or set()
+
+
+_index_cache = None
+_index_cache_lock = threading.Lock()
+
+
+def get_index_cache():
+	global _index_cache
+	if _index_cache is None:
+		with _index_cache_lock:
+			if _index_cache is None:
+				_index_cache = LRUCache(INDEX_MAX_ENTRIES, INDEX_TTL)
+	return _index_cache
+
+
+def get_index(user_id):
+	"""Return the fallback index of a user's recipes, building it if needed"""
+	index_cache = get_index_cache()
+	index = index_cache.get(user_id)
+	if index is None:
+		index = InvertedIndex(documents(user_id))
+		index_cache.set(user_id, index)
+	return index
+
+
+def sources(user_id):
+	"""Return (rows, recipe id field, text field) of the searched text of a user"""
+	return (
+		(Recipe.objects.filter(user_id=user_id), 'id', 'title'),
+		(Recipe.tags.through.objects.filter(recipe__user_id=user_id), 'recipe_id', 'tag__name'),
+		(Recipe.ingrediants.through.objects.filter(recipe__user_id=user_id),
+			'recipe_id', 'ingrediant__name'),
+	)
+
+
+def documents(user_id):
+	"""Yield (recipe id, text) pairs for every recipe of a user"""
+	for rows, recipe, name in sources(user_id):
+		yield from rows.values_list(recipe, name)
@@ -0,0 +1,75 @@
+"""Keep derived recipe columns in step with their relations"""
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core import search, summary
+from core.models import Tag, Ingrediant, Recipe
+
+
+def touch_recipes(recipes):
+	"""Bump updated_at so cached representations of the recipes expire"""
+	recipes.update(updated_at=timezone.now())
+
+
+def relations_changed(user_id, recipes):
+	"""Rebuild what is derived from the tags and ingrediants of recipes"""
+	summary.rebuild(recipes)
+	search.changed(user_id, recipes)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingrediants.through)
+def touch_on_relation_change(sender, instance, action, reverse, pk_set, **kwargs):
+	"""Touch the recipes whose tags or ingrediants were changed"""
+	if not reverse:
+		if action in ('post_add', 'post_remove', 'post_clear'):
+			recipes = Recipe.objects.filter(pk=instance.pk)
+			touch_recipes(recipes)
+			relations_changed(instance.user_id, recipes)
+	elif action in ('post_add', 'post_remove'):
+		recipes = Recipe.objects.filter(pk__in=pk_set)
+		touch_recipes(recipes)
+		relations_changed(instance.user_id, recipes)
+	elif action == 'pre_clear':
+		# The cleared recipes are unknown once the rows are gone
+		instance._cleared_recipe_ids = list(instance.recipe_set.values_list('pk', flat=True))
+		touch_recipes(Recipe.objects.filter(pk__in=instance._cleared_recipe_ids))
+	elif action == 'post_clear':
+		relations_changed(
+			instance.user_id,
+			Recipe.objects.filter(pk__in=instance.__dict__.pop('_cleared_recipe_ids', []))
+		)
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingrediant)
+def touch_on_related_delete(sender, instance, **kwargs):
+	"""Touch the recipes losing a tag or ingrediant that is deleted"""
+	instance._deleted_recipe_ids = list(instance.recipe_set.values_list('pk', flat=True))
+	touch_recipes(Recipe.objects.filter(pk__in=instance._deleted_recipe_ids))
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingrediant)
+def reindex_on_related_delete(sender, instance, **kwargs):
+	"""Reindex the recipes that lost a deleted tag or ingrediant"""
+	relations_changed(
+		instance.user_id,
+		Recipe.objects.filter(pk__in=instance.__dict__.pop('_deleted_recipe_ids', []))
+	)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingrediant)
+def reindex_on_related_save(sender, instance, created, **kwargs):
+	"""Reindex the recipes of a renamed tag or ingrediant"""
+	if not created:
+		relations_changed(instance.user_id, instance.recipe_set.all())
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def reindex_recipe(sender, instance, **kwargs):
+	"""Reindex a saved recipe, or forget a deleted one"""
+	search.changed(instance.user_id, Recipe.objects.filter(pk=instance.pk))
@@ -0,0 +1,78 @@
+"""Measure one cold start of the WSGI application
+
+Run in a fresh interpreter by the profile_startup command, usually with
+``python -X importtime -m core.startup``. Times django.setup, every
+AppConfig.ready, loading app.wsgi and the first request, and prints them
+as JSON on stdout.
+"""
+import json
+import os
+import sys
+import time
+from io import BytesIO
+
+
+def main():
+	started = time.perf_counter()
+	os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'app.settings')
+
+	import django
+	from django.apps.config import AppConfig
+
+	ready = {}
+	create = AppConfig.create.__func__
+
+	def timed_create(cls, entry):
+		app_config = create(cls, entry)
+		original = app_config.ready
+
+		def timed_ready():
+			start = time.perf_counter()
+			original()
+			ready[app_config.label] = time.perf_counter() - start
+
+		app_config.ready = timed_ready
+		return app_config
+
+	AppConfig.create = classmethod(timed_create)
+	imported = time.perf_counter()
+
+	django.setup(set_prefix=False)
+	setup = time.perf_counter()
+
+	# get_wsgi_application runs django.setup again, which is then a no-op
+	from app.wsgi import application
+	loaded = time.perf_counter()
+
+	status = []
+	application({
+		'REQUEST_METHOD': 'GET',
+		'PATH_INFO': '/healthz',
+		'QUERY_STRING': '',
+		'SERVER_NAME': 'localhost',
+		'SERVER_PORT': '80',
+		'SERVER_PROTOCOL': 'HTTP/1.1',
+		'wsgi.version': (1, 0),
+		'wsgi.url_scheme': 'http',
+		'wsgi.input': BytesIO(),
+		'wsgi.errors': sys.stderr,
+		'wsgi.multithread': True,
+		'wsgi.multiprocess': True,
+		'wsgi.run_once': False,
+	}, lambda value, headers, exc_info=None: status.append(value))
+	finished = time.perf_counter()
+
+	json.dump({
+		'settings': os.environ['DJANGO_SETTINGS_MODULE'],
+		'import_django': imported - started,
+		'setup': setup - imported,
+		'ready': ready,
+		'load_application': loaded - setup,
+		'first_request': finished - loaded,
+		'total': finished - started,
+		'status': status[0] if status else None,
+	}, sys.stdout)
+
+
+if __name__ == '__main__':
+	main()
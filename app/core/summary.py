@@ -0,0 +1,55 @@
+"""Denormalized tag and ingrediant summaries of recipes
+
+Recipe.summary holds the ids and names of a recipe's tags and
+ingrediants as compact JSON, {"tags": [[id, name], ...], "ingrediants":
+[...]} in id order, so recipe lists read core_recipe alone. The receivers
+in core.signals rebuild it in the transaction that links or unlinks a
+recipe, or renames or deletes a tag or ingrediant; code writing through
+rows in bulk calls rebuild() itself. NULL marks a summary that was never
+built, see the rebuild_recipe_summaries command.
+"""
+import json
+
+from django.db.models import Case, TextField, Value, When
+
+from core.models import Recipe
+
+FIELDS = ('tags', 'ingrediants')
+# Recipes per UPDATE, two parameters each
+BATCH_SIZE = 200
+
+
+def dump(summary):
+	return json.dumps(summary, ensure_ascii=False, separators=(',', ':'))
+
+
+def load(text):
+	return json.loads(text)
+
+
+def build(recipe_ids):
+	"""Return {recipe id: summary text} for a list of recipe ids"""
+	summaries = {pk: {field: [] for field in FIELDS} for pk in recipe_ids}
+	for field in FIELDS:
+		m2m = Recipe._meta.get_field(field)
+		related = m2m.m2m_reverse_field_name()
+		rows = m2m.remote_field.through.objects \
+			.filter(recipe_id__in=recipe_ids) \
+			.order_by('recipe_id', related + '_id') \
+			.values_list('recipe_id', related + '_id', related + '__name')
+		for recipe_id, pk, name in rows:
+			summaries[recipe_id][field].append([pk, name])
+	return {pk: dump(summary) for pk, summary in summaries.items()}
+
+
+def rebuild(recipes, batch_size=BATCH_SIZE):
+	"""Recompute the summaries of a queryset of recipes, returning how many"""
+	ids = list(recipes.order_by().values_list('pk', flat=True))
+	for start in range(0, len(ids), batch_size):
+		chunk = ids[start:start + batch_size]
+		summaries = build(chunk)
+		Recipe.objects.filter(pk__in=chunk).update(summary=Case(
+			*[When(pk=pk, then=Value(text)) for pk, text in summaries.items()],
+			output_field=TextField()
+		))
+	return len(ids)
@@ -0,0 +1,185 @@
+import asyncio
+import gc
+import logging
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.test import SimpleTestCase
+
+from core.asgi import ASGIHandler, get_environ
+
+
+def echo_application(environ, start_response):
+	"""WSGI application answering with the request body and some environ"""
+	body = environ['wsgi.input'].read()
+	start_response('201 Created', [
+		('Content-Type', 'text/plain'),
+		('X-Path', environ['PATH_INFO']),
+		('X-Query', environ['QUERY_STRING']),
+	])
+	return [body]
+
+
+def streaming_application(environ, start_response):
+	"""WSGI application answering with a streaming response"""
+	start_response('200 OK', [('Content-Type', 'text/plain')])
+
+	class Response:
+		streaming = True
+		closed = False
+
+		def __iter__(self):
+			for index in range(20):
+				yield b'%d\n' % index
+
+		def close(self):
+			Response.closed = True
+
+	return Response()
+
+
+def call(application, scope, chunks=(b'',), send=None, disconnect=False):
+	"""Run a request through an ASGI application and return the sent messages
+
+	Once the chunks are received the client stays connected, unless
+	disconnect is set.
+	"""
+	messages = []
+	incoming = [
+		{'type': 'http.request', 'body': chunk, 'more_body': index < len(chunks) - 1}
+		for index, chunk in enumerate(chunks)
+	]
+	if disconnect:
+		incoming.append({'type': 'http.disconnect'})
+
+	async def receive():
+		if incoming:
+			return incoming.pop(0)
+		await asyncio.Event().wait()
+
+	async def record(message):
+		messages.append(message)
+
+	asyncio.run(application(scope, receive, send or record))
+	return messages
+
+
+def http_scope(path='/', method='GET', query_string=b'', headers=()):
+	return {
+		'type': 'http',
+		'method': method,
+		'path': path,
+		'query_string': query_string,
+		'headers': list(headers),
+	}
+
+
+class ASGIHandlerTests(SimpleTestCase):
+
+	def test_environ_from_scope(self):
+		"""Test headers and the path are translated into a WSGI environ"""
+		environ = get_environ(http_scope(
+			'/api/café/', 'POST', b'a=1',
+			[(b'content-type', b'application/json'), (b'x-token', b'one'), (b'x-token', b'two')]
+		), None)
+		self.assertEqual(environ['REQUEST_METHOD'], 'POST')
+		self.assertEqual(environ['PATH_INFO'].encode('latin-1').decode('utf-8'), '/api/café/')
+		self.assertEqual(environ['QUERY_STRING'], 'a=1')
+		self.assertEqual(environ['CONTENT_TYPE'], 'application/json')
+		self.assertEqual(environ['HTTP_X_TOKEN'], 'one,two')
+
+	def test_request_body_and_response(self):
+		"""Test a body sent in chunks reaches the application whole"""
+		handler = ASGIHandler(echo_application, max_workers=2)
+		messages = call(
+			handler, http_scope('/echo/', 'POST', b'q=1'), [b'hello ', b'world']
+		)
+		start, body = messages
+		self.assertEqual(start['status'], 201)
+		self.assertIn((b'x-path', b'/echo/'), start['headers'])
+		self.assertIn((b'x-query', b'q=1'), start['headers'])
+		self.assertEqual(body['body'], b'hello world')
+		self.assertFalse(body.get('more_body', False))
+
+	def test_streaming_response(self):
+		"""Test streaming responses are sent chunk by chunk"""
+		handler = ASGIHandler(streaming_application, max_workers=2)
+		messages = call(handler, http_scope())
+		body = b''.join(message.get('body', b'') for message in messages[1:])
+		self.assertEqual(body, b''.join(b'%d\n' % index for index in range(20)))
+		self.assertEqual(len(messages), 22)
+		self.assertFalse(messages[-1].get('more_body', False))
+
+	def test_client_disconnect_stops_stream(self):
+		"""Test the worker thread stops once sending to the client fails"""
+		handler = ASGIHandler(streaming_application, max_workers=2)
+
+		async def failing_send(message):
+			if message['type'] == 'http.response.body':
+				raise ConnectionError
+
+		records = []
+		logger = logging.getLogger('asyncio')
+		recorder = logging.Handler()
+		recorder.emit = records.append
+		logger.addHandler(recorder)
+		self.addCleanup(logger.removeHandler, recorder)
+
+		with self.assertRaises(ConnectionError):
+			call(handler, http_scope(), send=failing_send)
+		handler.executor.shutdown(wait=True)
+		gc.collect()
+		# The worker's ClientDisconnected was retrieved, not left to be logged
+		self.assertEqual([record.getMessage() for record in records], [])
+
+	def test_client_disconnect_during_stream(self):
+		"""Test a disconnect stops the worker thread while sending still succeeds"""
+		generated = []
+
+		def long_application(environ, start_response):
+			start_response('200 OK', [('Content-Type', 'text/plain')])
+
+			class Response:
+				streaming = True
+
+				def __iter__(self):
+					for index in range(10000):
+						generated.append(index)
+						yield b'%d\n' % index
+
+			return Response()
+
+		handler = ASGIHandler(long_application, max_workers=2)
+		messages = call(handler, http_scope(), disconnect=True)
+		handler.executor.shutdown(wait=True)
+
+		self.assertLess(len(generated), 100)
+		self.assertLess(len(messages), 100)
+
+	def test_disconnect_before_body(self):
+		"""Test nothing is sent when the client leaves mid request"""
+		handler = ASGIHandler(echo_application, max_workers=2)
+		self.assertEqual(call(handler, http_scope(), chunks=[], disconnect=True), [])
+
+	def test_lifespan(self):
+		"""Test the lifespan protocol is acknowledged"""
+		handler = ASGIHandler(echo_application, max_workers=2)
+		incoming = [{'type': 'lifespan.startup'}, {'type': 'lifespan.shutdown'}]
+		sent = []
+
+		async def receive():
+			return incoming.pop(0)
+
+		async def send(message):
+			sent.append(message['type'])
+
+		asyncio.run(handler({'type': 'lifespan'}, receive, send))
+		self.assertEqual(sent, ['lifespan.startup.complete', 'lifespan.shutdown.complete'])
+
+	def test_django_application(self):
+		"""Test the Django application answers through the handler"""
+		handler = ASGIHandler(WSGIHandler(), max_workers=2)
+		start, body = call(handler, http_scope(
+			'/api/recipe/tags/', headers=[(b'host', b'testserver')]
+		))
+		self.assertEqual(start['status'], 401)
+		self.assertIn(b'credentials', body['body'])
@@ -1,25 +1,237 @@
-from unittest.mock import patch
+import json
+import os
+import subprocess
+import tempfile
+from io import StringIO
+from unittest.mock import Mock, patch
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
 from django.db.utils import OperationalError
 import sys
 
-from django.test import TestCase
+from django.test import LiveServerTestCase, TestCase
+
+from django.contrib.auth import get_user_model
+from core.management.commands.load_test import route_names
+from core.models import Tag, Recipe
 
 class CommandTests(TestCase):
 
 	def test_wait_for_db_ready(self):
 		#Test waiting for db when db is available
-		with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-			gi.return_value = True
-			call_command('wait_for_db')
-			self.assertEqual(gi.call_count, 1)
+		with patch('core.warmup.check_database') as cd:
+			call_command('wait_for_db', stdout=StringIO())
+			self.assertEqual(cd.call_count, 1)
 			
 	
 	@patch('time.sleep',return_value=True)
 	
 	def test_wait_for_db(self, ts):
-		with patch('django.db.utils.ConnectionHandler.__getitem__') as gi:
-			gi.side_effect = [OperationalError]*5 + [True]
-			call_command('wait_for_db')
-			self.assertEqual(gi.call_count,6)
-			
\ No newline at end of file
+		#Test waiting for db retries a real query with exponential backoff
+		with patch('core.warmup.check_database') as cd:
+			cd.side_effect = [OperationalError]*5 + [None]
+			call_command('wait_for_db', stdout=StringIO())
+			self.assertEqual(cd.call_count,6)
+			self.assertEqual(
+				[call[0][0] for call in ts.call_args_list], [0.5, 1, 2, 4, 5]
+			)
+	
+	@patch('time.sleep',return_value=True)
+	def test_wait_for_db_timeout(self, ts):
+		#Test waiting for db gives up once the timeout has passed
+		with patch('core.warmup.check_database') as cd:
+			cd.side_effect = OperationalError('refused')
+			with self.assertRaises(CommandError):
+				call_command('wait_for_db', timeout=0, stdout=StringIO())
+			self.assertEqual(ts.call_count, 0)
+	
+	def test_benchmark_indexes(self):
+		#Test the index benchmark reports every query and leaves no data behind
+		out = StringIO()
+		call_command(
+			'benchmark_indexes',
+			users=2, recipes=5, tags=3, ingrediants=3, repeat=2,
+			drop_indexes=True, stdout=out
+		)
+		self.assertIn('recipes by tag', out.getvalue())
+		self.assertIn('speedup', out.getvalue())
+		self.assertFalse(Tag.objects.exists())
+		indexes = connection.introspection.get_constraints(connection.cursor(), 'core_recipe_tags')
+		self.assertIn('core_recipe_tags_tag_idx', indexes)
+	
+	def test_benchmark_indexes_needs_the_flag(self):
+		#Test the index benchmark refuses to drop indexes unless told to
+		with self.assertRaises(CommandError):
+			call_command('benchmark_indexes', users=1, recipes=1, stdout=StringIO())
+		self.assertFalse(Tag.objects.exists())
+	
+	def test_import_recipes_ndjson(self):
+		#Test importing NDJSON creates recipes, links and missing tags
+		user = get_user_model().objects.create_user('test@test.com', 'testpass')
+		existing = Tag.objects.create(user=user, name='Vegan')
+		lines = [
+			'{"title": "Curry", "time_minutes": 20, "price": "7.50", "tags": ["Vegan", "Spicy"], "ingrediants": ["Rice"]}',
+			'',
+			'{"title": "Salad", "time_minutes": 5, "price": 3, "tags": ["Vegan"]}',
+		]
+		handle, path = tempfile.mkstemp(suffix='.ndjson')
+		with os.fdopen(handle, 'w') as stream:
+			stream.write('\n'.join(lines))
+		self.addCleanup(os.remove, path)
+		
+		call_command('import_recipes', path, user=user.email, chunk_size=1, stdout=StringIO())
+		
+		curry = Recipe.objects.get(user=user, title='Curry')
+		salad = Recipe.objects.get(user=user, title='Salad')
+		self.assertEqual(sorted(curry.tags.values_list('name', flat=True)), ['Spicy', 'Vegan'])
+		self.assertEqual(list(curry.ingrediants.values_list('name', flat=True)), ['Rice'])
+		self.assertEqual(list(salad.tags.all()), [existing])
+		self.assertEqual(Tag.objects.filter(user=user).count(), 2)
+		
+	def test_import_recipes_csv_stdin(self):
+		#Test importing CSV from stdin
+		user = get_user_model().objects.create_user('test@test.com', 'testpass')
+		data = 'title,time_minutes,price,link,tags,ingrediants\nSoup,15,4.00,,Warm|Vegan,Leek\n'
+		
+		with patch('sys.stdin', StringIO(data)):
+			call_command('import_recipes', '-', user=user.email, format='csv', stdout=StringIO())
+		
+		soup = Recipe.objects.get(user=user)
+		self.assertEqual(soup.title, 'Soup')
+		self.assertEqual(soup.tags.count(), 2)
+		self.assertEqual(soup.ingrediants.get().name, 'Leek')
+		
+	def test_import_recipes_invalid_record(self):
+		#Test an invalid record aborts with its line number
+		user = get_user_model().objects.create_user('test@test.com', 'testpass')
+		data = '{"title": "", "time_minutes": 5, "price": 1}\n'
+		
+		with patch('sys.stdin', StringIO(data)):
+			with self.assertRaisesRegex(CommandError, 'Line 1'):
+				call_command('import_recipes', '-', user=user.email, stdout=StringIO())
+		self.assertFalse(Recipe.objects.exists())
+		
+	def test_import_recipes_missing_file(self):
+		#Test a file that cannot be opened aborts with a command error
+		user = get_user_model().objects.create_user('test@test.com', 'testpass')
+		path = os.path.join(tempfile.gettempdir(), 'no-such-recipes.ndjson')
+		
+		with self.assertRaisesRegex(CommandError, 'Cannot read'):
+			call_command('import_recipes', path, user=user.email, stdout=StringIO())
+		
+	def test_import_recipes_malformed_csv(self):
+		#Test CSV the reader rejects aborts with its line number
+		user = get_user_model().objects.create_user('test@test.com', 'testpass')
+		data = 'title,time_minutes,price\nSoup,15,4\n"%s",5,1\n' % ('x' * 200000)
+		
+		with patch('sys.stdin', StringIO(data)):
+			with self.assertRaisesRegex(CommandError, 'line 3: field larger'):
+				call_command('import_recipes', '-', user=user.email, format='csv', stdout=StringIO())
+		self.assertFalse(Recipe.objects.exists())
+		
+	def test_import_recipes_invalid_names(self):
+		#Test tags that are not a list or a string abort with the line number
+		user = get_user_model().objects.create_user('test@test.com', 'testpass')
+		data = '{"title": "Soup", "time_minutes": 5, "price": 1}\n{"title": "Stew", "time_minutes": 5, "price": 1, "tags": 5}\n'
+		
+		with patch('sys.stdin', StringIO(data)):
+			with self.assertRaisesRegex(CommandError, 'Line 2: .*list of names'):
+				call_command('import_recipes', '-', user=user.email, stdout=StringIO())
+		self.assertFalse(Recipe.objects.exists())
+		
+	def test_benchmark_token_auth(self):
+		#Test the token benchmark reports both authentication classes
+		out = StringIO()
+		call_command('benchmark_token_auth', requests=5, stdout=out)
+		self.assertIn('TokenAuthentication: 1.000 queries/request', out.getvalue())
+		self.assertIn('CachedTokenAuthentication', out.getvalue())
+		self.assertFalse(get_user_model().objects.exists())
+	
+	def test_benchmark_search(self):
+		#Test the search benchmark reports every query and leaves no data behind
+		out = StringIO()
+		call_command(
+			'benchmark_search',
+			users=1, recipes=5, tags=3, ingrediants=3, repeat=1,
+			stdout=out
+		)
+		self.assertIn('in-process index', out.getvalue())
+		self.assertIn("'tag 7'", out.getvalue())
+		self.assertFalse(Recipe.objects.exists())
+	
+	def test_profile_startup(self):
+		#Test the startup profile reports setup, ready and import times
+		# The child process would use the configured database, not the test one
+		measurements = {
+			'settings': 'app.settings', 'import_django': 0.01, 'setup': 0.05,
+			'ready': {'core': 0.002, 'recipe': 0.001}, 'load_application': 0.02,
+			'first_request': 0.004, 'total': 0.084, 'status': '200 OK',
+		}
+		imports = 'import time:       150 |        300 |   django.db\nimport time:        80 |         80 | core.models\n'
+		child = subprocess.CompletedProcess([], 0, stdout=json.dumps(measurements), stderr=imports)
+		out = StringIO()
+		with patch('core.management.commands.profile_startup.subprocess.run', return_value=child) as run:
+			call_command('profile_startup', 'app.settings', runs=1, top=3, stdout=out)
+		self.assertEqual(run.call_args[1]['env']['DJANGO_SETTINGS_MODULE'], 'app.settings')
+		self.assertIn('-X', run.call_args[0][0])
+		self.assertIn('django.db', out.getvalue())
+		self.assertIn('setup', out.getvalue())
+		self.assertIn('first request status: 200 OK', out.getvalue())
+		self.assertIn('AppConfig.ready', out.getvalue())
+		self.assertIn('Slowest modules', out.getvalue())
+	
+	def test_load_test_needs_a_shared_database(self):
+		#Test the load test refuses to start a server on an in-memory database
+		connection = Mock(vendor='sqlite', settings_dict={'NAME': ':memory:'})
+		connection.creation.is_in_memory_db.return_value = True
+		with patch('core.management.commands.load_test.connection', connection):
+			with self.assertRaisesRegex(CommandError, 'in-memory SQLite'):
+				call_command('load_test', stdout=StringIO(), stderr=StringIO())
+	
+	def test_rebuild_recipe_summaries(self):
+		#Test summaries that were never built, or went stale, are rebuilt
+		user = get_user_model().objects.create_user('test@test.com', 'testpass')
+		recipe = Recipe.objects.create(user=user, title='Curry', time_minutes=20, price=7)
+		recipe.tags.add(Tag.objects.create(user=user, name='Vegan'))
+		Recipe.objects.update(summary=None)
+		out = StringIO()
+		
+		call_command('rebuild_recipe_summaries', user=user.email, missing=True, stdout=out)
+		
+		self.assertIn('Rebuilt 1 recipe summaries', out.getvalue())
+		recipe.refresh_from_db()
+		self.assertEqual(json.loads(recipe.summary)['tags'], [[recipe.tags.get().id, 'Vegan']])
+		call_command('rebuild_recipe_summaries', missing=True, stdout=out)
+		self.assertIn('Rebuilt 0 recipe summaries', out.getvalue())
+
+
+class LoadTestCommandTests(LiveServerTestCase):
+	
+	def test_load_test(self):
+		#Test the load test drives every route and writes comparable results
+		with tempfile.TemporaryDirectory() as directory:
+			output = os.path.join(directory, 'results.json')
+			call_command(
+				'load_test',
+				users=2, recipes=3, tags=3, ingrediants=3, concurrency=1, requests=2,
+				url=self.live_server_url, output=output,
+				stdout=StringIO(), stderr=StringIO()
+			)
+			out = StringIO()
+			call_command(
+				'load_test',
+				users=2, recipes=3, tags=3, ingrediants=3, concurrency=1, requests=2,
+				url=self.live_server_url, compare=output,
+				stdout=out, stderr=StringIO()
+			)
+			with open(output) as stream:
+				results = json.load(stream)
+		
+		self.assertEqual({row['route'] for row in results['routes']}, route_names())
+		for row in results['routes']:
+			self.assertEqual(row['errors'], 0, row)
+			self.assertEqual(row['latency']['count'], 2)
+		self.assertIn('recipe:recipe-detail', out.getvalue())
+		self.assertIn('throughput', out.getvalue())
+		self.assertFalse(get_user_model().objects.exists())
@@ -0,0 +1,155 @@
+import asyncio
+import threading
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import PBKDF2PasswordHasher, make_password
+from django.http import HttpResponse
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from unittest.mock import patch
+
+from core import hashing
+from core.asgi import ASGIHandler
+from core.tests.test_asgi import http_scope
+
+
+def hashing_application(environ, start_response):
+	"""WSGI application hashing a password on /hash/ and answering otherwise"""
+	status = '200 OK'
+	if environ['PATH_INFO'] == '/hash/':
+		try:
+			hashing.make_password('testpass')
+		except hashing.HashingPoolBusy:
+			status = '503 Service Unavailable'
+	start_response(status, [('Content-Type', 'text/plain')])
+	return [b'']
+
+
+async def get_status(handler, path):
+	"""Send a GET through an ASGI handler and return the response status"""
+	sent = []
+	received = []
+
+	async def receive():
+		if not received:
+			received.append(True)
+			return {'type': 'http.request', 'body': b''}
+		await asyncio.Event().wait()
+
+	async def send(message):
+		sent.append(message)
+
+	await handler(http_scope(path), receive, send)
+	return sent[0]['status']
+
+
+class HashingPoolTests(TestCase):
+	
+	def test_run_returns_result_and_counts(self):
+		"""Test the pool runs callables and records metrics"""
+		pool = hashing.HashingPool(2, 4, 1)
+		self.assertEqual(pool.run(pow, 2, 10), 1024)
+		metrics = pool.metrics()
+		self.assertEqual(metrics['completed'], 1)
+		self.assertEqual(metrics['queued'], 0)
+		self.assertEqual(metrics['running'], 0)
+		self.assertEqual(metrics['rejected'], 0)
+	
+	def test_run_rejects_when_full(self):
+		"""Test a saturated pool fails fast with HashingPoolBusy"""
+		pool = hashing.HashingPool(1, 1, 0.05)
+		release = threading.Event()
+		started = threading.Event()
+		
+		def block():
+			started.set()
+			release.wait(5)
+		
+		worker = threading.Thread(target=pool.run, args=(block,))
+		worker.start()
+		started.wait(5)
+		try:
+			with self.assertRaises(hashing.HashingPoolBusy):
+				pool.run(pow, 2, 2)
+		finally:
+			release.set()
+			worker.join()
+		self.assertEqual(pool.metrics()['rejected'], 1)
+	
+	@override_settings(ASGI_THREADS=4, PASSWORD_HASHING_POOL={'MAX_PENDING': 32})
+	def test_pending_hashes_stay_below_request_threads(self):
+		"""Test MAX_PENDING is capped below ASGI_THREADS and defaults to half"""
+		self.assertEqual(hashing.get_settings()['MAX_PENDING'], 3)
+		with override_settings(PASSWORD_HASHING_POOL={}):
+			options = hashing.get_settings()
+		self.assertEqual(options['MAX_PENDING'], 2)
+		self.assertEqual(options['MAX_WORKERS'], 2)
+	
+	@override_settings(ASGI_THREADS=2, PASSWORD_HASHING_POOL={})
+	def test_saturated_pool_leaves_request_threads(self):
+		"""Test requests that do not hash are served while hashing is saturated"""
+		release = threading.Event()
+		started = threading.Event()
+		
+		def slow_hash(password):
+			started.set()
+			release.wait(5)
+			return 'hashed'
+		
+		async def storm(handler):
+			loop = asyncio.get_event_loop()
+			hashes = [loop.create_task(get_status(handler, '/hash/')) for _ in range(3)]
+			await loop.run_in_executor(None, started.wait, 5)
+			try:
+				other = await asyncio.wait_for(get_status(handler, '/other/'), 2)
+			finally:
+				release.set()
+			return other, sorted(await asyncio.gather(*hashes))
+		
+		handler = ASGIHandler(hashing_application)
+		with patch.object(hashing, '_pool', None), \
+				patch.object(hashing.hashers, 'make_password', slow_hash):
+			other, hashes = asyncio.run(storm(handler))
+		handler.executor.shutdown(wait=True)
+		
+		self.assertEqual(other, 200)
+		self.assertEqual(hashes, [200, 503, 503])
+	
+	def test_check_password_reports_upgrade(self):
+		"""Test hashes with outdated parameters are flagged for upgrade"""
+		encoded = make_password('testpass')
+		stale = PBKDF2PasswordHasher().encode('testpass', 'salt', 1000)
+		self.assertEqual(hashing.check_password('testpass', stale), (True, True))
+		self.assertEqual(hashing.check_password('wrong', stale), (False, False))
+		self.assertEqual(hashing.check_password('testpass', encoded), (True, False))
+	
+	def test_user_check_password_upgrades_hash(self):
+		"""Test a correct login rewrites a stale hash"""
+		user = get_user_model().objects.create_user('test@test.com', 'testpass')
+		user.password = PBKDF2PasswordHasher().encode('testpass', 'salt', 1000)
+		user.save()
+		
+		self.assertTrue(user.check_password('testpass'))
+		user.refresh_from_db()
+		self.assertNotIn('$1000$', user.password)
+		self.assertTrue(user.check_password('testpass'))
+	
+	def test_unusable_password_is_rejected(self):
+		"""Test unusable passwords never reach the pool"""
+		user = get_user_model().objects.create_user('test@test.com', None)
+		self.assertFalse(user.has_usable_password())
+		self.assertFalse(user.check_password(None))
+		self.assertFalse(user.check_password('anything'))
+	
+	def test_busy_pool_answers_503(self):
+		"""Test login answers 503 with Retry-After when hashing is saturated"""
+		get_user_model().objects.create_user('test@test.com', 'testpass')
+		with patch.object(hashing.HashingPool, 'run', side_effect=hashing.HashingPoolBusy):
+			res = APIClient().post(reverse('user:token'), {
+				'email': 'test@test.com',
+				'password': 'testpass',
+			})
+		self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+		self.assertEqual(res['Retry-After'], '1')
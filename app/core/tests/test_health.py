@@ -0,0 +1,68 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db.utils import OperationalError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+
+from core import search, warmup
+from core.models import Recipe
+from user.authentication import get_token_cache
+
+
+class HealthEndpointTests(TestCase):
+
+	def test_healthz(self):
+		"""Test the liveness endpoint answers without warming up"""
+		with patch.object(warmup, 'is_ready', return_value=False):
+			res = self.client.get(reverse('healthz'))
+		self.assertEqual(res.status_code, 200)
+		self.assertEqual(res.json(), {'status': 'ok'})
+
+	def test_readyz_before_warm_up(self):
+		"""Test the readiness endpoint refuses traffic until warmed up"""
+		with patch.object(warmup, 'is_ready', return_value=False):
+			res = self.client.get(reverse('readyz'))
+		self.assertEqual(res.status_code, 503)
+
+	def test_readyz_after_warm_up(self):
+		"""Test a warmed up process with a reachable database is ready"""
+		timings = warmup.warm_up()
+		self.assertEqual(
+			[name for name, _ in timings],
+			[name for name, _ in warmup.STEPS]
+		)
+		res = self.client.get(reverse('readyz'))
+		self.assertEqual(res.status_code, 200)
+		self.assertEqual(res.json(), {'status': 'ready'})
+
+	@override_settings(WARM_UP={'TOKENS': 1, 'SEARCH_INDEXES': 1})
+	def test_warm_up_fills_caches(self):
+		"""Test warming up loads the newest tokens and busiest search indexes"""
+		get_token_cache().clear()
+		search.get_index_cache().clear()
+		users = [
+			get_user_model().objects.create_user('user%d@test.com' % index, 'testpass')
+			for index in range(2)
+		]
+		tokens = [Token.objects.create(user=user) for user in users]
+		for user in users:
+			Recipe.objects.create(user=user, title='Curry', time_minutes=5, price=3)
+
+		warmup.fill_caches()
+
+		self.assertIsNone(get_token_cache().get(tokens[0].key))
+		self.assertEqual(get_token_cache().get(tokens[1].key)['email'], 'user1@test.com')
+		if not search.is_indexed():
+			self.assertIsNotNone(search.get_index_cache().get(users[1].pk))
+			self.assertIsNone(search.get_index_cache().get(users[0].pk))
+
+	def test_readyz_database_down(self):
+		"""Test the readiness endpoint fails while the database is down"""
+		with patch.object(warmup, 'is_ready', return_value=True), \
+				patch.object(warmup, 'check_database', side_effect=OperationalError('down at db-host')), \
+				self.assertLogs('core.views', 'WARNING'):
+			res = self.client.get(reverse('readyz'))
+		self.assertEqual(res.status_code, 503)
+		self.assertEqual(res.json(), {'status': 'database unavailable'})
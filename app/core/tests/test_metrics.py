@@ -0,0 +1,188 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import metrics
+from core.db import pool
+from core.db.pool import ConnectionPool
+from core.models import Recipe
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class MetricsRenderTests(SimpleTestCase):
+
+	def test_histogram_buckets_are_cumulative(self):
+		"""Test an observation counts in every bucket at or above it"""
+		registry = metrics.Registry()
+		labels = (('route', 'home'), ('method', 'GET'), ('status', '200'))
+		registry.observe('http_request_duration_seconds', labels, 0.03)
+		registry.observe('http_request_duration_seconds', labels, 0.3)
+		text = metrics.render(metrics.merge([registry.snapshot()]))
+
+		self.assertIn(
+			'http_request_duration_seconds_bucket'
+			'{route="home",method="GET",status="200",le="0.025"} 0', text
+		)
+		self.assertIn(
+			'http_request_duration_seconds_bucket'
+			'{route="home",method="GET",status="200",le="0.05"} 1', text
+		)
+		self.assertIn(
+			'http_request_duration_seconds_bucket'
+			'{route="home",method="GET",status="200",le="+Inf"} 2', text
+		)
+		self.assertIn(
+			'http_request_duration_seconds_count{route="home",method="GET",status="200"} 2',
+			text
+		)
+
+	def test_merge_sums_processes(self):
+		"""Test snapshots of several processes add up"""
+		labels = (('route', 'home'),)
+		first, second = metrics.Registry(), metrics.Registry()
+		first.inc('http_request_sql_queries_total', labels, 3)
+		second.inc('http_request_sql_queries_total', labels, 4)
+		second.observe('http_response_size_bytes', labels, 500)
+		merged = metrics.merge([first.snapshot(), second.snapshot()])
+
+		self.assertEqual(merged['counters']['http_request_sql_queries_total'][labels], 7)
+		self.assertEqual(merged['histograms']['http_response_size_bytes'][labels][-1], 1)
+
+	def test_label_values_are_escaped(self):
+		"""Test quotes in label values are escaped"""
+		self.assertEqual(metrics.format_labels([('route', 'a"b')]), '{route="a\\"b"}')
+
+
+class MetricsMiddlewareTests(TestCase):
+
+	def setUp(self):
+		self.registry = metrics.Registry()
+		patcher = patch.object(metrics, 'registry', self.registry)
+		patcher.start()
+		self.addCleanup(patcher.stop)
+		self.user = get_user_model().objects.create_user('test@londonappdev.com', 'pass1234')
+		self.client = APIClient()
+		self.client.force_authenticate(self.user)
+
+	def series(self, kind, name):
+		return metrics.merge([self.registry.snapshot()])[kind][name]
+
+	def test_request_is_recorded_by_route(self):
+		"""Test a request is labelled by view name with its queries and size"""
+		res = self.client.get(RECIPES_URL)
+
+		labels = (('route', 'recipe:recipe-list'), ('method', 'GET'), ('status', '200'))
+		self.assertEqual(self.series('counters', 'http_requests_total'), {labels: 1})
+		self.assertGreater(self.series('counters', 'http_request_sql_queries_total')[labels], 0)
+		size = self.series('histograms', 'http_response_size_bytes')[labels]
+		self.assertEqual(size[-2], len(res.content))
+
+	def test_streaming_queries_are_recorded(self):
+		"""Test queries run while a streaming body is sent are counted"""
+		Recipe.objects.create(user=self.user, title='Curry', time_minutes=5, price=3)
+		res = self.client.get(reverse('recipe:recipe-export'), HTTP_ACCEPT='application/x-ndjson')
+		body = b''.join(res.streaming_content)
+
+		labels = (('route', 'recipe:recipe-export'), ('method', 'GET'), ('status', '200'))
+		self.assertIn(b'Curry', body)
+		# Recipes, tags and ingrediants are read while streaming
+		self.assertGreaterEqual(
+			self.series('counters', 'http_request_sql_queries_total')[labels], 3
+		)
+		self.assertEqual(self.series('histograms', 'http_response_size_bytes')[labels][-2], len(body))
+
+	def test_pools_are_exported(self):
+		"""Test the hashing and connection pool statistics are rendered"""
+		connection_pool = ConnectionPool(object, max_size=3)
+		connection_pool.acquire()
+		with patch.object(pool, 'all_pools', return_value=[(('default', ()), connection_pool)]):
+			body = self.client.get(reverse('metrics')).content.decode()
+
+		self.assertIn('# TYPE password_hashing_pool_queued gauge', body)
+		self.assertIn('# TYPE password_hashing_pool_completed_total counter', body)
+		self.assertIn('db_connection_pool_borrows_total{database="default"} 1', body)
+		self.assertIn('password_hashing_pool_max_workers ', body)
+		self.assertIn('db_connection_pool_in_use{database="default"} 1', body)
+		self.assertIn('db_connection_pool_max_size{database="default"} 3', body)
+
+	def test_exited_processes_keep_only_counters(self):
+		"""Test the gauges of a process that has exited leave the totals"""
+		exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+		exited.wait()
+		labels = [['database', 'default']]
+		with tempfile.TemporaryDirectory() as directory:
+			with open(metrics.snapshot_path(directory, exited.pid), 'w') as stream:
+				json.dump({'gauges': [
+					['db_connection_pool', labels, {'in_use': 5, 'borrows': 7}],
+				]}, stream)
+			with override_settings(METRICS={'DIRECTORY': directory}), \
+					patch.object(pool, 'all_pools', return_value=[]):
+				merged = metrics.collect()
+
+		self.assertEqual(
+			merged['gauges']['db_connection_pool'], {(('database', 'default'),): {'borrows': 7}}
+		)
+
+	def test_unmatched_requests_share_a_label(self):
+		"""Test unknown paths do not create a series per path"""
+		self.client.get('/no/such/path/')
+		self.client.get('/another/missing/path/')
+
+		labels = (('route', '<unmatched>'), ('method', 'GET'), ('status', '404'))
+		self.assertEqual(self.series('counters', 'http_requests_total'), {labels: 2})
+
+	def test_metrics_endpoint(self):
+		"""Test the endpoint renders recorded requests and skips itself"""
+		self.client.get(RECIPES_URL)
+		res = self.client.get(reverse('metrics'))
+
+		self.assertEqual(res.status_code, 200)
+		self.assertTrue(res['Content-Type'].startswith('text/plain; version=0.0.4'))
+		body = res.content.decode()
+		self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+		self.assertIn('route="recipe:recipe-list"', body)
+		self.assertNotIn('route="metrics"', body)
+
+	def test_metrics_endpoint_is_restricted(self):
+		"""Test only allowed networks or the token holder may scrape"""
+		url = reverse('metrics')
+		options = {'ALLOWED_NETWORKS': ['10.0.0.0/8'], 'TOKEN': 'scrape'}
+		with override_settings(METRICS=options):
+			self.assertEqual(self.client.get(url, REMOTE_ADDR='10.1.2.3').status_code, 200)
+			self.assertEqual(self.client.get(url, REMOTE_ADDR='203.0.113.9').status_code, 403)
+			self.assertEqual(self.client.get(
+				url, REMOTE_ADDR='203.0.113.9', HTTP_AUTHORIZATION='Bearer wrong'
+			).status_code, 403)
+			self.assertEqual(self.client.get(
+				url, REMOTE_ADDR='203.0.113.9', HTTP_AUTHORIZATION='Bearer scrape'
+			).status_code, 200)
+
+	def test_metrics_endpoint_merges_processes(self):
+		"""Test snapshots written by other worker processes are included"""
+		with tempfile.TemporaryDirectory() as directory:
+			labels = [['route', 'recipe:tag-list'], ['method', 'GET'], ['status', '200']]
+			other = {'counters': {'http_requests_total': [[labels, 5]]}, 'histograms': {}}
+			with open(os.path.join(directory, 'metrics-1.json'), 'w') as stream:
+				json.dump(other, stream)
+
+			with override_settings(METRICS={'DIRECTORY': directory, 'FLUSH_INTERVAL': 0}):
+				self.client.get(RECIPES_URL)
+				self.assertTrue(os.path.exists(metrics.snapshot_path(directory)))
+				res = self.client.get(reverse('metrics'))
+
+		body = res.content.decode()
+		self.assertIn(
+			'http_requests_total{route="recipe:tag-list",method="GET",status="200"} 5', body
+		)
+		self.assertIn(
+			'http_requests_total{route="recipe:recipe-list",method="GET",status="200"} 1', body
+		)
@@ -0,0 +1,177 @@
+import threading
+import time
+
+from django.test import SimpleTestCase
+
+from core.db.pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+	"""Raw connection stand-in recording whether it was closed"""
+
+	def __init__(self):
+		self.closed = False
+		self.healthy = True
+
+	def close(self):
+		self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+
+	def setUp(self):
+		self.now = 0
+		self.opened = []
+
+	def connect(self):
+		connection = FakeConnection()
+		self.opened.append(connection)
+		return connection
+
+	def make_pool(self, **kwargs):
+		options = {
+			'check': lambda connection: connection.healthy,
+			'min_size': 0,
+			'max_size': 2,
+			'timeout': 0.05,
+			'max_idle': 60,
+			'max_lifetime': 3600,
+			'check_after': 1,
+			'clock': lambda: self.now,
+		}
+		options.update(kwargs)
+		return ConnectionPool(self.connect, **options)
+
+	def test_released_connections_are_reused(self):
+		"""Test a returned connection is handed out again"""
+		pool = self.make_pool()
+		connection = pool.acquire()
+		pool.release(connection)
+		self.assertIs(pool.acquire(), connection)
+		self.assertEqual(len(self.opened), 1)
+
+		metrics = pool.metrics()
+		self.assertEqual(metrics['borrows'], 2)
+		self.assertEqual(metrics['connects'], 1)
+		self.assertEqual(metrics['in_use'], 1)
+		self.assertEqual(metrics['idle'], 0)
+
+	def test_max_size_times_out(self):
+		"""Test borrowers give up once every connection stays in use"""
+		pool = self.make_pool(clock=time.monotonic)
+		pool.acquire()
+		pool.acquire()
+		with self.assertRaises(PoolTimeout):
+			pool.acquire()
+		self.assertEqual(pool.metrics()['timeouts'], 1)
+
+	def test_waiting_borrower_gets_released_connection(self):
+		"""Test a borrower waiting on a full pool gets the next free connection"""
+		pool = self.make_pool(max_size=1, timeout=5, clock=time.monotonic)
+		connection = pool.acquire()
+		borrowed = []
+		waiter = threading.Thread(target=lambda: borrowed.append(pool.acquire()))
+		waiter.start()
+		pool.release(connection)
+		waiter.join(5)
+		self.assertEqual(borrowed, [connection])
+
+	def test_unhealthy_connection_replaced(self):
+		"""Test a connection failing its check is closed and replaced"""
+		pool = self.make_pool()
+		connection = pool.acquire()
+		pool.release(connection)
+		connection.healthy = False
+		self.now = 5
+
+		replacement = pool.acquire()
+
+		self.assertIsNot(replacement, connection)
+		self.assertTrue(connection.closed)
+		self.assertEqual(pool.metrics()['failed_checks'], 1)
+		self.assertEqual(pool.metrics()['size'], 1)
+
+	def test_recently_used_connection_not_checked(self):
+		"""Test connections returned a moment ago skip the health check"""
+		pool = self.make_pool()
+		connection = pool.acquire()
+		pool.release(connection)
+		connection.healthy = False
+		self.assertIs(pool.acquire(), connection)
+
+	def test_idle_connections_evicted_down_to_min_size(self):
+		"""Test idle connections above min_size are closed"""
+		pool = self.make_pool(min_size=1, max_size=3)
+		pool.fill()
+		first, second = pool.acquire(), pool.acquire()
+		pool.release(first)
+		pool.release(second)
+		self.now = 120
+
+		pool.acquire()
+
+		self.assertEqual(sum(connection.closed for connection in self.opened), 1)
+		self.assertEqual(pool.metrics()['size'], 1)
+
+	def test_idle_connections_evicted_on_release(self):
+		"""Test returning a connection also closes connections idle too long"""
+		pool = self.make_pool(max_size=3)
+		first, second = pool.acquire(), pool.acquire()
+		pool.release(first)
+		self.now = 120
+
+		pool.release(second)
+
+		self.assertTrue(first.closed)
+		self.assertFalse(second.closed)
+		self.assertEqual(pool.metrics()['size'], 1)
+
+	def test_idle_connections_evicted_without_traffic(self):
+		"""Test the reaper shrinks a pool nobody borrows from"""
+		pool = self.make_pool(reap_interval=0.01)
+		self.addCleanup(pool.close_all)
+		connection = pool.acquire()
+		pool.release(connection)
+		self.now = 120
+
+		deadline = time.monotonic() + 5
+		while not connection.closed and time.monotonic() < deadline:
+			time.sleep(0.01)
+
+		self.assertTrue(connection.closed)
+		self.assertEqual(pool.metrics()['size'], 0)
+
+	def test_connections_retired_after_lifetime(self):
+		"""Test connections older than max_lifetime are closed on release"""
+		pool = self.make_pool(max_lifetime=10)
+		connection = pool.acquire()
+		self.now = 11
+		pool.release(connection)
+		self.assertTrue(connection.closed)
+		self.assertEqual(pool.metrics()['size'], 0)
+
+	def test_failed_reset_discards_connection(self):
+		"""Test connections that can't be reset are not returned to the pool"""
+		pool = self.make_pool(reset=lambda connection: False)
+		connection = pool.acquire()
+		pool.release(connection)
+		self.assertTrue(connection.closed)
+		self.assertIsNot(pool.acquire(), connection)
+
+	def test_failed_connect_frees_slot(self):
+		"""Test a connection that fails to open does not use up the pool"""
+		pool = ConnectionPool(lambda: 1 / 0, max_size=1, timeout=0)
+		for _ in range(3):
+			with self.assertRaises(ZeroDivisionError):
+				pool.acquire()
+		self.assertEqual(pool.metrics()['size'], 0)
+
+	def test_close_all(self):
+		"""Test closing the pool closes idle and later released connections"""
+		pool = self.make_pool()
+		idle, borrowed = pool.acquire(), pool.acquire()
+		pool.release(idle)
+		pool.close_all()
+		self.assertTrue(idle.closed)
+		pool.release(borrowed)
+		self.assertTrue(borrowed.closed)
@@ -0,0 +1,70 @@
+from unittest import skipUnless
+
+from django.db import connection, transaction
+from django.test import TransactionTestCase
+
+POOL_ENGINE = 'core.db.backends.postgresql_pool'
+
+
+def is_idle(pool, raw):
+	return any(entry.connection is raw for entry in pool._idle)
+
+
+@skipUnless(
+	connection.settings_dict['ENGINE'] == POOL_ENGINE,
+	'needs the pooled PostgreSQL backend'
+)
+class PooledBackendTests(TransactionTestCase):
+	"""Test the pooled backend against the configured PostgreSQL database"""
+
+	def test_close_returns_the_connection(self):
+		"""Test closing hands the open connection back for reuse"""
+		connection.ensure_connection()
+		raw, pool = connection.connection, connection.pool
+
+		connection.close()
+
+		self.assertFalse(raw.closed)
+		self.assertTrue(is_idle(pool, raw))
+		with connection.cursor() as cursor:
+			cursor.execute('SELECT 1')
+			self.assertEqual(cursor.fetchone(), (1,))
+
+	def test_close_in_transaction_keeps_the_connection_private(self):
+		"""Test a connection closed inside atomic is never lent out"""
+		with transaction.atomic():
+			connection.ensure_connection()
+			raw, pool = connection.connection, connection.pool
+			borrowed = pool.metrics()['in_use']
+
+			connection.close()
+
+			self.assertTrue(raw.closed)
+			self.assertFalse(is_idle(pool, raw))
+			self.assertEqual(pool.metrics()['in_use'], borrowed - 1)
+
+	def test_session_state_is_discarded(self):
+		"""Test settings and temporary tables do not reach the next borrower"""
+		with connection.cursor() as cursor:
+			cursor.execute("SET statement_timeout = '1234ms'")
+			cursor.execute('CREATE TEMPORARY TABLE borrower_scratch (id int)')
+		raw = connection.connection
+
+		connection.close()
+
+		with connection.cursor() as cursor:
+			self.assertIs(connection.connection, raw)
+			cursor.execute('SHOW statement_timeout')
+			self.assertNotEqual(cursor.fetchone()[0], '1234ms')
+			cursor.execute("SELECT to_regclass('borrower_scratch')")
+			self.assertIsNone(cursor.fetchone()[0])
+
+	def test_failed_connection_is_discarded(self):
+		"""Test a connection whose query failed is not reused"""
+		connection.ensure_connection()
+		raw, pool = connection.connection, connection.pool
+		connection.errors_occurred = True
+
+		connection.close()
+
+		self.assertFalse(is_idle(pool, raw))
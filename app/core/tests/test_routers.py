@@ -0,0 +1,123 @@
+import random
+from unittest.mock import Mock, patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.utils import OperationalError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.db import routers
+from core.models import Tag
+
+REPLICAS = {'REPLICAS': {'replica1': 3, 'replica2': 1}, 'RETRY_AFTER': 30}
+
+
+@override_settings(DATABASE_REPLICAS=REPLICAS)
+class ReplicaRouterTests(SimpleTestCase):
+
+	def setUp(self):
+		self.connections = {'replica1': Mock(), 'replica2': Mock()}
+		patcher = patch.object(routers, 'connections', self.connections)
+		patcher.start()
+		self.addCleanup(patcher.stop)
+		self.addCleanup(routers._down.clear)
+		self.addCleanup(routers.read_from, None)
+		self.router = routers.ReplicaRouter()
+
+	def test_reads_follow_the_chosen_replica(self):
+		"""Test reads go to the request's replica and writes to the primary"""
+		self.assertEqual(self.router.db_for_read(Tag), 'default')
+		routers.read_from('replica2')
+		self.assertEqual(self.router.db_for_read(Tag), 'replica2')
+		self.assertEqual(self.router.db_for_write(Tag), 'default')
+
+	def test_replicas_are_not_migrated(self):
+		"""Test migrations only run on the primary"""
+		self.assertFalse(self.router.allow_migrate('replica1', 'core'))
+		self.assertIsNone(self.router.allow_migrate('default', 'core'))
+
+	def test_pin_cache_must_be_shared(self):
+		"""Test the check rejects a per-process pin cache once replicas are set"""
+		errors = routers.check_pin_cache(None)
+		self.assertEqual([error.id for error in errors], ['core.E001'])
+
+		shared = {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'pins'}
+		with override_settings(CACHES={'default': shared}):
+			self.assertEqual(routers.check_pin_cache(None), [])
+		with override_settings(DATABASE_REPLICAS={}):
+			self.assertEqual(routers.check_pin_cache(None), [])
+
+	def test_replicas_are_chosen_by_weight(self):
+		"""Test replicas are picked in proportion to their weights"""
+		rand = random.Random(0)
+		chosen = [routers.choose_replica(rand) for _ in range(4000)]
+		share = chosen.count('replica1') / len(chosen)
+		self.assertAlmostEqual(share, 0.75, delta=0.03)
+
+	def test_failover(self):
+		"""Test a failing replica is skipped until RETRY_AFTER has passed"""
+		self.connections['replica1'].ensure_connection.side_effect = OperationalError
+		for _ in range(20):
+			self.assertEqual(routers.choose_replica(), 'replica2')
+		self.assertEqual(self.connections['replica1'].ensure_connection.call_count, 1)
+
+		self.connections['replica2'].ensure_connection.side_effect = OperationalError
+		self.assertIsNone(routers.choose_replica())
+
+		later = routers.time.monotonic() + 31
+		self.connections['replica1'].ensure_connection.side_effect = None
+		with patch.object(routers.time, 'monotonic', return_value=later):
+			self.assertEqual(routers.choose_replica(), 'replica1')
+
+
+class ReplicaReadMixinTests(TestCase):
+
+	def setUp(self):
+		self.user = get_user_model().objects.create_user('test@test.com', 'testpass')
+		self.client = APIClient()
+		self.client.force_authenticate(self.user)
+		self.addCleanup(cache.clear)
+		# The test database stands in for the replica
+		patcher = patch.object(routers, 'choose_replica', return_value='default')
+		self.choose = patcher.start()
+		self.addCleanup(patcher.stop)
+
+	def test_safe_requests_read_from_a_replica(self):
+		"""Test list, detail and profile reads choose a replica"""
+		for url in (
+			reverse('recipe:tag-list'),
+			reverse('recipe:ingrediant-list'),
+			reverse('recipe:recipe-list'),
+			reverse('user:me'),
+		):
+			res = self.client.get(url)
+			self.assertEqual(res.status_code, 200)
+		self.assertEqual(self.choose.call_count, 4)
+		self.assertIsNone(routers.reading_from())
+
+	def test_writes_pin_the_user_to_the_primary(self):
+		"""Test a user who wrote reads from the primary during the pin window"""
+		res = self.client.post(reverse('recipe:tag-list'), {'name': 'Vegan'})
+		self.assertEqual(res.status_code, 201)
+		self.assertFalse(self.choose.called)
+
+		res = self.client.get(reverse('recipe:tag-list'))
+		self.assertEqual(res.data[0]['name'], 'Vegan')
+		self.assertFalse(self.choose.called)
+		self.assertTrue(routers.is_pinned(self.user.pk))
+
+		cache.delete(routers.pin_key(self.user.pk))
+		self.client.get(reverse('recipe:tag-list'))
+		self.assertEqual(self.choose.call_count, 1)
+
+	def test_pins_are_per_user(self):
+		"""Test a write pins only the user who made it"""
+		other = get_user_model().objects.create_user('other@test.com', 'testpass')
+		self.client.patch(reverse('user:me'), {'name': 'New name'})
+
+		client = APIClient()
+		client.force_authenticate(other)
+		client.get(reverse('recipe:tag-list'))
+		self.assertEqual(self.choose.call_count, 1)
@@ -0,0 +1,27 @@
+import importlib
+
+from django.test import SimpleTestCase
+from django.urls import Resolver404, get_resolver
+
+
+class APISettingsTests(SimpleTestCase):
+
+	def test_api_settings_skip_unused_apps(self):
+		"""Test the API-only profile leaves out admin, sessions and templates"""
+		api_settings = importlib.import_module('app.settings_api')
+		for app in ('django.contrib.admin', 'django.contrib.sessions', 'django.contrib.messages'):
+			self.assertNotIn(app, api_settings.INSTALLED_APPS)
+		self.assertIn('recipe', api_settings.INSTALLED_APPS)
+		self.assertNotIn(
+			'django.contrib.sessions.middleware.SessionMiddleware',
+			api_settings.MIDDLEWARE
+		)
+		self.assertEqual(api_settings.TEMPLATES, [])
+
+	def test_api_urls_skip_admin(self):
+		"""Test the API-only URLconf routes the API but not the admin"""
+		resolver = get_resolver('app.urls_api')
+		self.assertEqual(resolver.resolve('/api/recipe/recipes/').url_name, 'recipe-list')
+		self.assertEqual(resolver.resolve('/readyz').url_name, 'readyz')
+		with self.assertRaises(Resolver404):
+			resolver.resolve('/admin/')
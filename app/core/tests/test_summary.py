@@ -0,0 +1,104 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core import summary
+from core.models import Tag, Ingrediant, Recipe
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class RecipeSummaryTests(TestCase):
+	"""Test the recipe summary follows its tags and ingrediants"""
+
+	def setUp(self):
+		self.user = get_user_model().objects.create_user('test@test.com', 'testpass')
+		self.recipe = Recipe.objects.create(
+			user=self.user, title='Curry', time_minutes=20, price=7
+		)
+		self.vegan = Tag.objects.create(user=self.user, name='Vegan')
+		self.spicy = Tag.objects.create(user=self.user, name='Spicy')
+		self.rice = Ingrediant.objects.create(user=self.user, name='Rice')
+
+	def read(self, recipe=None):
+		recipe = recipe or self.recipe
+		return summary.load(Recipe.objects.values_list('summary', flat=True).get(pk=recipe.pk))
+
+	def test_new_recipe_has_an_empty_summary(self):
+		"""Test a recipe without relations has empty lists"""
+		self.assertEqual(self.read(), {'tags': [], 'ingrediants': []})
+
+	def test_add_and_remove(self):
+		"""Test linking and unlinking rebuilds the summary in id order"""
+		self.recipe.tags.add(self.spicy, self.vegan)
+		self.recipe.ingrediants.add(self.rice)
+		self.assertEqual(self.read(), {
+			'tags': [[self.vegan.id, 'Vegan'], [self.spicy.id, 'Spicy']],
+			'ingrediants': [[self.rice.id, 'Rice']],
+		})
+
+		self.recipe.tags.remove(self.vegan)
+		self.assertEqual(self.read()['tags'], [[self.spicy.id, 'Spicy']])
+
+		self.recipe.ingrediants.clear()
+		self.assertEqual(self.read()['ingrediants'], [])
+
+	def test_save_keeps_the_summary(self):
+		"""Test saving an instance loaded before a change keeps the summary"""
+		self.recipe.tags.add(self.vegan)
+		self.recipe.title = 'Green curry'
+		self.recipe.save()
+
+		self.assertEqual(self.read()['tags'], [[self.vegan.id, 'Vegan']])
+		self.assertEqual(Recipe.objects.get(pk=self.recipe.pk).title, 'Green curry')
+
+	def test_reverse_changes(self):
+		"""Test changes made from the tag side rebuild every recipe"""
+		other = Recipe.objects.create(user=self.user, title='Soup', time_minutes=5, price=3)
+		self.vegan.recipe_set.add(self.recipe, other)
+		self.assertEqual(self.read(other)['tags'], [[self.vegan.id, 'Vegan']])
+
+		self.vegan.recipe_set.clear()
+		self.assertEqual(self.read()['tags'], [])
+		self.assertEqual(self.read(other)['tags'], [])
+
+	def test_rename_and_delete(self):
+		"""Test renaming or deleting a tag rebuilds its recipes"""
+		self.recipe.tags.add(self.vegan)
+
+		self.vegan.name = 'Plant based'
+		self.vegan.save()
+		self.assertEqual(self.read()['tags'], [[self.vegan.id, 'Plant based']])
+
+		self.vegan.delete()
+		self.assertEqual(self.read()['tags'], [])
+
+	def test_rebuild(self):
+		"""Test rebuild recomputes summaries in batches and counts them"""
+		recipes = [
+			Recipe.objects.create(user=self.user, title='Recipe %d' % index, time_minutes=5, price=1)
+			for index in range(5)
+		]
+		Recipe.tags.through.objects.bulk_create([
+			Recipe.tags.through(recipe_id=recipe.id, tag_id=self.vegan.id)
+			for recipe in recipes
+		])
+
+		self.assertEqual(summary.rebuild(Recipe.objects.all(), batch_size=2), 6)
+
+		for recipe in recipes:
+			self.assertEqual(self.read(recipe)['tags'], [[self.vegan.id, 'Vegan']])
+		self.assertEqual(self.read()['tags'], [])
+
+	def test_list_reads_unbuilt_summaries_from_the_relations(self):
+		"""Test the list falls back to the through tables for NULL summaries"""
+		self.recipe.tags.add(self.vegan, self.spicy)
+		client = APIClient()
+		client.force_authenticate(self.user)
+		built = client.get(RECIPES_URL).data
+
+		Recipe.objects.update(summary=None)
+
+		self.assertEqual(client.get(RECIPES_URL).data, built)
+		self.assertEqual(built[0]['tags'], [self.vegan.id, self.spicy.id])
@@ -0,0 +1,44 @@
+import logging
+
+from django.db.utils import DatabaseError
+from django.http import HttpResponse, HttpResponseForbidden, JsonResponse
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_safe
+
+from core import metrics as request_metrics
+from core import warmup
+
+logger = logging.getLogger(__name__)
+
+@never_cache
+@require_safe
+def healthz(request):
+	"""Liveness: the process is up and serving requests"""
+	return JsonResponse({'status': 'ok'})
+
+
+@never_cache
+@require_safe
+def readyz(request):
+	"""Readiness: warmed up and able to reach the database"""
+	if not warmup.is_ready():
+		return JsonResponse({'status': 'warming up'}, status=503)
+	try:
+		warmup.check_database()
+	except DatabaseError as error:
+		# The message can name hosts and users, keep it in the logs
+		logger.warning('Readiness check failed: %s', error)
+		return JsonResponse({'status': 'database unavailable'}, status=503)
+	return JsonResponse({'status': 'ready'})
+
+
+@never_cache
+@require_safe
+def metrics(request):
+	"""Request metrics of every worker process in the Prometheus text format"""
+	if not request_metrics.scrape_allowed(request):
+		return HttpResponseForbidden()
+	return HttpResponse(
+		request_metrics.render(request_metrics.collect()),
+		content_type='text/plain; version=0.0.4; charset=utf-8'
+	)
@@ -0,0 +1,137 @@
+"""Warming a process up before it takes traffic
+
+warm_up opens the pooled database connections, imports every view
+through the URLconf, creates the process wide caches and fills them with
+the entries likely to be asked for first, then marks the process ready.
+/readyz answers 503 until then, so orchestrators only route requests to
+warmed instances.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Max
+from django.db.utils import OperationalError
+from django.urls import get_resolver
+
+DEFAULTS = {
+	# Most recently issued tokens loaded into the token cache
+	'TOKENS': 1000,
+	# Fallback search indexes built for the most recently active users
+	'SEARCH_INDEXES': 10,
+}
+
+logger = logging.getLogger(__name__)
+
+_ready = threading.Event()
+_started = threading.Lock()
+
+
+def get_settings():
+	options = dict(DEFAULTS)
+	options.update(getattr(settings, 'WARM_UP', {}))
+	return options
+
+
+def check_database(alias='default'):
+	"""Run a trivial query, raising OperationalError if it fails"""
+	with connections[alias].cursor() as cursor:
+		cursor.execute('SELECT 1')
+
+
+def open_connections():
+	"""Connect to every database, filling pools to their minimum size"""
+	for connection in connections.all():
+		connection.ensure_connection()
+		pool = getattr(connection, 'pool', None)
+		if pool is not None:
+			pool.fill()
+
+
+def import_urlconf():
+	"""Import every view and build the URL resolver's reverse lookups"""
+	resolver = get_resolver()
+	resolver.url_patterns
+	resolver.reverse_dict
+
+
+def create_caches():
+	"""Create the process wide caches and worker pools"""
+	from core import hashing, search
+	from user.authentication import get_token_cache
+	hashing.get_pool()
+	search.get_index_cache()
+	get_token_cache()
+
+
+def fill_caches():
+	"""Load the newest tokens and the search indexes of the busiest users"""
+	from rest_framework.authtoken.models import Token
+	from core import search
+	from core.models import Recipe
+	from user.authentication import dump_user, get_token_cache
+	options = get_settings()
+
+	token_cache = get_token_cache()
+	tokens = Token.objects.select_related('user').order_by('-created')
+	for token in tokens[:options['TOKENS']]:
+		token_cache.set(token.key, dump_user(token.user))
+
+	if not search.is_indexed():
+		users = Recipe.objects.order_by().values('user_id') \
+			.annotate(latest=Max('updated_at')).order_by('-latest') \
+			.values_list('user_id', flat=True)
+		for user_id in users[:options['SEARCH_INDEXES']]:
+			search.get_index(user_id)
+
+
+STEPS = (
+	('database connections', open_connections),
+	('URLconf', import_urlconf),
+	('caches', create_caches),
+	('hot cache entries', fill_caches),
+)
+
+
+def warm_up():
+	"""Run every warm-up step, mark the process ready and return timings"""
+	timings = []
+	for name, step in STEPS:
+		started = time.perf_counter()
+		step()
+		timings.append((name, time.perf_counter() - started))
+	_ready.set()
+	return timings
+
+
+def start(retry_delay=1):
+	"""Warm up on a background thread, retrying until the database is up"""
+	if not _started.acquire(blocking=False):
+		return
+
+	def run():
+		try:
+			while True:
+				try:
+					warm_up()
+					return
+				except OperationalError as error:
+					logger.warning('Warm-up waiting for the database: %s', error)
+					time.sleep(retry_delay)
+				except Exception:
+					# Not going away by itself; /readyz keeps answering 503
+					logger.exception('Warm-up failed')
+					return
+		finally:
+			# Hand the connections back before the thread exits; pooled
+			# backends keep them open for the request threads
+			connections.close_all()
+
+	threading.Thread(target=run, name='warm-up', daemon=True).start()
+
+
+def is_ready():
+	return _ready.is_set()
+
@@ -0,0 +1,80 @@
+"""Per-user cache of the tag and ingrediant list responses
+
+Entries are keyed on a per-user generation token. Invalidating a user's
+lists only deletes that token, so every cached variant of the list
+(pagination, query parameters) is orphaned at once and left to the TTL
+and LRU eviction of the cache backend.
+"""
+import hashlib
+import uuid
+
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+from recipe.conditional import etag_matches, not_modified
+
+CACHE_ALIAS = 'recipe_attrs'
+
+
+def get_cache():
+	return caches[CACHE_ALIAS]
+
+
+def generation_key(model, user_id):
+	return 'gen:%s:%s' % (model._meta.label_lower, user_id)
+
+
+def get_generation(model, user_id):
+	"""Return the current generation token of a user's list"""
+	cache = get_cache()
+	key = generation_key(model, user_id)
+	generation = cache.get(key)
+	if generation is None:
+		cache.add(key, uuid.uuid4().hex, None)
+		generation = cache.get(key)
+	return generation
+
+
+def list_key(model, user_id, request):
+	"""Return the cache key of one list response for a user"""
+	variant = '%s\n%s' % (request.build_absolute_uri(), request.accepted_media_type)
+	return 'list:%s:%s:%s:%s' % (
+		model._meta.label_lower,
+		user_id,
+		get_generation(model, user_id),
+		hashlib.md5(variant.encode('utf-8')).hexdigest(),
+	)
+
+
+def invalidate(model, user_id):
+	"""Drop the cached lists of a user, again once the transaction commits
+
+	The second pass stops a concurrent reader from caching rows it read
+	before the write became visible.
+	"""
+	key = generation_key(model, user_id)
+	get_cache().delete(key)
+	transaction.on_commit(lambda: get_cache().delete(key))
+
+
+class CachedListMixin:
+	"""Serve list responses and their ETags from the per-user cache"""
+
+	def list(self, request, *args, **kwargs):
+		model = self.queryset.model
+		key = list_key(model, request.user.pk, request)
+		entry = get_cache().get(key)
+		if entry is not None:
+			etag, data = entry
+			if etag is None:
+				return Response(data)
+			if etag_matches(request, etag):
+				return not_modified(etag)
+			return Response(data, headers={'ETag': etag})
+
+		response = super().list(request, *args, **kwargs)
+		if response.status_code == status.HTTP_200_OK:
+			get_cache().set(key, (response.get('ETag'), response.data))
+		return response
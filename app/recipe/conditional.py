@@ -0,0 +1,95 @@
+"""Strong ETags and If-None-Match handling for the recipe API
+
+The ETag of a response is derived from an aggregate over the rows it
+would render (latest updated_at and row count), so a matching
+If-None-Match is answered with a 304 without loading or serializing
+any row.
+"""
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status
+from rest_framework.response import Response
+
+
+def etag_matches(request, etag):
+	"""Return True when the request already holds the given ETag"""
+	header = request.META.get('HTTP_IF_NONE_MATCH')
+	if not header:
+		return False
+	etags = parse_etags(header)
+	return '*' in etags or etag in etags
+
+
+def not_modified(etag):
+	return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+
+class ConditionalMixin:
+	"""Compute the ETag of a response from an aggregate query"""
+
+	def get_etag_aggregates(self, queryset):
+		"""Return values that change whenever the rendered rows change"""
+		return queryset.aggregate(
+			updated=Max('updated_at'),
+			count=Count('id', distinct=True)
+		)
+
+	def get_etag(self, queryset):
+		return self.make_etag(self.get_etag_aggregates(queryset))
+
+	def make_etag(self, aggregates):
+		"""Hash the aggregates with everything else the response depends on"""
+		parts = [
+			str(self.request.user.pk),
+			self.request.get_full_path(),
+			str(self.request.accepted_media_type),
+		]
+		parts.extend(
+			'%s=%s' % (name, aggregates[name]) for name in sorted(aggregates)
+		)
+		digest = hashlib.md5('\n'.join(parts).encode('utf-8')).hexdigest()
+		return quote_etag(digest)
+
+	def conditional_response(self, etag, respond, *args, **kwargs):
+		"""Return a 304 for a matching ETag, otherwise the tagged response"""
+		if etag_matches(self.request, etag):
+			return not_modified(etag)
+		response = respond(self.request, *args, **kwargs)
+		if response.status_code == status.HTTP_200_OK:
+			response['ETag'] = etag
+		return response
+
+
+class ConditionalListMixin(ConditionalMixin):
+	"""Answer unpaginated list requests conditionally
+
+	Pages are left alone: the aggregate covers every row of the user and
+	would cost more than fetching a single page.
+	"""
+
+	def list(self, request, *args, **kwargs):
+		if self.paginator is not None and self.paginator.is_paginated(request):
+			return super().list(request, *args, **kwargs)
+		etag = self.get_etag(self.filter_queryset(self.get_queryset()))
+		return self.conditional_response(etag, super().list, *args, **kwargs)
+
+
+class ConditionalRetrieveMixin(ConditionalMixin):
+	"""Answer retrieve requests conditionally"""
+
+	def retrieve(self, request, *args, **kwargs):
+		lookup = self.lookup_url_kwarg or self.lookup_field
+		try:
+			queryset = self.filter_queryset(self.get_queryset()) \
+				.filter(**{self.lookup_field: kwargs[lookup]})
+			aggregates = self.get_etag_aggregates(queryset)
+		except (TypeError, ValueError):
+			aggregates = {}
+		if not aggregates.get('count'):
+			# Let retrieve raise the 404 for a missing object
+			return super().retrieve(request, *args, **kwargs)
+
+		etag = self.make_etag(aggregates)
+		return self.conditional_response(etag, super().retrieve, *args, **kwargs)
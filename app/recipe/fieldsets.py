@@ -0,0 +1,61 @@
+"""Sparse fieldsets and expansion of serialized relations
+
+?fields=id,title keeps only the named fields of a serializer, and
+?expand=tags nests the named relations as objects instead of ids. The
+serializer class built for a fieldset is a subclass of the view's
+serializer class with a narrower Meta.fields, so list rows select only
+its columns and views can defer the others and skip unused prefetches.
+"""
+from functools import lru_cache
+
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ValidationError
+
+FIELDS_PARAM = 'fields'
+EXPAND_PARAM = 'expand'
+
+
+def parse_names(query_params, param, allowed):
+	"""Return the comma separated names of a query parameter, in allowed order"""
+	names = {name.strip() for name in query_params[param].split(',') if name.strip()}
+	unknown = sorted(names.difference(allowed))
+	if unknown:
+		raise ValidationError({param: [
+			_('Unknown names: %(names)s. Choose from %(allowed)s.') % {
+				'names': ', '.join(unknown), 'allowed': ', '.join(allowed),
+			}
+		]})
+	return tuple(name for name in allowed if name in names)
+
+
+def parse_fieldset(query_params, serializer_class, expand=()):
+	"""Return (fields, expand) asked for by a request, None when neither was
+
+	Relations in expand are nested unless ?expand= names others; only
+	relations among the fields are expanded.
+	"""
+	if FIELDS_PARAM not in query_params and EXPAND_PARAM not in query_params:
+		return None
+	fields = tuple(serializer_class.Meta.fields)
+	if FIELDS_PARAM in query_params:
+		fields = parse_names(query_params, FIELDS_PARAM, fields)
+		if not fields:
+			raise ValidationError({FIELDS_PARAM: [_('Name at least one field.')]})
+	if EXPAND_PARAM in query_params:
+		expand = parse_names(query_params, EXPAND_PARAM, tuple(serializer_class.expandable))
+	return fields, tuple(name for name in expand if name in fields)
+
+
+@lru_cache(maxsize=None)
+def sparse_serializer(serializer_class, fields, expand):
+	"""Return a subclass of serializer_class rendering only fields
+
+	The relations in expand are rendered by the nested serializers given
+	in serializer_class.expandable.
+	"""
+	attrs = {
+		name: serializer_class.expandable[name](many=True, read_only=True)
+		for name in expand
+	}
+	attrs['Meta'] = type('Meta', (serializer_class.Meta,), {'fields': fields})
+	return type(serializer_class.__name__, (serializer_class,), attrs)
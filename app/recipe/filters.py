@@ -0,0 +1,78 @@
+from django.db.models import CharField, Count, Value
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+from core import search
+from core.models import Recipe
+
+# Query parameters filtering recipes, mapped to their many to many field
+RELATION_PARAMS = ('tags', 'ingrediants')
+
+
+class RecipeSearchFilter(BaseFilterBackend):
+	"""Filter recipe lists with ?search= over titles, tags and ingrediants"""
+	search_param = 'search'
+
+	def filter_queryset(self, request, queryset, view):
+		query = request.query_params.get(self.search_param, '').strip()
+		if not query or getattr(view, 'detail', False):
+			return queryset
+		return search.search(queryset, query, request.user.pk)
+
+
+class RecipeRelationFilter(BaseFilterBackend):
+	"""Filter recipe lists with ?tags=1,2&ingrediants=3
+
+	A recipe matches a parameter when it is linked to any of its ids, and
+	must match every parameter given. Each one becomes a semi-join on the
+	through table, so recipes are never duplicated.
+	"""
+
+	def filter_queryset(self, request, queryset, view):
+		if getattr(view, 'detail', False):
+			return queryset
+		for param in RELATION_PARAMS:
+			ids = parse_ids(request.query_params, param)
+			if ids:
+				queryset = queryset.filter(pk__in=links(param, ids))
+		return queryset
+
+
+def parse_ids(query_params, param):
+	"""Return the comma separated ids of a query parameter"""
+	value = query_params.get(param, '').strip()
+	if not value:
+		return []
+	try:
+		return sorted({int(pk) for pk in value.split(',') if pk.strip()})
+	except ValueError:
+		raise ValidationError({param: [_('Expected comma separated ids.')]})
+
+
+def links(field, ids):
+	"""Return the ids of recipes linked to any of the given ids"""
+	through = Recipe._meta.get_field(field).remote_field.through
+	column = Recipe._meta.get_field(field).related_model._meta.model_name
+	return through.objects.filter(**{column + '_id__in': ids}).values('recipe_id')
+
+
+def facet_counts(recipes):
+	"""Count the recipes per tag and per ingrediant in one grouped query"""
+	recipe_ids = recipes.order_by().values('pk')
+	groups = []
+	for field in RELATION_PARAMS:
+		through = Recipe._meta.get_field(field).remote_field.through
+		column = Recipe._meta.get_field(field).related_model._meta.model_name + '_id'
+		groups.append(
+			through.objects.filter(recipe_id__in=recipe_ids)
+			.values(column)
+			.annotate(facet=Value(field, CharField()), count=Count('recipe_id'))
+			.values_list('facet', column, 'count')
+		)
+	facets = {field: [] for field in RELATION_PARAMS}
+	for field, pk, count in groups[0].union(*groups[1:], all=True):
+		facets[field].append({'id': pk, 'count': count})
+	for counts in facets.values():
+		counts.sort(key=lambda facet: (-facet['count'], facet['id']))
+	return facets
@@ -0,0 +1,162 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+	"""Opt-in cursor pagination seeking on the view ordering
+
+	Pages are only produced when the client sends ``page_size`` or
+	``cursor``. A page is fetched with a WHERE clause on the ordering
+	values of the last row seen, so there is no OFFSET and no COUNT(*).
+	"""
+	page_size = 100
+	max_page_size = 1000
+	page_size_query_param = 'page_size'
+	cursor_query_param = 'cursor'
+	ordering = ('-id',)
+	invalid_cursor_message = _('Invalid cursor')
+
+	def is_paginated(self, request):
+		"""Return True when the client opted in to pagination"""
+		params = request.query_params
+		return (self.page_size_query_param in params or
+			self.cursor_query_param in params)
+
+	def paginate_queryset(self, queryset, request, view=None):
+		"""Return one page of rows, or None when the client did not opt in"""
+		if not self.is_paginated(request):
+			return None
+
+		self.base_url = request.build_absolute_uri()
+		self.ordering = getattr(view, 'ordering', self.ordering)
+		self.page_size = self.get_page_size(request)
+		position, reverse = self.decode_cursor(request, queryset.model)
+
+		if position is not None:
+			queryset = queryset.filter(self.seek_filter(position, reverse))
+		ordering = self.ordering
+		if reverse:
+			ordering = [invert(field) for field in ordering]
+		rows = list(queryset.order_by(*ordering)[:self.page_size + 1])
+
+		has_more = len(rows) > self.page_size
+		rows = rows[:self.page_size]
+		if reverse:
+			rows.reverse()
+			self.has_next, self.has_previous = position is not None, has_more
+		else:
+			self.has_next, self.has_previous = has_more, position is not None
+
+		self.position = position
+		self.page = rows
+		return rows
+
+	def get_paginated_response(self, data):
+		return Response(OrderedDict([
+			('next', self.get_next_link()),
+			('previous', self.get_previous_link()),
+			('results', data),
+		]))
+
+	def get_page_size(self, request):
+		"""Return the requested page size, capped at max_page_size"""
+		try:
+			size = int(request.query_params[self.page_size_query_param])
+		except (KeyError, ValueError):
+			return self.page_size
+		if size <= 0:
+			return self.page_size
+		return min(size, self.max_page_size)
+
+	def get_next_link(self):
+		if not self.has_next:
+			return None
+		position = self.get_position(self.page[-1]) if self.page \
+			else self.position
+		return self.encode_cursor(position, reverse=False)
+
+	def get_previous_link(self):
+		if not self.has_previous:
+			return None
+		position = self.get_position(self.page[0]) if self.page \
+			else self.position
+		return self.encode_cursor(position, reverse=True)
+
+	def get_position(self, row):
+		"""Return the ordering values of a row, an object or a values() dict"""
+		if isinstance(row, dict):
+			return [row[field.lstrip('-')] for field in self.ordering]
+		return [getattr(row, field.lstrip('-')) for field in self.ordering]
+
+	def seek_filter(self, position, reverse):
+		"""Build the keyset condition for rows after the given position
+
+		For an ordering (a, b) this is ``a > x OR (a = x AND b > y)`` with
+		each comparison flipped for descending fields and for reverse seeks.
+		"""
+		conditions = []
+		for index, field in enumerate(self.ordering):
+			name = field.lstrip('-')
+			descending = field.startswith('-')
+			lookup = 'lt' if descending != reverse else 'gt'
+			equal = {
+				self.ordering[before].lstrip('-'): position[before]
+				for before in range(index)
+			}
+			equal['%s__%s' % (name, lookup)] = position[index]
+			conditions.append(Q(**equal))
+		return reduce(or_, conditions)
+
+	def encode_cursor(self, position, reverse):
+		"""Return a link to the page seeking from the given position"""
+		payload = {'p': position}
+		if reverse:
+			payload['r'] = 1
+		data = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+		cursor = urlsafe_b64encode(data).decode('ascii')
+		return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+	def decode_cursor(self, request, model):
+		"""Return the (position, reverse) pair encoded in the request
+
+		Each position value is converted by its model field, so a tampered
+		cursor is rejected here instead of failing in the query.
+		"""
+		encoded = request.query_params.get(self.cursor_query_param)
+		if encoded is None:
+			return None, False
+		try:
+			payload = json.loads(urlsafe_b64decode(encoded.encode('ascii')))
+			position = payload['p']
+			reverse = bool(payload.get('r'))
+		except (TypeError, ValueError, KeyError, UnicodeError):
+			raise NotFound(self.invalid_cursor_message)
+		if not isinstance(position, list) or \
+				len(position) != len(self.ordering):
+			raise NotFound(self.invalid_cursor_message)
+		try:
+			position = [
+				model._meta.get_field(field.lstrip('-')).to_python(value)
+				for field, value in zip(self.ordering, position)
+			]
+		except ValidationError:
+			raise NotFound(self.invalid_cursor_message)
+		if None in position:
+			raise NotFound(self.invalid_cursor_message)
+		return position, reverse
+
+
+def invert(field):
+	"""Return the opposite direction of an ordering field"""
+	return field[1:] if field.startswith('-') else '-' + field
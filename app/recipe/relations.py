@@ -0,0 +1,103 @@
+"""Bulk changes to the tags and ingrediants of a recipe
+
+The related manager's set() and add() read the relation back through a
+join and check again for existing rows before inserting. The functions
+below read and write the through table directly, one query each, and
+send the same m2m_changed signals, so the receivers touching updated_at,
+reindexing and invalidating caches see no difference.
+"""
+from django.db import router, transaction
+from django.db.models.signals import m2m_changed
+
+
+class Relation:
+	"""The through table of one many to many field of an instance"""
+
+	def __init__(self, instance, name):
+		field = instance._meta.get_field(name)
+		self.instance = instance
+		self.name = name
+		self.model = field.remote_field.model
+		self.through = field.remote_field.through
+		self.source = self.through._meta.get_field(field.m2m_field_name()).attname
+		self.target = self.through._meta.get_field(field.m2m_reverse_field_name()).attname
+		self.using = router.db_for_write(self.through, instance=instance)
+
+	def rows(self):
+		return self.through._default_manager.using(self.using) \
+			.filter(**{self.source: self.instance.pk})
+
+	def ids(self, among=None):
+		"""Return the linked ids, optionally only those among the given ids"""
+		rows = self.rows()
+		if among is not None:
+			rows = rows.filter(**{self.target + '__in': among})
+		return set(rows.values_list(self.target, flat=True))
+
+	def send(self, action, pk_set):
+		if action.startswith('post_'):
+			# Forget a prefetched relation, as the related manager does
+			getattr(self.instance, '_prefetched_objects_cache', {}).pop(self.name, None)
+		m2m_changed.send(
+			sender=self.through,
+			action=action,
+			instance=self.instance,
+			reverse=False,
+			model=self.model,
+			pk_set=pk_set,
+			using=self.using,
+		)
+
+	def insert(self, ids):
+		"""Link ids known not to be linked yet"""
+		if not ids:
+			return
+		ids = set(ids)
+		self.send('pre_add', ids)
+		self.through._default_manager.using(self.using).bulk_create([
+			self.through(**{self.source: self.instance.pk, self.target: pk})
+			for pk in ids
+		])
+		self.send('post_add', ids)
+
+	def delete(self, ids):
+		"""Unlink ids"""
+		if not ids:
+			return
+		ids = set(ids)
+		self.send('pre_remove', ids)
+		self.rows().filter(**{self.target + '__in': ids}).delete()
+		self.send('post_remove', ids)
+
+
+def set_related(instance, name, ids, current=None):
+	"""Make ids the related ids, inserting and deleting only the difference
+
+	Pass the current ids when they are known, such as an empty set for a
+	new instance, to skip reading them.
+	"""
+	relation = Relation(instance, name)
+	ids = set(ids)
+	with transaction.atomic(using=relation.using, savepoint=False):
+		if current is None:
+			current = relation.ids()
+		relation.delete(current - ids)
+		relation.insert(ids - current)
+
+
+def add_related(instance, name, ids):
+	"""Link ids that are not linked yet, returning the ones added"""
+	relation = Relation(instance, name)
+	with transaction.atomic(using=relation.using, savepoint=False):
+		added = set(ids) - relation.ids(among=ids)
+		relation.insert(added)
+	return added
+
+
+def remove_related(instance, name, ids):
+	"""Unlink ids that are linked, returning the ones removed"""
+	relation = Relation(instance, name)
+	with transaction.atomic(using=relation.using, savepoint=False):
+		removed = relation.ids(among=ids)
+		relation.delete(removed)
+	return removed
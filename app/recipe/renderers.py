@@ -0,0 +1,41 @@
+import csv
+import io
+import json
+
+from rest_framework import renderers
+
+
+class NDJSONRenderer(renderers.BaseRenderer):
+	"""Newline delimited JSON
+
+	Exports stream their own body; this renders the error responses.
+	"""
+	media_type = 'application/x-ndjson'
+	format = 'ndjson'
+	charset = 'utf-8'
+
+	def render(self, data, accepted_media_type=None, renderer_context=None):
+		if data is None:
+			return b''
+		return json.dumps(data, ensure_ascii=False).encode(self.charset) + b'\n'
+
+
+class CSVRenderer(renderers.BaseRenderer):
+	"""Comma separated values
+
+	Exports stream their own body; this renders the error responses.
+	"""
+	media_type = 'text/csv'
+	format = 'csv'
+	charset = 'utf-8'
+
+	def render(self, data, accepted_media_type=None, renderer_context=None):
+		if data is None:
+			return b''
+		if not isinstance(data, dict):
+			data = {'detail': data}
+		buffer = io.StringIO()
+		writer = csv.writer(buffer)
+		writer.writerow(data.keys())
+		writer.writerow(data.values())
+		return buffer.getvalue().encode(self.charset)
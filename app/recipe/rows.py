@@ -0,0 +1,174 @@
+"""Read-only list responses built from values() rows
+
+ModelSerializer runs every field of every row through its own field
+object, and PrimaryKeyRelatedField does so again for every related id.
+List responses are read-only, so their rows are read with values(), the
+related ids come from one query on the through table per relation, and
+only fields whose representation is not already the column value are
+passed through their serializer field. The rows equal serializer.data,
+and with values already JSON types the encoder never calls back into
+Python. Given the summary column of core.summary, related ids are read
+from it instead, and the through tables are only queried for rows whose
+summary was never built. Nested serializers of plain fields, such as
+expanded relations, are read the same way.
+"""
+from collections import defaultdict
+from functools import lru_cache
+
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import fields, relations, serializers
+from rest_framework.response import Response
+
+from core import summary
+from core.recipe_io import chunked
+
+# Ids per query when reading related ids
+BATCH_SIZE = 500
+# Fields whose representation of a column value is the value itself
+PLAIN_FIELDS = (fields.IntegerField, fields.CharField, fields.ReadOnlyField)
+# Columns of a related object held in its summary entry, in entry order
+SUMMARY_COLUMNS = ('id', 'name')
+
+
+def represent_as(field):
+	"""Return how a field represents a column value, None if unchanged"""
+	if type(field) in PLAIN_FIELDS:
+		return None
+	return field.to_representation
+
+
+class RowSerializer:
+	"""Represent rows the way a ModelSerializer would, read-only"""
+
+	def __init__(self, serializer_class, summary_field=None):
+		serializer = serializer_class()
+		self.model = serializer.Meta.model
+		self.serializer_name = serializer_class.__name__
+		self.summary_field = summary_field
+		self.fields = []
+		for name, field in serializer.fields.items():
+			if field.write_only:
+				continue
+			if '.' in field.source or field.source == '*':
+				raise ImproperlyConfigured(
+					'%s.%s: only model fields and annotations can be read as rows'
+					% (serializer_class.__name__, name)
+				)
+			if isinstance(field, serializers.ListSerializer):
+				self.fields.append((name, field.source, True, self.nested_columns(name, field.child)))
+			elif isinstance(field, relations.ManyRelatedField):
+				if not isinstance(field.child_relation, relations.PrimaryKeyRelatedField):
+					raise ImproperlyConfigured(
+						'%s.%s: only primary key relations can be read as rows'
+						% (serializer_class.__name__, name)
+					)
+				self.fields.append((name, field.source, True, None))
+			else:
+				self.fields.append((name, field.source, False, represent_as(field)))
+
+	def nested_columns(self, name, serializer):
+		"""Return the (name, source) of each field of a nested serializer"""
+		columns = []
+		for child_name, child in serializer.fields.items():
+			if type(child) not in PLAIN_FIELDS or '.' in child.source:
+				raise ImproperlyConfigured(
+					'%s.%s: only plain fields of nested objects can be read as rows'
+					% (self.serializer_name, name)
+				)
+			columns.append((child_name, child.source))
+		return tuple(columns)
+
+	def values(self, queryset, *extra):
+		"""Return a values() queryset of the columns, the pk and extra names"""
+		names = [source for _, source, many, _ in self.fields if not many]
+		if self.summary_field and any(many for _, _, many, _ in self.fields):
+			extra = (self.summary_field,) + extra
+		names.extend(name for name in ('pk',) + extra if name not in names)
+		return queryset.values(*names)
+
+	def represent(self, rows):
+		"""Return the representation of rows read by values()"""
+		rows = list(rows)
+		many_fields = [
+			(source, columns) for _, source, many, columns in self.fields if many
+		]
+		summaries = {}
+		if self.summary_field and many_fields:
+			summaries = {
+				row['pk']: summary.load(row[self.summary_field])
+				for row in rows if row[self.summary_field] is not None
+			}
+		related = {}
+		for source, columns in many_fields:
+			if columns is None or set(dict(columns).values()) <= set(SUMMARY_COLUMNS):
+				pks = [row['pk'] for row in rows if row['pk'] not in summaries]
+			else:
+				pks = [row['pk'] for row in rows]
+			related[source] = (set(pks), self.related(source, pks, columns) if pks else {})
+		data = []
+		for row in rows:
+			item = {}
+			built = summaries.get(row['pk'])
+			for name, source, many, convert in self.fields:
+				if not many:
+					value = row[source]
+					item[name] = value if value is None or convert is None else convert(value)
+				elif row['pk'] in related[source][0]:
+					item[name] = related[source][1].get(row['pk'], [])
+				elif convert is None:
+					item[name] = [entry[0] for entry in built[source]]
+				else:
+					item[name] = [
+						{column: entry[SUMMARY_COLUMNS.index(key)] for column, key in convert}
+						for entry in built[source]
+					]
+			data.append(item)
+		return data
+
+	def related(self, source, pks, columns=None):
+		"""Return {pk: [related ids in ascending order]} for a many to many field
+
+		Given the (name, source) columns of a nested serializer, the related
+		objects are returned as dicts of those columns instead of ids.
+		"""
+		field = self.model._meta.get_field(source)
+		through = field.remote_field.through
+		own = through._meta.get_field(field.m2m_field_name()).attname
+		target = field.m2m_reverse_field_name()
+		other = through._meta.get_field(target).attname
+		paths = [other]
+		if columns is not None:
+			paths = [target + '__' + column for _, column in columns]
+		related = defaultdict(list)
+		for chunk in chunked(pks, BATCH_SIZE):
+			links = through.objects.filter(**{own + '__in': chunk}) \
+				.order_by(own, other).values_list(own, *paths)
+			for link in links:
+				if columns is None:
+					related[link[0]].append(link[1])
+				else:
+					related[link[0]].append(
+						{name: value for (name, _), value in zip(columns, link[1:])}
+					)
+		return related
+
+
+@lru_cache(maxsize=None)
+def get_row_serializer(serializer_class, summary_field=None):
+	return RowSerializer(serializer_class, summary_field)
+
+
+class RowListMixin:
+	"""Serve the list action from values() rows instead of serializers"""
+	# Column holding a core.summary of the related ids, if any
+	row_summary_field = None
+
+	def list(self, request, *args, **kwargs):
+		rows = get_row_serializer(self.get_serializer_class(), self.row_summary_field)
+		ordering = [field.lstrip('-') for field in getattr(self, 'ordering', ())]
+		queryset = rows.values(self.filter_queryset(self.get_queryset()), *ordering)
+
+		page = self.paginate_queryset(queryset)
+		if page is not None:
+			return self.get_paginated_response(rows.represent(page))
+		return Response(rows.represent(queryset))
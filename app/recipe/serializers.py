@@ -1,5 +1,79 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
 from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, MANY_RELATION_KWARGS
 from core.models import Tag, Ingrediant, Recipe
+from recipe.relations import set_related
+
+class BulkCreateListSerializer(serializers.ListSerializer):
+	"""Create every validated item with a single bulk INSERT"""
+	
+	def create(self, validated_data):
+		model = self.child.Meta.model
+		return model.objects.bulk_create(
+			[model(**attrs) for attrs in validated_data]
+		)
+
+
+class UserOwnedManyRelatedField(ManyRelatedField):
+	"""Validate a list of primary keys with one query for the whole list"""
+	
+	def to_internal_value(self, data):
+		if isinstance(data, str) or not hasattr(data, '__iter__'):
+			self.fail('not_a_list', input_type=type(data).__name__)
+		if not self.allow_empty and len(data) == 0:
+			self.fail('empty')
+		return self.child_relation.to_internal_values(data)
+
+
+class UserOwnedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+	"""Primary keys of objects owned by the requesting user"""
+	
+	@classmethod
+	def many_init(cls, *args, **kwargs):
+		list_kwargs = {'child_relation': cls(*args, **kwargs)}
+		for key in kwargs:
+			if key in MANY_RELATION_KWARGS:
+				list_kwargs[key] = kwargs[key]
+		return UserOwnedManyRelatedField(**list_kwargs)
+	
+	def get_queryset(self):
+		"""Limit the choices to objects of the user making the request"""
+		queryset = super().get_queryset()
+		request = self.context.get('request')
+		if request is None:
+			return queryset
+		return queryset.filter(user=request.user)
+	
+	def to_internal_values(self, data):
+		"""Return the objects for a list of primary keys
+		
+		Every key is looked up in a single IN query. Errors are reported
+		per position in the list, as ListField does.
+		"""
+		data = list(data)
+		queryset = self.get_queryset()
+		pks, errors = [], {}
+		for index, value in enumerate(data):
+			if self.pk_field is not None:
+				value = self.pk_field.to_internal_value(value)
+			try:
+				# to_python() lets None through
+				pk = None if value is None else queryset.model._meta.pk.to_python(value)
+			except DjangoValidationError:
+				pk = None
+			pks.append(pk)
+			if pk is None:
+				errors[index] = [self.error_messages['incorrect_type'].format(
+					data_type=type(value).__name__
+				)]
+		objects = queryset.in_bulk([pk for pk in pks if pk is not None])
+		for index, pk in enumerate(pks):
+			if pk is not None and pk not in objects:
+				errors[index] = [self.error_messages['does_not_exist'].format(pk_value=data[index])]
+		if errors:
+			raise serializers.ValidationError(errors)
+		return [objects[pk] for pk in pks]
+
 
 class TagSerializer(serializers.ModelSerializer):
 	"""Serializer for tag objects"""
@@ -7,6 +81,15 @@ class TagSerializer(serializers.ModelSerializer):
 		model = Tag
 		fields = ('id', 'name')
 		read_only_fields = ('id',)
+		list_serializer_class = BulkCreateListSerializer
+
+
+class TagUsageSerializer(TagSerializer):
+	"""Serializer for tags annotated with their number of recipes"""
+	usage = serializers.IntegerField(read_only=True)
+	
+	class Meta(TagSerializer.Meta):
+		fields = TagSerializer.Meta.fields + ('usage',)
 
 
 class IngrediantSerializer(serializers.ModelSerializer):
@@ -15,14 +98,23 @@ class IngrediantSerializer(serializers.ModelSerializer):
 		model = Ingrediant
 		fields = ('id', 'name')
 		read_only_fields = ('id',)
+		list_serializer_class = BulkCreateListSerializer
+
+
+class IngrediantUsageSerializer(IngrediantSerializer):
+	"""Serializer for ingrediants annotated with their number of recipes"""
+	usage = serializers.IntegerField(read_only=True)
+	
+	class Meta(IngrediantSerializer.Meta):
+		fields = IngrediantSerializer.Meta.fields + ('usage',)
 		
 class RecipeSerializer(serializers.ModelSerializer):
 	"""Serialize a recipe"""
-	ingrediants = serializers.PrimaryKeyRelatedField(
+	ingrediants = UserOwnedPrimaryKeyRelatedField(
 		many=True,
 		queryset=Ingrediant.objects.all()
 	)
-	tags= serializers.PrimaryKeyRelatedField(
+	tags= UserOwnedPrimaryKeyRelatedField(
 		many=True,
 		queryset=Tag.objects.all()
 	)
@@ -30,7 +122,53 @@ class RecipeSerializer(serializers.ModelSerializer):
 		model = Recipe
 		fields = ('id','title','ingrediants','time_minutes','price','tags')
 		read_only_fields = ('id',)
-		
+	
+	relation_fields = ('tags', 'ingrediants')
+	# Nested serializers of the relations ?expand= can name
+	expandable = {'ingrediants': IngrediantSerializer, 'tags': TagSerializer}
+	
+	def create(self, validated_data):
+		"""Create a recipe, linking its tags and ingrediants in bulk"""
+		relations = self.pop_relations(validated_data)
+		recipe = super().create(validated_data)
+		for name, objects in relations.items():
+			set_related(recipe, name, [obj.pk for obj in objects], current=set())
+		return recipe
+	
+	def update(self, instance, validated_data):
+		"""Update a recipe, writing only the links that changed"""
+		relations = self.pop_relations(validated_data)
+		recipe = super().update(instance, validated_data)
+		for name, objects in relations.items():
+			set_related(recipe, name, [obj.pk for obj in objects])
+		return recipe
+	
+	def pop_relations(self, validated_data):
+		return {
+			name: validated_data.pop(name)
+			for name in self.relation_fields if name in validated_data
+		}
+
+
+class RecipeRelationsSerializer(serializers.Serializer):
+	"""Tags and ingrediants to add to or remove from a recipe"""
+	tags = UserOwnedPrimaryKeyRelatedField(
+		many=True,
+		required=False,
+		queryset=Tag.objects.all()
+	)
+	ingrediants = UserOwnedPrimaryKeyRelatedField(
+		many=True,
+		required=False,
+		queryset=Ingrediant.objects.all()
+	)
+	
+	def validate(self, attrs):
+		if not attrs:
+			raise serializers.ValidationError('Give tags or ingrediants.')
+		return attrs
+
+
 class RecipeDetailSerializer(RecipeSerializer):
 	"""Serialize a recipe detail"""
 	ingrediants = IngrediantSerializer(many=True, read_only=True)
@@ -0,0 +1,30 @@
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.dispatch import receiver
+
+from core.models import Tag, Ingrediant, Recipe
+from recipe import cache
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingrediant)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingrediant)
+def invalidate_attr_list(sender, instance, **kwargs):
+	"""Drop the cached list of the owner of a changed tag or ingrediant"""
+	cache.invalidate(sender, instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingrediants.through)
+def invalidate_usage_on_link(sender, instance, action, model, **kwargs):
+	"""Drop cached lists whose assigned_only or usage results changed"""
+	if action in ('post_add', 'post_remove', 'post_clear'):
+		related = model if model is not Recipe else type(instance)
+		cache.invalidate(related, instance.user_id)
+
+
+@receiver(post_delete, sender=Recipe)
+def invalidate_usage_on_recipe_delete(sender, instance, **kwargs):
+	"""Drop cached lists counting the links of a deleted recipe"""
+	cache.invalidate(Tag, instance.user_id)
+	cache.invalidate(Ingrediant, instance.user_id)
@@ -0,0 +1,82 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Ingrediant
+from recipe.cache import get_cache
+
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIANT_URL = reverse('recipe:ingrediant-list')
+
+
+class AttrListCacheTests(TestCase):
+	"""Test the per-user cache of tag and ingrediant lists"""
+
+	def setUp(self):
+		get_cache().clear()
+		self.user = get_user_model().objects.create_user(
+			'test@test.com',
+			'testpass'
+		)
+		self.client = APIClient()
+		self.client.force_authenticate(self.user)
+
+	def test_cache_hit_skips_database(self):
+		"""Test a repeated list is served without queries"""
+		Tag.objects.create(user=self.user, name='Vegan')
+		first = self.client.get(TAGS_URL)
+
+		with self.assertNumQueries(0):
+			second = self.client.get(TAGS_URL)
+
+		self.assertEqual(second.status_code, status.HTTP_200_OK)
+		self.assertEqual(second.data, first.data)
+
+	def test_create_invalidates(self):
+		"""Test creating through the API refreshes the cached list"""
+		self.client.get(INGREDIANT_URL)
+		self.client.post(INGREDIANT_URL, {'name': 'Salt'})
+
+		result = self.client.get(INGREDIANT_URL)
+
+		self.assertEqual([item['name'] for item in result.data], ['Salt'])
+
+	def test_model_save_and_delete_invalidate(self):
+		"""Test renaming or deleting a tag refreshes the cached list"""
+		tag = Tag.objects.create(user=self.user, name='Vegan')
+		self.client.get(TAGS_URL)
+
+		tag.name = 'Vegetarian'
+		tag.save()
+		result = self.client.get(TAGS_URL)
+		self.assertEqual(result.data[0]['name'], 'Vegetarian')
+
+		tag.delete()
+		result = self.client.get(TAGS_URL)
+		self.assertEqual(result.data, [])
+
+	def test_cache_is_per_user(self):
+		"""Test one user never receives the cached list of another"""
+		Ingrediant.objects.create(user=self.user, name='Salt')
+		self.client.get(INGREDIANT_URL)
+		user2 = get_user_model().objects.create_user(
+			'test_2@test.com',
+			'test2pass'
+		)
+		self.client.force_authenticate(user2)
+
+		result = self.client.get(INGREDIANT_URL)
+
+		self.assertEqual(result.data, [])
+
+	def test_query_parameters_cached_separately(self):
+		"""Test a paginated list is not served the unpaginated entry"""
+		Tag.objects.create(user=self.user, name='Vegan')
+		self.client.get(TAGS_URL)
+
+		result = self.client.get(TAGS_URL + '?page_size=1')
+
+		self.assertEqual(result.data['results'][0]['name'], 'Vegan')
@@ -0,0 +1,123 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from recipe.cache import get_cache
+from recipe.tests.test_recipe_api import RECIPES_URL, detail_url, \
+	sample_tag, sample_ingrediant, sample_recipe
+
+TAGS_URL = reverse('recipe:tag-list')
+
+
+class ConditionalGetTests(TestCase):
+	"""Test ETag and If-None-Match handling of the recipe API"""
+
+	def setUp(self):
+		get_cache().clear()
+		self.user = get_user_model().objects.create_user(
+			'test@test.com',
+			'testpass'
+		)
+		self.client = APIClient()
+		self.client.force_authenticate(self.user)
+
+	def test_recipe_list_not_modified(self):
+		"""Test a matching ETag returns 304 after one aggregate query"""
+		sample_recipe(user=self.user)
+		first = self.client.get(RECIPES_URL)
+
+		with self.assertNumQueries(1):
+			result = self.client.get(
+				RECIPES_URL, HTTP_IF_NONE_MATCH=first['ETag']
+			)
+
+		self.assertEqual(result.status_code, status.HTTP_304_NOT_MODIFIED)
+		self.assertEqual(result['ETag'], first['ETag'])
+		self.assertFalse(result.content)
+
+	def test_recipe_list_etag_changes_with_relations(self):
+		"""Test tagging a recipe changes the list ETag"""
+		recipe = sample_recipe(user=self.user)
+		first = self.client.get(RECIPES_URL)
+
+		recipe.tags.add(sample_tag(user=self.user))
+		result = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=first['ETag'])
+
+		self.assertEqual(result.status_code, status.HTTP_200_OK)
+		self.assertNotEqual(result['ETag'], first['ETag'])
+
+	def test_recipe_list_etag_changes_when_tag_deleted(self):
+		"""Test deleting a tag used by a recipe changes the list ETag"""
+		recipe = sample_recipe(user=self.user)
+		tag = sample_tag(user=self.user)
+		recipe.tags.add(tag)
+		first = self.client.get(RECIPES_URL)
+
+		tag.delete()
+		result = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=first['ETag'])
+
+		self.assertEqual(result.status_code, status.HTTP_200_OK)
+		self.assertEqual(result.data[0]['tags'], [])
+
+	def test_recipe_detail_etag_changes_with_tag_name(self):
+		"""Test renaming a nested tag changes the detail ETag"""
+		recipe = sample_recipe(user=self.user)
+		tag = sample_tag(user=self.user)
+		recipe.tags.add(tag)
+		url = detail_url(recipe.id)
+		first = self.client.get(url)
+		cached = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+		self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+
+		tag.name = 'Renamed'
+		tag.save()
+		result = self.client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+		self.assertEqual(result.status_code, status.HTTP_200_OK)
+		self.assertEqual(result.data['tags'][0]['name'], 'Renamed')
+
+	def test_recipe_detail_etag_joins_one_relation_at_a_time(self):
+		"""Test the detail ETag does not cross tags with ingrediants"""
+		recipe = sample_recipe(user=self.user)
+		recipe.tags.add(*[sample_tag(user=self.user, name='Tag %d' % i) for i in range(3)])
+		recipe.ingrediants.add(*[
+			sample_ingrediant(user=self.user, name='Ingrediant %d' % i) for i in range(3)
+		])
+
+		with CaptureQueriesContext(connection) as queries:
+			self.client.get(detail_url(recipe.id))
+
+		# Each relation is read by its own subquery, not joined to the recipe
+		aggregate = queries.captured_queries[0]['sql']
+		self.assertEqual(aggregate.count('(SELECT'), 2)
+		self.assertNotIn('LEFT OUTER JOIN', aggregate)
+
+	def test_missing_recipe_detail(self):
+		"""Test an unknown recipe still returns 404"""
+		result = self.client.get(detail_url(999), HTTP_IF_NONE_MATCH='*')
+		self.assertEqual(result.status_code, status.HTTP_404_NOT_FOUND)
+
+	def test_cached_tag_list_not_modified(self):
+		"""Test a cached tag list answers If-None-Match without queries"""
+		sample_tag(user=self.user)
+		first = self.client.get(TAGS_URL)
+
+		with self.assertNumQueries(0):
+			result = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=first['ETag'])
+
+		self.assertEqual(result.status_code, status.HTTP_304_NOT_MODIFIED)
+
+	def test_tag_list_etag_changes_after_create(self):
+		"""Test creating a tag changes the tag list ETag"""
+		first = self.client.get(TAGS_URL)
+		self.client.post(TAGS_URL, {'name': 'Vegan'})
+
+		result = self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=first['ETag'])
+
+		self.assertEqual(result.status_code, status.HTTP_200_OK)
+		self.assertNotEqual(result['ETag'], first['ETag'])
@@ -5,7 +5,7 @@ from django.test import TestCase
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Ingrediant
+from core.models import Ingrediant, Recipe
 
 from recipe.serializers import TagSerializer, IngrediantSerializer
 
@@ -75,5 +75,42 @@ class PrivateTagsApiTests(TestCase):
 		payload={'name': ''}
 		result = self.client.post(INGREDIANT_URL, payload)
 		self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+
+	def test_bulk_create_ingrediants(self):
+		"""Test creating several ingrediants with one request"""
+		payload = [{'name': 'Salt'}, {'name': 'Pepper'}]
+		result = self.client.post(INGREDIANT_URL, payload, format='json')
+		
+		self.assertEqual(result.status_code, status.HTTP_201_CREATED)
+		self.assertEqual(len(result.data), 2)
+		names = Ingrediant.objects.filter(user=self.user).values_list('name', flat=True)
+		self.assertEqual(sorted(names), sorted(['Salt', 'Pepper']))
+		
+	def test_bulk_create_ingrediants_invalid(self):
+		"""Test a bulk create reports errors per item and creates nothing"""
+		payload = [{'name': 'Salt'}, {'name': ''}]
+		result = self.client.post(INGREDIANT_URL, payload, format='json')
+		
+		self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+		self.assertEqual(result.data[0], {})
+		self.assertIn('name', result.data[1])
+		self.assertFalse(Ingrediant.objects.exists())
+	
+	def test_retrieve_ingrediants_assigned_only_with_usage(self):
+		"""Test listing used ingrediants with their number of recipes"""
+		rice = Ingrediant.objects.create(user=self.user, name='Rice')
+		Ingrediant.objects.create(user=self.user, name='Salt')
+		other = get_user_model().objects.create_user('other@test.com', 'testpass')
+		recipe = Recipe.objects.create(
+			user=self.user, title='Curry', time_minutes=10, price=5.00
+		)
+		recipe.ingrediants.add(rice)
+		# Links from another user's recipe are not counted
+		Recipe.objects.create(
+			user=other, title='Risotto', time_minutes=30, price=7.00
+		).ingrediants.add(rice)
 		
-		
\ No newline at end of file
+		result = self.client.get(INGREDIANT_URL, {'assigned_only': 1, 'usage': 1})
+		
+		self.assertEqual(result.status_code, status.HTTP_200_OK)
+		self.assertEqual(result.data, [{'id': rice.id, 'name': 'Rice', 'usage': 1}])
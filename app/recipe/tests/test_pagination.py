@@ -0,0 +1,105 @@
+import json
+from base64 import urlsafe_b64encode
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Tag, Recipe
+
+TAGS_URL = reverse('recipe:tag-list')
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class KeysetPaginationTests(TestCase):
+	"""Test the opt-in cursor pagination of the recipe API"""
+
+	def setUp(self):
+		self.user = get_user_model().objects.create_user(
+			'test@test.com',
+			'testpass'
+		)
+		self.client = APIClient()
+		self.client.force_authenticate(self.user)
+
+	def walk(self, url, link='next'):
+		"""Follow pagination links and return every page"""
+		pages = []
+		while url:
+			result = self.client.get(url)
+			self.assertEqual(result.status_code, status.HTTP_200_OK)
+			pages.append(result.data['results'])
+			url = result.data[link]
+		return pages
+
+	def test_unpaginated_without_opt_in(self):
+		"""Test the list stays a plain array without paging parameters"""
+		Tag.objects.create(user=self.user, name='Vegan')
+		result = self.client.get(TAGS_URL)
+		self.assertIsInstance(result.data, list)
+
+	def test_tags_paged_in_name_order(self):
+		"""Test paging tags with duplicate names returns every tag once"""
+		for name in ('Vegan', 'Desert', 'Vegan', 'Spicy', 'Desert'):
+			Tag.objects.create(user=self.user, name=name)
+		expected = list(
+			Tag.objects.order_by('-name', 'id').values_list('id', flat=True)
+		)
+
+		pages = self.walk(TAGS_URL + '?page_size=2')
+
+		self.assertEqual([len(page) for page in pages], [2, 2, 1])
+		self.assertEqual(
+			[tag['id'] for page in pages for tag in page],
+			expected
+		)
+
+	def test_previous_link_returns_earlier_page(self):
+		"""Test the previous link seeks back to the page before"""
+		for index in range(5):
+			Recipe.objects.create(
+				user=self.user,
+				title='Recipe %d' % index,
+				time_minutes=5,
+				price=5.00
+			)
+		first = self.client.get(RECIPES_URL + '?page_size=2')
+		second = self.client.get(first.data['next'])
+		back = self.client.get(second.data['previous'])
+
+		self.assertEqual(back.data['results'], first.data['results'])
+		self.assertIsNone(back.data['previous'])
+
+	def test_page_fetch_has_no_count_or_offset(self):
+		"""Test a deep page is fetched by seeking rather than counting"""
+		for index in range(6):
+			Tag.objects.create(user=self.user, name='Tag %d' % index)
+		first = self.client.get(TAGS_URL + '?page_size=2')
+
+		with CaptureQueriesContext(connection) as queries:
+			self.client.get(first.data['next'])
+
+		for query in queries.captured_queries:
+			self.assertNotIn('COUNT(', query['sql'].upper())
+			self.assertNotIn('OFFSET', query['sql'].upper())
+
+	def test_invalid_cursor(self):
+		"""Test that a malformed cursor is rejected"""
+		result = self.client.get(TAGS_URL + '?cursor=notacursor')
+		self.assertEqual(result.status_code, status.HTTP_404_NOT_FOUND)
+
+	def test_tampered_cursor_values(self):
+		"""Test a well formed cursor holding values of the wrong type is rejected"""
+		Tag.objects.create(user=self.user, name='Vegan')
+		for position in (['Vegan', 'one'], ['Vegan', None], ['Vegan', {'id': 1}]):
+			data = json.dumps({'p': position}).encode('utf-8')
+			cursor = urlsafe_b64encode(data).decode('ascii')
+
+			result = self.client.get(TAGS_URL, {'cursor': cursor})
+
+			self.assertEqual(result.status_code, status.HTTP_404_NOT_FOUND)
@@ -148,6 +148,61 @@ class PrivateRecipeApiTests(TestCase):
 		self.assertEqual(ingrediants.count(), 2)
 		self.assertIn(ingredient1, ingrediants)
 		self.assertIn(ingredient2, ingrediants)
+	
+	def test_create_recipe_with_other_users_tag(self):
+		"""Test tags of another user are rejected as if they did not exist"""
+		other = get_user_model().objects.create_user('other@test.com', 'testpass')
+		tag = sample_tag(user=other)
+		payload = {
+			'title': 'Borrowed tag',
+			'tags': [tag.id],
+			'time_minutes': 5,
+			'price': 1.00
+		}
+		
+		result = self.client.post(RECIPES_URL, payload, format='json')
+		
+		self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+		self.assertEqual(
+			result.data['tags'],
+			{0: ['Invalid pk "%d" - object does not exist.' % tag.id]}
+		)
+		self.assertFalse(Recipe.objects.exists())
+	
+	def test_create_recipe_reports_every_invalid_id(self):
+		"""Test each invalid ingrediant id gets its own error"""
+		ingrediant = sample_ingrediant(user=self.user)
+		payload = {
+			'title': 'Mystery stew',
+			'ingrediants': [ingrediant.id, 999999, 'salt', ingrediant.id],
+			'time_minutes': 5,
+			'price': 1.00
+		}
+		
+		result = self.client.post(RECIPES_URL, payload, format='json')
+		
+		self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+		self.assertEqual(result.data['ingrediants'], {
+			1: ['Invalid pk "999999" - object does not exist.'],
+			2: ['Incorrect type. Expected pk value, received str.'],
+		})
 		 
 		 
-		
\ No newline at end of file
+			
+	def test_create_recipe_with_null_id(self):
+		"""Test a null id is reported as an invalid id"""
+		ingrediant = sample_ingrediant(user=self.user)
+		payload = {
+			'title': 'Mystery stew',
+			'ingrediants': [ingrediant.id, None],
+			'time_minutes': 5,
+			'price': 1.00
+		}
+		
+		result = self.client.post(RECIPES_URL, payload, format='json')
+		
+		self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+		self.assertEqual(result.data['ingrediants'], {
+			1: ['Incorrect type. Expected pk value, received NoneType.'],
+		})
+		self.assertFalse(Recipe.objects.exists())
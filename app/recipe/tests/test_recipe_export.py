@@ -0,0 +1,80 @@
+import csv
+import io
+import json
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from recipe.views import RecipeViewSet
+from recipe.tests.test_recipe_api import sample_tag, sample_ingrediant, \
+	sample_recipe
+
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+class RecipeExportTests(TestCase):
+	"""Test streaming the recipes of a user"""
+
+	def setUp(self):
+		self.user = get_user_model().objects.create_user(
+			'test@test.com',
+			'testpass'
+		)
+		self.client = APIClient()
+		self.client.force_authenticate(self.user)
+
+	def export(self, url=EXPORT_URL, **headers):
+		result = self.client.get(url, **headers)
+		self.assertEqual(result.status_code, status.HTTP_200_OK)
+		return b''.join(result.streaming_content).decode('utf-8')
+
+	def test_export_ndjson(self):
+		"""Test exporting recipes as NDJSON with tag and ingrediant names"""
+		recipe = sample_recipe(user=self.user, title='Curry')
+		recipe.tags.add(sample_tag(user=self.user, name='Vegan'))
+		recipe.ingrediants.add(sample_ingrediant(user=self.user, name='Rice'))
+		other = get_user_model().objects.create_user('test_2@test.com', 'test2pass')
+		sample_recipe(user=other)
+
+		lines = self.export().splitlines()
+
+		self.assertEqual(len(lines), 1)
+		record = json.loads(lines[0])
+		self.assertEqual(record['id'], recipe.id)
+		self.assertEqual(record['tags'], ['Vegan'])
+		self.assertEqual(record['ingrediants'], ['Rice'])
+		self.assertEqual(record['price'], '5.00')
+
+	def test_export_csv(self):
+		"""Test exporting recipes as CSV through the format parameter"""
+		recipe = sample_recipe(user=self.user, title='Soup')
+		recipe.tags.add(sample_tag(user=self.user, name='Warm'))
+		recipe.tags.add(sample_tag(user=self.user, name='Vegan'))
+
+		rows = list(csv.DictReader(io.StringIO(self.export(EXPORT_URL + '?format=csv'))))
+
+		self.assertEqual(len(rows), 1)
+		self.assertEqual(rows[0]['title'], 'Soup')
+		self.assertEqual(rows[0]['tags'], 'Vegan|Warm')
+
+	def test_export_csv_accept_header(self):
+		"""Test the export format can be negotiated with Accept"""
+		sample_recipe(user=self.user)
+		content = self.export(HTTP_ACCEPT='text/csv')
+		self.assertTrue(content.startswith('id,title'))
+
+	def test_export_queries_per_chunk(self):
+		"""Test names are prefetched once per chunk, not once per recipe"""
+		for index in range(6):
+			recipe = sample_recipe(user=self.user, title='Recipe %d' % index)
+			recipe.tags.add(sample_tag(user=self.user, name='Tag %d' % index))
+
+		with patch.object(RecipeViewSet, 'export_chunk_size', 3):
+			# One recipe query plus tags and ingrediants for each of two chunks
+			with self.assertNumQueries(5):
+				self.assertEqual(len(self.export().splitlines()), 6)
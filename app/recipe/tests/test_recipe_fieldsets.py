@@ -0,0 +1,109 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from recipe.serializers import RecipeDetailSerializer
+from recipe.tests.test_recipe_api import RECIPES_URL, detail_url, \
+	sample_tag, sample_ingrediant, sample_recipe
+
+
+def selected_columns(queries, table='core_recipe'):
+	"""Return the SELECT statements reading from a table, up to FROM"""
+	return [
+		query['sql'].split(' FROM ')[0] for query in queries.captured_queries
+		if query['sql'].startswith('SELECT "%s"' % table)
+	]
+
+
+class RecipeFieldsetTests(TestCase):
+	"""Test ?fields= and ?expand= on the recipe endpoints"""
+
+	def setUp(self):
+		self.user = get_user_model().objects.create_user('test@test.com', 'testpass')
+		self.client = APIClient()
+		self.client.force_authenticate(self.user)
+		self.recipe = sample_recipe(user=self.user, title='Curry')
+		self.vegan = sample_tag(user=self.user, name='Vegan')
+		self.rice = sample_ingrediant(user=self.user, name='Rice')
+		self.recipe.tags.add(self.vegan)
+		self.recipe.ingrediants.add(self.rice)
+
+	def test_list_fields(self):
+		"""Test the list renders and selects only the given fields"""
+		with CaptureQueriesContext(connection) as queries:
+			res = self.client.get(RECIPES_URL, {'fields': 'title,id'})
+
+		self.assertEqual(res.status_code, status.HTTP_200_OK)
+		self.assertEqual(res.data, [{'id': self.recipe.id, 'title': 'Curry'}])
+		for sql in selected_columns(queries):
+			self.assertNotIn('price', sql)
+			self.assertNotIn('summary', sql)
+
+	def test_list_expand(self):
+		"""Test expanded relations are nested in the list, read from the summary"""
+		expected = [{'id': self.vegan.id, 'name': 'Vegan'}]
+		with CaptureQueriesContext(connection) as queries:
+			res = self.client.get(RECIPES_URL, {'fields': 'id,tags', 'expand': 'tags'})
+
+		self.assertEqual(res.data, [{'id': self.recipe.id, 'tags': expected}])
+		self.assertEqual(len(queries), 2)
+
+		Recipe.objects.update(summary=None)
+		res = self.client.get(RECIPES_URL, {'fields': 'id,tags', 'expand': 'tags'})
+		self.assertEqual(res.data[0]['tags'], expected)
+
+	def test_retrieve_defaults_to_the_detail(self):
+		"""Test retrieve keeps nesting relations that are not named in ?expand="""
+		url = detail_url(self.recipe.id)
+
+		res = self.client.get(url, {'fields': 'id,title,ingrediants,time_minutes,price,tags'})
+
+		self.assertEqual(res.data, RecipeDetailSerializer(self.recipe).data)
+		res = self.client.get(url, {'expand': 'tags'})
+		self.assertEqual(res.data['tags'], [{'id': self.vegan.id, 'name': 'Vegan'}])
+		self.assertEqual(res.data['ingrediants'], [self.rice.id])
+
+	def test_retrieve_fields_skip_columns_and_prefetches(self):
+		"""Test retrieve loads only the columns and relations it renders"""
+		with CaptureQueriesContext(connection) as queries:
+			res = self.client.get(detail_url(self.recipe.id), {'fields': 'id,title'})
+
+		self.assertEqual(res.data, {'id': self.recipe.id, 'title': 'Curry'})
+		self.assertFalse(any('core_tag' in query['sql'] for query in queries.captured_queries))
+		self.assertEqual(
+			selected_columns(queries),
+			['SELECT "core_recipe"."id", "core_recipe"."title"']
+		)
+
+	def test_fields_change_the_etag(self):
+		"""Test each fieldset has its own ETag"""
+		url = detail_url(self.recipe.id)
+		etag = self.client.get(url)['ETag']
+
+		res = self.client.get(url, {'fields': 'id'}, HTTP_IF_NONE_MATCH=etag)
+
+		self.assertEqual(res.status_code, status.HTTP_200_OK)
+		self.assertNotEqual(res['ETag'], etag)
+
+	def test_list_etag_follows_expanded_names(self):
+		"""Test renaming an expanded tag changes the list ETag"""
+		params = {'fields': 'title,tags', 'expand': 'tags'}
+		etag = self.client.get(RECIPES_URL, params)['ETag']
+
+		self.vegan.name = 'Plant based'
+		self.vegan.save()
+		res = self.client.get(RECIPES_URL, params, HTTP_IF_NONE_MATCH=etag)
+
+		self.assertEqual(res.status_code, status.HTTP_200_OK)
+		self.assertEqual(res.data[0]['tags'][0]['name'], 'Plant based')
+
+	def test_unknown_names_are_rejected(self):
+		"""Test unknown fields, unknown relations and empty fields are rejected"""
+		for params in ({'fields': 'id,secret'}, {'expand': 'title'}, {'fields': ''}):
+			res = self.client.get(RECIPES_URL, params)
+			self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
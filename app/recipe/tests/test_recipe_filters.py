@@ -0,0 +1,109 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from recipe.filters import facet_counts
+from recipe.tests.test_recipe_api import sample_tag, sample_ingrediant, \
+	sample_recipe
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class RecipeFilterApiTests(TestCase):
+	"""Test filtering recipes by tags and ingrediants"""
+
+	def setUp(self):
+		self.user = get_user_model().objects.create_user(
+			'test@test.com',
+			'testpass'
+		)
+		self.client = APIClient()
+		self.client.force_authenticate(self.user)
+
+		self.vegan = sample_tag(user=self.user, name='Vegan')
+		self.dessert = sample_tag(user=self.user, name='Dessert')
+		self.rice = sample_ingrediant(user=self.user, name='Rice')
+
+		self.curry = sample_recipe(user=self.user, title='Curry')
+		self.curry.tags.add(self.vegan)
+		self.curry.ingrediants.add(self.rice)
+		self.pudding = sample_recipe(user=self.user, title='Rice pudding')
+		self.pudding.tags.add(self.vegan, self.dessert)
+		self.pudding.ingrediants.add(self.rice)
+		self.cake = sample_recipe(user=self.user, title='Cake')
+		self.cake.tags.add(self.dessert)
+
+	def get_ids(self, params):
+		res = self.client.get(RECIPES_URL, params)
+		self.assertEqual(res.status_code, status.HTTP_200_OK)
+		ids = [recipe['id'] for recipe in res.data]
+		self.assertEqual(len(ids), len(set(ids)))
+		return set(ids)
+
+	def test_filter_by_tags(self):
+		"""Test recipes linked to any of the given tags are returned once"""
+		self.assertEqual(
+			self.get_ids({'tags': '%d' % self.vegan.id}),
+			{self.curry.id, self.pudding.id}
+		)
+		self.assertEqual(
+			self.get_ids({'tags': '%d,%d' % (self.vegan.id, self.dessert.id)}),
+			{self.curry.id, self.pudding.id, self.cake.id}
+		)
+
+	def test_filter_by_tags_and_ingrediants(self):
+		"""Test every filter parameter must match"""
+		self.assertEqual(
+			self.get_ids({
+				'tags': '%d' % self.dessert.id,
+				'ingrediants': '%d' % self.rice.id,
+			}),
+			{self.pudding.id}
+		)
+
+	def test_filter_invalid_ids(self):
+		"""Test ids that are not integers are rejected"""
+		res = self.client.get(RECIPES_URL, {'tags': '1,vegan'})
+		self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+		self.assertIn('tags', res.data)
+
+	def test_facets(self):
+		"""Test facet counts cover the filtered recipes"""
+		res = self.client.get(RECIPES_URL, {
+			'ingrediants': '%d' % self.rice.id,
+			'facets': 'true',
+		})
+
+		self.assertEqual(res.status_code, status.HTTP_200_OK)
+		self.assertEqual(len(res.data['results']), 2)
+		self.assertEqual(res.data['facets'], {
+			'tags': [
+				{'id': self.vegan.id, 'count': 2},
+				{'id': self.dessert.id, 'count': 1},
+			],
+			'ingrediants': [{'id': self.rice.id, 'count': 2}],
+		})
+
+	def test_facets_single_query(self):
+		"""Test every facet is counted by a single query"""
+		with CaptureQueriesContext(connection) as queries:
+			facets = facet_counts(Recipe.objects.filter(user=self.user))
+		self.assertEqual(len(queries), 1)
+		self.assertEqual(facets['tags'], [
+			{'id': self.vegan.id, 'count': 2},
+			{'id': self.dessert.id, 'count': 2},
+		])
+
+	def test_facets_paginated(self):
+		"""Test facets are added next to a page of results"""
+		res = self.client.get(RECIPES_URL, {'facets': '1', 'page_size': 1})
+		self.assertEqual(len(res.data['results']), 1)
+		self.assertEqual(res.data['facets']['ingrediants'], [
+			{'id': self.rice.id, 'count': 2},
+		])
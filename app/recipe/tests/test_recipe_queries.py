@@ -0,0 +1,96 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from recipe.tests.test_recipe_api import RECIPES_URL, detail_url, \
+	sample_tag, sample_ingrediant, sample_recipe
+
+
+def sample_full_recipe(user, index):
+	"""Create a recipe with its own tag and ingrediant"""
+	recipe = sample_recipe(user=user, title='Recipe %d' % index)
+	recipe.tags.add(sample_tag(user=user, name='Tag %d' % index))
+	recipe.ingrediants.add(
+		sample_ingrediant(user=user, name='Ingrediant %d' % index)
+	)
+	return recipe
+
+
+class RecipeQueryCountTests(TestCase):
+	"""Test that the recipe endpoints run a constant number of queries"""
+
+	def setUp(self):
+		self.user = get_user_model().objects.create_user(
+			'test@test.com',
+			'testpass'
+		)
+		self.client = APIClient()
+		self.client.force_authenticate(self.user)
+
+	def test_list_query_count_is_constant(self):
+		"""Test listing recipes does not query once per recipe"""
+		# ETag aggregate and recipes, the related ids are in the summary
+		sample_full_recipe(self.user, 0)
+		with self.assertNumQueries(2):
+			result = self.client.get(RECIPES_URL)
+		self.assertEqual(len(result.data), 1)
+
+		for index in range(1, 10):
+			sample_full_recipe(self.user, index)
+		with CaptureQueriesContext(connection) as queries:
+			result = self.client.get(RECIPES_URL)
+		self.assertEqual(len(queries), 2)
+		self.assertFalse(any(
+			'core_recipe_tags' in query['sql'] or 'core_recipe_ingrediants' in query['sql']
+			for query in queries.captured_queries
+		))
+		self.assertEqual(result.status_code, status.HTTP_200_OK)
+		self.assertEqual(len(result.data), 10)
+
+	def test_create_query_count_is_flat(self):
+		"""Test validating ingrediant ids takes one query however many there are"""
+		ingrediants = [
+			sample_ingrediant(user=self.user, name='Ingrediant %d' % index)
+			for index in range(30)
+		]
+
+		def create(count):
+			with CaptureQueriesContext(connection) as queries:
+				result = self.client.post(RECIPES_URL, {
+					'title': 'Recipe with %d ingrediants' % count,
+					'time_minutes': 10,
+					'price': '5.00',
+					'ingrediants': [ingrediant.id for ingrediant in ingrediants[:count]],
+					'tags': [],
+				}, format='json')
+			self.assertEqual(result.status_code, status.HTTP_201_CREATED)
+			return [query['sql'] for query in queries.captured_queries]
+
+		one, thirty = create(1), create(30)
+		self.assertEqual(len(one), len(thirty))
+		lookups = [sql for sql in thirty if sql.startswith('SELECT') and
+			'FROM "core_ingrediant" WHERE' in sql]
+		self.assertEqual(len(lookups), 1)
+		self.assertIn('IN (', lookups[0])
+
+	def test_retrieve_query_count_is_constant(self):
+		"""Test retrieving a recipe does not query once per tag"""
+		# ETag aggregate, recipe, tags and ingrediants
+		recipe = sample_full_recipe(self.user, 0)
+		with self.assertNumQueries(4):
+			self.client.get(detail_url(recipe.id))
+
+		for index in range(1, 10):
+			recipe.tags.add(sample_tag(user=self.user, name='Extra %d' % index))
+			recipe.ingrediants.add(
+				sample_ingrediant(user=self.user, name='Extra %d' % index)
+			)
+		with self.assertNumQueries(4):
+			result = self.client.get(detail_url(recipe.id))
+		self.assertEqual(result.status_code, status.HTTP_200_OK)
+		self.assertEqual(len(result.data['tags']), 10)
+		self.assertEqual(len(result.data['ingrediants']), 10)
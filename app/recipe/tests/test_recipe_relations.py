@@ -0,0 +1,143 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from recipe.tests.test_recipe_api import detail_url, sample_tag, \
+	sample_ingrediant, sample_recipe
+
+TAGS_URL = reverse('recipe:tag-list')
+
+
+def add_url(recipe_id):
+	return reverse('recipe:recipe-add', args=[recipe_id])
+
+
+def remove_url(recipe_id):
+	return reverse('recipe:recipe-remove', args=[recipe_id])
+
+
+def through_writes(queries):
+	"""Return the INSERT and DELETE statements run on the recipe tag table"""
+	return [
+		query['sql'].split()[0] for query in queries.captured_queries
+		if '"core_recipe_tags"' in query['sql'].split('(')[0]
+		and query['sql'].startswith(('INSERT', 'DELETE'))
+	]
+
+
+class RecipeRelationTests(TestCase):
+	"""Test tags and ingrediants are changed one link at a time"""
+
+	def setUp(self):
+		self.user = get_user_model().objects.create_user('test@test.com', 'testpass')
+		self.client = APIClient()
+		self.client.force_authenticate(self.user)
+		self.tags = [sample_tag(user=self.user, name='Tag %d' % index) for index in range(40)]
+		self.recipe = sample_recipe(user=self.user)
+		self.recipe.tags.add(*self.tags[:30])
+
+	def link_ids(self):
+		return dict(
+			Recipe.tags.through.objects.filter(recipe=self.recipe)
+			.values_list('tag_id', 'id')
+		)
+
+	def test_update_writes_only_the_difference(self):
+		"""Test swapping one tag deletes one link and inserts one"""
+		before = self.link_ids()
+		tags = [tag.id for tag in self.tags[1:31]]
+
+		with CaptureQueriesContext(connection) as queries:
+			res = self.client.patch(detail_url(self.recipe.id), {'tags': tags}, format='json')
+
+		self.assertEqual(res.status_code, status.HTTP_200_OK)
+		self.assertEqual(sorted(res.data['tags']), tags)
+		self.assertEqual(through_writes(queries), ['DELETE', 'INSERT'])
+		after = self.link_ids()
+		unchanged = {tag.id for tag in self.tags[1:30]}
+		self.assertEqual(
+			{pk: after[pk] for pk in unchanged}, {pk: before[pk] for pk in unchanged}
+		)
+
+	def test_update_without_changes_writes_nothing(self):
+		"""Test resending the same tags leaves the links alone"""
+		with CaptureQueriesContext(connection) as queries:
+			self.client.patch(
+				detail_url(self.recipe.id),
+				{'tags': [tag.id for tag in self.tags[:30]]},
+				format='json'
+			)
+
+		self.assertEqual(through_writes(queries), [])
+
+	def test_add(self):
+		"""Test adding links new tags and ignores ones already linked"""
+		ingrediant = sample_ingrediant(user=self.user)
+		payload = {
+			'tags': [self.tags[0].id, self.tags[35].id],
+			'ingrediants': [ingrediant.id],
+		}
+		with CaptureQueriesContext(connection) as queries:
+			res = self.client.post(add_url(self.recipe.id), payload, format='json')
+
+		self.assertEqual(res.status_code, status.HTTP_200_OK)
+		self.assertEqual(through_writes(queries), ['INSERT'])
+		self.assertEqual(len(res.data['tags']), 31)
+		self.assertEqual(res.data['ingrediants'], [ingrediant.id])
+		self.assertIn(self.tags[35].id, self.link_ids())
+
+	def test_remove(self):
+		"""Test removing unlinks only the given tags"""
+		payload = {'tags': [self.tags[0].id, self.tags[35].id]}
+		res = self.client.post(remove_url(self.recipe.id), payload, format='json')
+
+		self.assertEqual(res.status_code, status.HTTP_200_OK)
+		self.assertEqual(
+			set(self.link_ids()), {tag.id for tag in self.tags[1:30]}
+		)
+
+	def test_add_refreshes_usage_and_etag(self):
+		"""Test the relation signals still run for added links"""
+		self.client.get(TAGS_URL, {'usage': 'true'})
+		etag = self.client.get(detail_url(self.recipe.id))['ETag']
+
+		self.client.post(add_url(self.recipe.id), {'tags': [self.tags[35].id]}, format='json')
+
+		usage = {
+			tag['id']: tag['usage']
+			for tag in self.client.get(TAGS_URL, {'usage': 'true'}).data
+		}
+		self.assertEqual(usage[self.tags[35].id], 1)
+		res = self.client.get(detail_url(self.recipe.id), HTTP_IF_NONE_MATCH=etag)
+		self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+	def test_add_rejects_other_users_tags(self):
+		"""Test nothing is linked when any id is invalid"""
+		other = get_user_model().objects.create_user('other@test.com', 'testpass')
+		payload = {'tags': [self.tags[35].id, sample_tag(user=other).id]}
+
+		res = self.client.post(add_url(self.recipe.id), payload, format='json')
+
+		self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+		self.assertNotIn(self.tags[35].id, self.link_ids())
+
+	def test_add_requires_a_field(self):
+		"""Test an empty request is rejected"""
+		res = self.client.post(add_url(self.recipe.id), {}, format='json')
+
+		self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+	def test_add_to_other_users_recipe(self):
+		"""Test recipes of other users cannot be changed"""
+		other = get_user_model().objects.create_user('other@test.com', 'testpass')
+		recipe = sample_recipe(user=other)
+
+		res = self.client.post(add_url(recipe.id), {'tags': [self.tags[0].id]}, format='json')
+
+		self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
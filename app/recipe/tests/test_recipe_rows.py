@@ -0,0 +1,110 @@
+from collections import OrderedDict
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db.models import Count, Prefetch
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag, Ingrediant
+from recipe import serializers
+from recipe.rows import RowSerializer
+from recipe.tests.test_recipe_api import RECIPES_URL, sample_recipe
+
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIANTS_URL = reverse('recipe:ingrediant-list')
+
+
+def render(data):
+	return JSONRenderer().render(data)
+
+
+class RowSerializerParityTests(TestCase):
+	"""Test list rows render byte for byte like the serializers"""
+
+	def setUp(self):
+		self.user = get_user_model().objects.create_user('test@test.com', 'testpass')
+		self.client = APIClient()
+		self.client.force_authenticate(self.user)
+		tags = [
+			Tag.objects.create(user=self.user, name=name)
+			for name in ('Vegan', 'Crème brûlée', 'Line\u2028break', 'Quote "q"', '')
+		]
+		ingrediants = [
+			Ingrediant.objects.create(user=self.user, name=name)
+			for name in ('Salt', '日本酒', 'Back\\slash')
+		]
+		for index, (title, price) in enumerate((
+			('Plain', Decimal('5.00')),
+			('Ünïcödé ☃', Decimal('0.5')),
+			('Emoji 🍰', Decimal('999.99')),
+			('Tab\there', Decimal('12.3')),
+			('', Decimal('0')),
+		)):
+			recipe = sample_recipe(
+				user=self.user, title=title, price=price, time_minutes=index
+			)
+			# Added out of id order, rendered in id order
+			recipe.tags.add(*reversed(tags[:index]))
+			recipe.ingrediants.add(*ingrediants[index % 2:])
+		other = get_user_model().objects.create_user('other@test.com', 'testpass')
+		sample_recipe(user=other, title='Not mine')
+
+	def serialized(self, serializer_class, queryset):
+		return serializer_class(queryset, many=True).data
+
+	def expected_recipes(self):
+		recipes = Recipe.objects.filter(user=self.user).order_by('-id') \
+			.prefetch_related(
+				Prefetch('tags', queryset=Tag.objects.order_by('id')),
+				Prefetch('ingrediants', queryset=Ingrediant.objects.order_by('id')),
+			)
+		return self.serialized(serializers.RecipeSerializer, recipes)
+
+	def test_recipe_list_parity(self):
+		"""Test the recipe list equals the serializer output byte for byte"""
+		res = self.client.get(RECIPES_URL, HTTP_ACCEPT='application/json')
+
+		self.assertEqual(res.content, render(self.expected_recipes()))
+
+	def test_recipe_page_parity(self):
+		"""Test a page of recipes equals the serializer output byte for byte"""
+		res = self.client.get(RECIPES_URL, {'page_size': 2}, HTTP_ACCEPT='application/json')
+
+		expected = OrderedDict([
+			('next', res.data['next']),
+			('previous', None),
+			('results', self.expected_recipes()[:2]),
+		])
+		self.assertEqual(res.content, render(expected))
+
+	def test_tag_list_parity(self):
+		"""Test the tag list, with and without usage, equals the serializers"""
+		tags = Tag.objects.filter(user=self.user).order_by('-name', 'id')
+		res = self.client.get(TAGS_URL, HTTP_ACCEPT='application/json')
+		self.assertEqual(res.content, render(self.serialized(serializers.TagSerializer, tags)))
+
+		res = self.client.get(TAGS_URL, {'usage': 'true'}, HTTP_ACCEPT='application/json')
+		usage = tags.annotate(usage=Count('recipe'))
+		self.assertEqual(
+			res.content, render(self.serialized(serializers.TagUsageSerializer, usage))
+		)
+
+	def test_ingrediant_list_parity(self):
+		"""Test the ingrediant list equals the serializer output"""
+		ingrediants = Ingrediant.objects.filter(user=self.user).order_by('-name', 'id')
+		res = self.client.get(INGREDIANTS_URL, HTTP_ACCEPT='application/json')
+		self.assertEqual(
+			res.content,
+			render(self.serialized(serializers.IngrediantSerializer, ingrediants))
+		)
+
+	def test_rows_match_serializer_data(self):
+		"""Test rows equal serializer data for every recipe serializer field"""
+		rows = RowSerializer(serializers.RecipeSerializer)
+		queryset = Recipe.objects.filter(user=self.user).order_by('-id')
+
+		self.assertEqual(rows.represent(rows.values(queryset)), self.expected_recipes())
@@ -0,0 +1,96 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import search
+from recipe.tests.test_recipe_api import sample_tag, sample_ingrediant, \
+	sample_recipe, detail_url
+
+RECIPES_URL = reverse('recipe:recipe-list')
+
+
+class InvertedIndexTests(TestCase):
+	"""Test the in-process search index"""
+
+	def test_every_term_must_match(self):
+		"""Test documents match only when every query term matches"""
+		index = search.InvertedIndex([
+			(1, 'Thai green curry'), (2, 'Red curry'), (1, 'Vegan'),
+		])
+		self.assertEqual(index.search('curry'), {1, 2})
+		self.assertEqual(index.search('vegan curry'), {1})
+		self.assertEqual(index.search('pasta'), set())
+		self.assertEqual(index.search(''), set())
+
+	def test_misspelt_terms_match(self):
+		"""Test terms match tokens with a similar enough spelling"""
+		index = search.InvertedIndex([(1, 'Chocolate cheesecake')])
+		self.assertEqual(index.search('choclate'), {1})
+		self.assertEqual(index.search('cheescake'), {1})
+		self.assertEqual(index.search('chop'), set())
+
+
+class RecipeSearchApiTests(TestCase):
+	"""Test searching the recipes of a user"""
+
+	def setUp(self):
+		self.user = get_user_model().objects.create_user(
+			'test@test.com',
+			'testpass'
+		)
+		self.client = APIClient()
+		self.client.force_authenticate(self.user)
+
+	def search(self, query):
+		res = self.client.get(RECIPES_URL, {'search': query})
+		self.assertEqual(res.status_code, status.HTTP_200_OK)
+		return {recipe['id'] for recipe in res.data}
+
+	def test_search_titles_tags_and_ingrediants(self):
+		"""Test search matches titles and tag and ingrediant names"""
+		curry = sample_recipe(user=self.user, title='Thai green curry')
+		curry.tags.add(sample_tag(user=self.user, name='Spicy'))
+		pasta = sample_recipe(user=self.user, title='Pasta bake')
+		pasta.ingrediants.add(sample_ingrediant(user=self.user, name='Tomato'))
+		other = get_user_model().objects.create_user('other@test.com', 'testpass')
+		sample_recipe(user=other, title='Red curry')
+
+		self.assertEqual(self.search('curry'), {curry.id})
+		self.assertEqual(self.search('spicy'), {curry.id})
+		self.assertEqual(self.search('tomato bake'), {pasta.id})
+		self.assertEqual(self.search('tomatoe'), {pasta.id})
+		# Misspelt title words and tag names match on every backend
+		self.assertEqual(self.search('gren'), {curry.id})
+		self.assertEqual(self.search('spicey curry'), {curry.id})
+		self.assertEqual(self.search('risotto'), set())
+		self.assertEqual(self.search(' '), {curry.id, pasta.id})
+
+	def test_search_follows_changes(self):
+		"""Test renamed, linked and deleted rows are reflected in results"""
+		recipe = sample_recipe(user=self.user, title='Porridge')
+		tag = sample_tag(user=self.user, name='Breakfast')
+		self.assertEqual(self.search('breakfast'), set())
+
+		recipe.tags.add(tag)
+		self.assertEqual(self.search('breakfast'), {recipe.id})
+
+		tag.name = 'Brunch'
+		tag.save()
+		self.assertEqual(self.search('breakfast'), set())
+		self.assertEqual(self.search('brunch'), {recipe.id})
+
+		tag.delete()
+		self.assertEqual(self.search('brunch'), set())
+
+		recipe.title = 'Granola'
+		recipe.save()
+		self.assertEqual(self.search('granola'), {recipe.id})
+
+	def test_search_ignored_on_retrieve(self):
+		"""Test a search parameter does not hide a recipe being retrieved"""
+		recipe = sample_recipe(user=self.user, title='Porridge')
+		res = self.client.get(detail_url(recipe.id), {'search': 'curry'})
+		self.assertEqual(res.status_code, status.HTTP_200_OK)
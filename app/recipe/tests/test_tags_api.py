@@ -5,7 +5,7 @@ from django.test import TestCase
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Tag
+from core.models import Tag, Recipe
 
 from recipe.serializers import TagSerializer
 
@@ -75,5 +75,69 @@ class PrivateTagsApiTests(TestCase):
 		payload={'name': ''}
 		result = self.client.post(TAGS_URL, payload)
 		self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+
+	def test_bulk_create_tags(self):
+		"""Test creating several tags with one request"""
+		payload = [{'name': 'Vegan'}, {'name': 'Desert'}]
+		result = self.client.post(TAGS_URL, payload, format='json')
+		
+		self.assertEqual(result.status_code, status.HTTP_201_CREATED)
+		self.assertEqual(len(result.data), 2)
+		names = Tag.objects.filter(user=self.user).values_list('name', flat=True)
+		self.assertEqual(sorted(names), sorted(['Vegan', 'Desert']))
+		
+	def test_bulk_create_tags_invalid(self):
+		"""Test a bulk create reports errors per item and creates nothing"""
+		payload = [{'name': 'Vegan'}, {'name': ''}]
+		result = self.client.post(TAGS_URL, payload, format='json')
+		
+		self.assertEqual(result.status_code, status.HTTP_400_BAD_REQUEST)
+		self.assertEqual(result.data[0], {})
+		self.assertIn('name', result.data[1])
+		self.assertFalse(Tag.objects.exists())
+	
+	def test_retrieve_tags_assigned_only(self):
+		"""Test listing only the tags used by the user's recipes"""
+		vegan = Tag.objects.create(user=self.user, name='Vegan')
+		Tag.objects.create(user=self.user, name='Lunch')
+		recipe = Recipe.objects.create(
+			user=self.user, title='Curry', time_minutes=10, price=5.00
+		)
+		recipe.tags.add(vegan)
+		
+		result = self.client.get(TAGS_URL, {'assigned_only': 1})
+		
+		self.assertEqual(result.status_code, status.HTTP_200_OK)
+		self.assertEqual([tag['id'] for tag in result.data], [vegan.id])
+	
+	def test_retrieve_tags_usage(self):
+		"""Test tags annotated with the number of recipes using them"""
+		vegan = Tag.objects.create(user=self.user, name='Vegan')
+		lunch = Tag.objects.create(user=self.user, name='Lunch')
+		for title in ('Curry', 'Salad'):
+			recipe = Recipe.objects.create(
+				user=self.user, title=title, time_minutes=10, price=5.00
+			)
+			recipe.tags.add(vegan)
+		
+		result = self.client.get(TAGS_URL, {'usage': 'true'})
+		
+		self.assertEqual(result.data, [
+			{'id': vegan.id, 'name': 'Vegan', 'usage': 2},
+			{'id': lunch.id, 'name': 'Lunch', 'usage': 0},
+		])
+	
+	def test_assigned_only_follows_recipe_changes(self):
+		"""Test cached assigned_only lists expire when recipes change"""
+		vegan = Tag.objects.create(user=self.user, name='Vegan')
+		recipe = Recipe.objects.create(
+			user=self.user, title='Curry', time_minutes=10, price=5.00
+		)
+		self.assertEqual(self.client.get(TAGS_URL, {'assigned_only': 1}).data, [])
+		
+		recipe.tags.add(vegan)
+		result = self.client.get(TAGS_URL, {'assigned_only': 1})
+		self.assertEqual([tag['id'] for tag in result.data], [vegan.id])
 		
-		
\ No newline at end of file
+		recipe.delete()
+		self.assertEqual(self.client.get(TAGS_URL, {'assigned_only': 1}).data, [])
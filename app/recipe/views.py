@@ -1,57 +1,270 @@
-from rest_framework import viewsets, mixins
+from django.db import transaction
+from django.db.models import Count, DateTimeField, Exists, IntegerField, \
+	Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
+from rest_framework import viewsets, mixins, status
+from rest_framework.decorators import action
+from rest_framework.response import Response
 
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 
+from core import recipe_io
+from core.db.routers import ReplicaReadMixin
 from core.models import Tag, Ingrediant, Recipe
 from recipe import serializers
+from recipe.cache import CachedListMixin, invalidate
+from recipe.conditional import ConditionalListMixin, ConditionalRetrieveMixin
+from recipe.fieldsets import parse_fieldset, sparse_serializer
+from recipe.filters import RecipeSearchFilter, RecipeRelationFilter, \
+	facet_counts
+from recipe.pagination import KeysetPagination
+from recipe.relations import add_related, remove_related
+from recipe.renderers import NDJSONRenderer, CSVRenderer
+from recipe.rows import RowListMixin
+from user.authentication import CachedTokenAuthentication
 
-class BaseRecipeAttrViewSet(viewsets.GenericViewSet, 
+def query_flag(request, name):
+	"""Return whether a boolean query parameter is switched on"""
+	return request.query_params.get(name, '').lower() in ('1', 'true')
+
+def latest_related_update(name):
+	"""Return a subquery of the latest updated_at among a recipe's relations
+	
+	Aggregating over a subquery per relation avoids joining two many to
+	many tables at once, which multiplies their rows.
+	"""
+	field = Recipe._meta.get_field(name)
+	target = field.m2m_reverse_field_name()
+	latest = field.remote_field.through.objects \
+		.filter(**{field.m2m_field_name(): OuterRef('pk')}) \
+		.order_by().values(field.m2m_field_name()) \
+		.annotate(latest=Max(target + '__updated_at')).values('latest')
+	return Subquery(latest, output_field=DateTimeField())
+
+class BaseRecipeAttrViewSet(ReplicaReadMixin,
+							CachedListMixin,
+							ConditionalListMixin,
+							RowListMixin,
+							viewsets.GenericViewSet, 
 							mixins.ListModelMixin,
 							mixins.CreateModelMixin):
 	"""Base view set for user owned recipes"""
-	authentication_class = (TokenAuthentication,)
+	authentication_classes = (CachedTokenAuthentication,)
 	permission_classes = (IsAuthenticated,)
+	pagination_class = KeysetPagination
+	ordering = ('-name', 'id')
 	
 	def get_queryset(self):
-		"""Return objects for current authenticated user"""
-		return self.queryset.filter(user=self.request.user).order_by('-name')
+		"""Return objects for current authenticated user
+		
+		?assigned_only=true keeps the objects used by at least one recipe
+		of the user, and ?usage=true annotates how many recipes use each.
+		"""
+		queryset = self.queryset.filter(user=self.request.user)
+		if self.action == 'list':
+			if query_flag(self.request, 'assigned_only'):
+				queryset = queryset.annotate(assigned=Exists(self.get_links())) \
+					.filter(assigned=True)
+			if query_flag(self.request, 'usage'):
+				usage = self.get_links().order_by() \
+					.values(self.queryset.model._meta.model_name) \
+					.annotate(count=Count('pk')).values('count')
+				queryset = queryset.annotate(
+					usage=Coalesce(Subquery(usage, output_field=IntegerField()), 0)
+				)
+		return queryset.order_by(*self.ordering)
+	
+	def get_links(self):
+		"""Return the through rows linking each object to the user's recipes"""
+		through = Recipe._meta.get_field(self.recipe_field).remote_field.through
+		return through.objects.filter(**{
+			self.queryset.model._meta.model_name: OuterRef('pk'),
+			'recipe__user': self.request.user,
+		})
+	
+	def get_serializer_class(self):
+		"""Add the usage count when it was asked for"""
+		if self.action == 'list' and query_flag(self.request, 'usage'):
+			return self.usage_serializer_class
+		return self.serializer_class
+	
+	def get_etag_aggregates(self, queryset):
+		"""Follow the recipes of the user when they decide the result"""
+		aggregates = super().get_etag_aggregates(queryset)
+		if query_flag(self.request, 'assigned_only') or \
+				query_flag(self.request, 'usage'):
+			recipes = Recipe.objects.filter(user=self.request.user) \
+				.aggregate(updated=Max('updated_at'), count=Count('id'))
+			aggregates['recipes'] = (recipes['updated'], recipes['count'])
+		return aggregates
+	
+	def get_serializer(self, *args, **kwargs):
+		"""Validate a JSON array of objects as a bulk create"""
+		if isinstance(kwargs.get('data'), list):
+			kwargs['many'] = True
+		return super().get_serializer(*args, **kwargs)
 		
 	def perform_create(self, serializer):
-		"""Create a new object"""
-		serializer.save(user=self.request.user)
+		"""Create a new object, or every object of a bulk create"""
+		with transaction.atomic():
+			serializer.save(user=self.request.user)
+		invalidate(self.queryset.model, self.request.user.pk)
 
 class TagViewSet(BaseRecipeAttrViewSet):
 	"""Manage tags in the database"""
 	queryset = Tag.objects.all()
 	serializer_class = serializers.TagSerializer
+	usage_serializer_class = serializers.TagUsageSerializer
+	recipe_field = 'tags'
 		
 class IngrediantViewSet(BaseRecipeAttrViewSet):
 	"""Manage ingrediant in the database """
 	queryset = Ingrediant.objects.all()
 	serializer_class = serializers.IngrediantSerializer
+	usage_serializer_class = serializers.IngrediantUsageSerializer
+	recipe_field = 'ingrediants'
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ReplicaReadMixin,
+					ConditionalListMixin,
+					ConditionalRetrieveMixin,
+					RowListMixin,
+					viewsets.ModelViewSet):
 
 	"""Manage recipes in the database"""
 	serializer_class = serializers.RecipeSerializer
 	queryset = Recipe.objects.all()
-	authentication_class = (TokenAuthentication,)
+	authentication_classes = (CachedTokenAuthentication,)
 	permission_classes = (IsAuthenticated,)
+	pagination_class = KeysetPagination
+	filter_backends = (RecipeRelationFilter, RecipeSearchFilter)
+	ordering = ('-id',)
+	row_summary_field = 'summary'
+	# Relations retrieve nests unless ?expand= says otherwise
+	expanded_by_default = ('ingrediants', 'tags')
+	export_chunk_size = 500
 	
 	def get_queryset(self):
-		"""Retrieve the recipes for the authenticated user"""
-		return self.queryset.filter(user=self.request
-		.user)
+		"""Retrieve the recipes for the authenticated user
+		
+		With ?fields= retrieve loads only the columns and relations the
+		response renders.
+		"""
+		queryset = self.queryset.filter(user=self.request.user) \
+			.defer('search_vector', 'summary') \
+			.order_by(*self.ordering)
+		if self.action == 'retrieve':
+			fieldset = self.get_fieldset()
+			if fieldset is None:
+				return queryset.prefetch_related('tags', 'ingrediants')
+			fields, _ = fieldset
+			relations = [name for name in fields if name in self.expanded_by_default]
+			columns = [name for name in fields if name not in relations]
+			queryset = queryset.only('pk', *columns).prefetch_related(*relations)
+		return queryset
+	
+	def get_fieldset(self):
+		"""Return the (fields, expand) of ?fields= and ?expand=, or None"""
+		if self.action not in ('list', 'retrieve'):
+			return None
+		if not hasattr(self, '_fieldset'):
+			expand = self.expanded_by_default if self.action == 'retrieve' else ()
+			self._fieldset = parse_fieldset(
+				self.request.query_params, self.serializer_class, expand
+			)
+		return self._fieldset
+	
+	def get_etag_aggregates(self, queryset):
+		"""Include the nested tags and ingrediants the response renders
+		
+		Renaming a tag or ingrediant does not touch its recipes, so expanded
+		relations add the latest update of their own rows.
+		"""
+		fieldset = self.get_fieldset()
+		if fieldset is not None:
+			expand = fieldset[1]
+		elif self.action == 'retrieve':
+			expand = self.expanded_by_default
+		else:
+			expand = ()
+		if not expand:
+			return super().get_etag_aggregates(queryset)
+		aggregates = {
+			'updated': Max('updated_at'),
+			'count': Count('id', distinct=True),
+		}
+		for name in expand:
+			aggregates[name] = Max(latest_related_update(name))
+		return queryset.aggregate(**aggregates)
+	
+	def list(self, request, *args, **kwargs):
+		"""List recipes, adding tag and ingrediant counts for ?facets=true"""
+		response = super().list(request, *args, **kwargs)
+		if response.status_code == status.HTTP_200_OK and \
+				query_flag(request, 'facets'):
+			facets = facet_counts(self.filter_queryset(self.get_queryset()))
+			if isinstance(response.data, dict):
+				response.data['facets'] = facets
+			else:
+				response.data = {'results': response.data, 'facets': facets}
+		return response
 	
 	def get_serializer_class(self):
 		"""Return appropriate serializer class"""
+		fieldset = self.get_fieldset()
+		if fieldset is not None:
+			return sparse_serializer(self.serializer_class, *fieldset)
 		if self.action == 'retrieve':
 			return serializers.RecipeDetailSerializer
+		if self.action in ('add', 'remove'):
+			return serializers.RecipeRelationsSerializer
 		
 		return self.serializer_class
 	
 	def perform_create(self, serializer):
 		"""Create a new recipe"""
 		serializer.save(user=self.request.user)
-		
\ No newline at end of file
+	
+	@action(detail=True, methods=['post'])
+	def add(self, request, pk=None):
+		"""Link tags and ingrediants to a recipe, keeping the ones it has"""
+		return self.change_relations(add_related)
+	
+	@action(detail=True, methods=['post'])
+	def remove(self, request, pk=None):
+		"""Unlink tags and ingrediants from a recipe"""
+		return self.change_relations(remove_related)
+	
+	def change_relations(self, change):
+		"""Apply add_related or remove_related to every field in the request"""
+		recipe = self.get_object()
+		serializer = self.get_serializer(data=self.request.data)
+		serializer.is_valid(raise_exception=True)
+		with transaction.atomic():
+			for name, objects in serializer.validated_data.items():
+				change(recipe, name, [obj.pk for obj in objects])
+		return Response(serializers.RecipeSerializer(
+			recipe, context=self.get_serializer_context()
+		).data)
+	
+	@action(detail=False, renderer_classes=(NDJSONRenderer, CSVRenderer))
+	def export(self, request):
+		"""Stream every recipe of the user as NDJSON or CSV"""
+		fmt = request.accepted_renderer.format
+		records = recipe_io.export_records(
+			self.filter_queryset(self.get_queryset()),
+			chunk_size=self.export_chunk_size
+		)
+		if fmt == 'csv':
+			lines = recipe_io.csv_lines(records)
+		else:
+			lines = recipe_io.ndjson_lines(records)
+		
+		renderer = request.accepted_renderer
+		response = StreamingHttpResponse(
+			lines,
+			content_type='%s; charset=%s' % (renderer.media_type, renderer.charset)
+		)
+		response['Content-Disposition'] = \
+			'attachment; filename="recipes.%s"' % fmt
+		return response
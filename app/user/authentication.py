@@ -0,0 +1,165 @@
+"""Token authentication with cached token lookups
+
+Token to user lookups are kept in an in-process LRU with a TTL, and
+optionally in a cache alias shared by every process. Cached users are
+stored as field values, without the password hash, and rebuilt for each
+request, so no request ever shares a model instance with another.
+
+Evicting a token or user deletes it from this process and the shared
+tier, and bumps a generation key in the shared tier. Other processes
+clear their LRU when they see the generation change, checking at most
+every SYNC_INTERVAL seconds, so they may keep accepting an evicted token
+for that long. Without a shared tier they keep it for up to TTL.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from core.lru import LRUCache
+
+DEFAULTS = {
+	'TTL': 60,
+	'MAX_ENTRIES': 10000,
+	'SHARED_CACHE': None,
+	'SYNC_INTERVAL': 1,
+}
+# Fields left out of cached users, loaded from the database on access
+UNCACHED_FIELDS = ('password',)
+GENERATION_KEY = 'auth-token:generation'
+
+
+_token_cache = None
+_token_cache_lock = threading.Lock()
+# Shared generation last seen by this process, and when it was read
+_sync = {'generation': None, 'checked': None}
+
+
+def get_settings():
+	options = dict(DEFAULTS)
+	options.update(getattr(settings, 'TOKEN_AUTH_CACHE', {}))
+	return options
+
+
+def get_token_cache():
+	"""Return the in-process token cache, creating it on first use"""
+	global _token_cache
+	if _token_cache is None:
+		with _token_cache_lock:
+			if _token_cache is None:
+				options = get_settings()
+				_token_cache = LRUCache(options['MAX_ENTRIES'], options['TTL'])
+	return _token_cache
+
+
+def get_shared_cache():
+	alias = get_settings()['SHARED_CACHE']
+	return caches[alias] if alias else None
+
+
+def shared_key(key):
+	return 'auth-token:%s' % key
+
+
+def cached_fields(model):
+	return [
+		field.attname for field in model._meta.concrete_fields
+		if field.name not in UNCACHED_FIELDS
+	]
+
+
+def dump_user(user):
+	"""Return the field values a cached user is rebuilt from"""
+	return {name: getattr(user, name) for name in cached_fields(user)}
+
+
+def load_user(values):
+	model = get_user_model()
+	names = cached_fields(model)
+	return model.from_db(DEFAULT_DB_ALIAS, names, [values[name] for name in names])
+
+
+def bump_generation(shared):
+	"""Tell other processes to drop their in-process token caches"""
+	try:
+		shared.incr(GENERATION_KEY)
+	except ValueError:
+		if not shared.add(GENERATION_KEY, 1, None):
+			shared.incr(GENERATION_KEY)
+
+
+def sync_token_cache():
+	"""Clear the in-process cache once another process evicted tokens"""
+	shared = get_shared_cache()
+	if shared is None:
+		return
+	now = time.monotonic()
+	checked = _sync['checked']
+	if checked is not None and now - checked < get_settings()['SYNC_INTERVAL']:
+		return
+	_sync['checked'] = now
+	generation = shared.get(GENERATION_KEY)
+	if checked is not None and generation != _sync['generation']:
+		get_token_cache().clear()
+	_sync['generation'] = generation
+
+
+def evict_tokens(keys):
+	"""Forget the given token keys in every cache tier"""
+	token_cache = get_token_cache()
+	shared = get_shared_cache()
+	for key in keys:
+		token_cache.delete(key)
+		if shared is not None:
+			shared.delete(shared_key(key))
+	if shared is not None:
+		bump_generation(shared)
+
+
+def evict_user(user):
+	"""Forget every cached token of a user"""
+	pk, attname = user.pk, user._meta.pk.attname
+	get_token_cache().delete_matching(lambda values: values[attname] == pk)
+	if get_shared_cache() is not None:
+		evict_tokens(Token.objects.filter(user=user).values_list('key', flat=True))
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+	"""Token authentication answering repeated tokens without a query"""
+
+	def authenticate_credentials(self, key):
+		sync_token_cache()
+		token_cache = get_token_cache()
+		values = token_cache.get(key)
+		if values is None:
+			values = self.fetch_user(key)
+			token_cache.set(key, values)
+
+		user = load_user(values)
+		if not user.is_active:
+			raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+		return (user, Token(key=key, user=user))
+
+	def fetch_user(self, key):
+		"""Return the cached values of the owner of a token"""
+		shared = get_shared_cache()
+		if shared is not None:
+			values = shared.get(shared_key(key))
+			if values is not None:
+				return values
+
+		try:
+			token = Token.objects.select_related('user').get(key=key)
+		except Token.DoesNotExist:
+			raise exceptions.AuthenticationFailed(_('Invalid token.'))
+		values = dump_user(token.user)
+		if shared is not None:
+			shared.set(shared_key(key), values, get_settings()['TTL'])
+		return values
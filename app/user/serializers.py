@@ -8,7 +8,7 @@ class UserSerializer(serializers.ModelSerializer):
 	class Meta:
 		model = get_user_model()
 		fields = ('email', 'password', 'name')
-		extra_kwars = {'password': {'write_only': True, 'min_length': 5}}
+		extra_kwargs = {'password': {'write_only': True, 'min_length': 5}}
 		
 	def create(self, validated_data):
 		"""Create a new user with encrypted password and return it"""
@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from user import authentication
+
+
+@receiver(post_delete, sender=Token)
+def evict_deleted_token(sender, instance, **kwargs):
+	"""Stop authenticating with a deleted token"""
+	keys = [instance.key]
+	authentication.evict_tokens(keys)
+	transaction.on_commit(lambda: authentication.evict_tokens(keys))
+
+
+@receiver(post_save, sender=get_user_model())
+def evict_saved_user(sender, instance, **kwargs):
+	"""Drop cached copies of a user so is_active and profile changes apply
+
+	Evicting again on commit stops a concurrent request from caching the
+	row as it was before the transaction.
+	"""
+	authentication.evict_user(instance)
+	transaction.on_commit(lambda: authentication.evict_user(instance))
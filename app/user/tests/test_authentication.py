@@ -0,0 +1,131 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user import authentication
+from user.authentication import LRUCache, get_shared_cache, get_token_cache
+
+ME_URL = reverse('user:me')
+
+
+class CachedTokenAuthenticationTests(TestCase):
+	"""Test authenticating with cached token lookups"""
+
+	def setUp(self):
+		get_token_cache().clear()
+		self.user = get_user_model().objects.create_user(
+			email='test@test.com',
+			password='testpass',
+			name='name'
+		)
+		self.token = Token.objects.create(user=self.user)
+		self.client = APIClient()
+		self.client.credentials(HTTP_AUTHORIZATION='Token ' + self.token.key)
+
+	def test_repeated_token_skips_database(self):
+		"""Test only the first request with a token queries the database"""
+		with self.assertNumQueries(1):
+			self.client.get(ME_URL)
+		with self.assertNumQueries(0):
+			result = self.client.get(ME_URL)
+		self.assertEqual(result.status_code, status.HTTP_200_OK)
+		self.assertEqual(result.data['email'], self.user.email)
+
+	def test_invalid_token(self):
+		"""Test an unknown token is rejected"""
+		self.client.credentials(HTTP_AUTHORIZATION='Token invalid')
+		result = self.client.get(ME_URL)
+		self.assertEqual(result.status_code, status.HTTP_401_UNAUTHORIZED)
+
+	def test_deleted_token_rejected(self):
+		"""Test a deleted token stops authenticating at once"""
+		self.client.get(ME_URL)
+		self.token.delete()
+
+		result = self.client.get(ME_URL)
+
+		self.assertEqual(result.status_code, status.HTTP_401_UNAUTHORIZED)
+
+	def test_deactivated_user_rejected(self):
+		"""Test deactivating a user stops their cached token at once"""
+		self.client.get(ME_URL)
+		self.user.is_active = False
+		self.user.save()
+
+		result = self.client.get(ME_URL)
+
+		self.assertEqual(result.status_code, status.HTTP_401_UNAUTHORIZED)
+
+	def test_profile_update_visible(self):
+		"""Test the cached user reflects a profile update"""
+		self.client.get(ME_URL)
+		self.client.patch(ME_URL, {'name': 'new name'})
+
+		result = self.client.get(ME_URL)
+
+		self.assertEqual(result.data['name'], 'new name')
+
+	@override_settings(TOKEN_AUTH_CACHE={'SHARED_CACHE': 'default'})
+	def test_password_hash_is_not_cached(self):
+		"""Test cached users leave out the password hash"""
+		self.client.get(ME_URL)
+
+		values = get_shared_cache().get(authentication.shared_key(self.token.key))
+
+		self.assertNotIn('password', values)
+		self.assertEqual(values['email'], self.user.email)
+
+	@override_settings(TOKEN_AUTH_CACHE={'SHARED_CACHE': 'default', 'SYNC_INTERVAL': 0})
+	def test_eviction_in_another_process(self):
+		"""Test an eviction made elsewhere clears this process's cache"""
+		self.client.get(ME_URL)
+		# Another process deactivates the user and evicts their tokens
+		get_user_model().objects.filter(pk=self.user.pk).update(is_active=False)
+		get_shared_cache().delete(authentication.shared_key(self.token.key))
+		authentication.bump_generation(get_shared_cache())
+
+		result = self.client.get(ME_URL)
+
+		self.assertEqual(result.status_code, status.HTTP_401_UNAUTHORIZED)
+
+	@override_settings(TOKEN_AUTH_CACHE={'SHARED_CACHE': 'default'})
+	def test_shared_cache_tier(self):
+		"""Test a process with a cold cache reads the shared tier"""
+		self.client.get(ME_URL)
+		get_token_cache().clear()
+
+		with self.assertNumQueries(0):
+			result = self.client.get(ME_URL)
+
+		self.assertEqual(result.status_code, status.HTTP_200_OK)
+
+
+class LRUCacheTests(TestCase):
+	"""Test the in-process token cache"""
+
+	def setUp(self):
+		self.now = 0
+		self.cache = LRUCache(max_entries=2, ttl=10, clock=lambda: self.now)
+
+	def test_least_recently_used_evicted(self):
+		"""Test the least recently read entry is evicted first"""
+		self.cache.set('a', 1)
+		self.cache.set('b', 2)
+		self.cache.get('a')
+		self.cache.set('c', 3)
+
+		self.assertEqual(self.cache.get('a'), 1)
+		self.assertIsNone(self.cache.get('b'))
+		self.assertEqual(self.cache.get('c'), 3)
+
+	def test_entries_expire(self):
+		"""Test entries are dropped once their TTL has passed"""
+		self.cache.set('a', 1)
+		self.now = 10
+
+		self.assertIsNone(self.cache.get('a'))
+		self.assertEqual(len(self.cache), 0)
@@ -1,21 +1,41 @@
-from rest_framework import generics, authentication, permissions
+from django.utils.translation import gettext_lazy as _
+from rest_framework import generics, permissions, exceptions, status
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
+from core.db.routers import ReplicaReadMixin
+from core.hashing import HashingPoolBusy
+from user.authentication import CachedTokenAuthentication
 from user.serializers import UserSerializer, AuthTokenSerializer
 
-class CreateUserView(generics.CreateAPIView):
+class HashingUnavailable(exceptions.APIException):
+	"""The password hashing pool is saturated"""
+	status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+	default_detail = _('Too many password operations in progress, try again shortly.')
+	default_code = 'hashing_unavailable'
+	# Sent as Retry-After by the default exception handler
+	wait = 1
+	
+class HashingPoolMixin:
+	"""Answer 503 instead of 500 when password hashing is saturated"""
+	
+	def handle_exception(self, exc):
+		if isinstance(exc, HashingPoolBusy):
+			exc = HashingUnavailable()
+		return super().handle_exception(exc)
+
+class CreateUserView(HashingPoolMixin, generics.CreateAPIView):
 	"""Create a new user in the system"""
 	serializer_class = UserSerializer 
 	
-class CreateTokenView(ObtainAuthToken):
+class CreateTokenView(HashingPoolMixin, ObtainAuthToken):
 	"""Create a new auth token for user"""
 	serializer_class = AuthTokenSerializer
 	renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
 	
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(ReplicaReadMixin, HashingPoolMixin, generics.RetrieveUpdateAPIView):
 	"""Manage the authenticated user"""
 	serializer_class = UserSerializer
-	authentication_classes = (authentication.TokenAuthentication,)
+	authentication_classes = (CachedTokenAuthentication,)
 	permission_classes = (permissions.IsAuthenticated,)
 	
 	def get_object(self):